@@ -248,6 +248,23 @@ def get_parser() -> argparse.ArgumentParser:
         action="store_false",
         help="Disable the likelihood computation for causal models during treatment effect estimation.",
     )
+    parser.add_argument(
+        "--num_workers",
+        "-nw",
+        type=int,
+        default=1,
+        help="Number of experiments (one per seed) to run in parallel processes. Default: %(default)s .",
+    )
+    parser.add_argument(
+        "--resume_dir",
+        type=str,
+        help="Models directory of an interrupted run to resume. Experiments which already have results are skipped.",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Record the time and memory used by each phase of the experiments, and save them to profile.json.",
+    )
 
     return parser
 
@@ -258,6 +275,9 @@ def validate_args(args: argparse.Namespace) -> None:
 
     """
     assert os.path.isdir(args.data_dir), f"{args.data_dir} is not a directory."
+    assert args.num_workers >= 1, "Number of workers must be positive."
+    if args.resume_dir is not None and not os.path.isdir(args.resume_dir):
+        raise ValueError("Directory %s to resume does not exist." % args.resume_dir)
 
     # Config files
     if args.model_config is not None and not os.path.isfile(args.model_config):
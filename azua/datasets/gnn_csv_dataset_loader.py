@@ -14,6 +14,11 @@ from torch_geometric.data import Data
 
 from ..datasets.csv_dataset_loader import CSVDatasetLoader
 from ..datasets.dataset import Dataset, GraphDataset
+from ..datasets.graph_data_cache import (
+    compute_graph_cache_key,
+    load_cached_graph_data,
+    save_cached_graph_data,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -135,7 +140,19 @@ class GNNCSVDatasetLoader(CSVDatasetLoader):
         else:
             all_df = pd.concat([train_df, test_df, val_df], ignore_index=True)
 
+        # Building the graph is expensive for large datasets, so by default it is cached in the dataset directory.
+        cache_graph_data = model_config is not None and model_config.get("cache_graph_data", True)
+        if cache_graph_data:
+            assert model_config is not None  # for mypy
+            cache_key = compute_graph_cache_key(self._dataset_dir, [train_df, test_df, val_df], used_cols, model_config)
+            cached_graph_data = load_cached_graph_data(self._dataset_dir, cache_key)
+            if cached_graph_data is not None:
+                self._used_cols = used_cols
+                return cached_graph_data
+
         graph_data = self._create_graph_data(all_df, train_df, test_df, val_df, used_cols, model_config)
+        if cache_graph_data:
+            save_cached_graph_data(self._dataset_dir, cache_key, graph_data)
 
         return graph_data
 
@@ -272,14 +289,14 @@ class GNNCSVDatasetLoader(CSVDatasetLoader):
             val_df, n_user, n_item, node_init, item_metadata_df, meta_nodes_to_index,
         )
 
-        edge_attr = torch.tensor(np.expand_dims(np.array(all_df)[:, 2], -1))
-        train_edge_attr = torch.tensor(np.expand_dims(np.array(train_df)[:, 2], -1))
-        test_edge_attr = torch.tensor(np.expand_dims(np.array(test_df)[:, 2], -1))
-        val_edge_attr = torch.tensor(np.expand_dims(np.array(val_df)[:, 2], -1))
+        edge_attr = torch.tensor(all_df["val"].to_numpy()[:, None])
+        train_edge_attr = torch.tensor(train_df["val"].to_numpy()[:, None])
+        test_edge_attr = torch.tensor(test_df["val"].to_numpy()[:, None])
+        val_edge_attr = torch.tensor(val_df["val"].to_numpy()[:, None])
 
-        train_labels = torch.tensor(np.array(train_df)[:, 2])
-        test_labels = torch.tensor(np.array(test_df)[:, 2])
-        val_labels = torch.tensor(np.array(val_df)[:, 2])
+        train_labels = torch.tensor(train_df["val"].to_numpy())
+        test_labels = torch.tensor(test_df["val"].to_numpy())
+        val_labels = torch.tensor(val_df["val"].to_numpy())
 
         if node_init in ["topic_sep", "topic_sep_tree", "topic_sep_tree_leaf"]:
             if node_init == "topic_sep":
@@ -457,8 +474,8 @@ class GNNCSVDatasetLoader(CSVDatasetLoader):
             coo = data_csr.tocoo()
             assert np.array_equal(coo.row, np.sort(coo.row))
             assert idxs == sorted(idxs)
-            map_coo_row_to_idxs = {v1: v2 for v1, v2 in zip(np.sort(np.unique(coo.row)), idxs)}
-            df_row = np.vectorize(map_coo_row_to_idxs.get)(coo.row)
+            # Map the i-th distinct row of the matrix to the i-th index in idxs.
+            df_row = np.asarray(idxs)[np.searchsorted(np.unique(coo.row), coo.row)]
             df = pd.DataFrame(
                 {"row": df_row, "col": coo.col, "val": coo.data.astype(np.float64)}, columns=["row", "col", "val"],
             )
@@ -505,7 +522,7 @@ class GNNCSVDatasetLoader(CSVDatasetLoader):
         Returns:
             edge_index Tensor
         """
-        edge_index1 = np.array(df[["row", "col"]]).T
+        edge_index1 = df[["row", "col"]].to_numpy().T
         edge_index1 = edge_index1 + np.array([0, n_user])[:, np.newaxis]
 
         if node_init in ["topic_sep", "topic_sep_tree", "topic_sep_tree_leaf"]:
@@ -569,9 +586,9 @@ class GNNCSVDatasetLoader(CSVDatasetLoader):
         """
         topics_to_index = {v: k for k, v in enumerate(topic_metadata_df.SubjectId.unique())}
         x_item = torch.zeros((n_item, len(topics_to_index)))
-        for i in range(len(topic_metadata_df)):
-            row = topic_metadata_df.loc[i]
-            x_item[row.QuestionId][topics_to_index[row.SubjectId]] = 1.0
+        item_idxs = torch.tensor(topic_metadata_df.QuestionId.to_numpy(dtype=np.int64))
+        topic_idxs = torch.tensor(topic_metadata_df.SubjectId.map(topics_to_index).to_numpy(dtype=np.int64))
+        x_item[item_idxs, topic_idxs] = 1.0
         return x_item
 
     @classmethod
@@ -0,0 +1,193 @@
+import hashlib
+import json
+import logging
+import os
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import torch
+from pandas import DataFrame
+from torch.nn.functional import one_hot
+from torch_geometric.data import Data
+
+logger = logging.getLogger(__name__)
+
+_GRAPH_CACHE_DIR = "graph_cache"
+
+# Model config entries which change the graph data built by the GNN dataset loaders.
+_GRAPH_CONFIG_KEYS = (
+    "random_seed",
+    "node_init",
+    "node_input_dim",
+    "use_transformer",
+    "use_edge_metadata",
+    "use_discrete_edge_value",
+    "use_edge_metadata_for_prediction",
+    "prediction_metadata_dim",
+)
+
+
+def compute_graph_cache_key(
+    dataset_dir: str, dfs: List[Optional[DataFrame]], used_cols: List[int], model_config: Dict[str, Any]
+) -> str:
+    """
+    Compute the key under which the graph data built from the given edge DataFrames is cached. The key depends on the
+    contents of the DataFrames, the used columns, the graph-related model config entries and the size and modification
+    time of the input files in the dataset directory (including item and edge metadata files).
+
+    Args:
+        dataset_dir: Dataset directory, containing the input files and the cache.
+        dfs: train, test and val DataFrames with columns (row, col, val), or None for a missing split.
+        used_cols: Original indexes in original dataset's columns.
+        model_config: model configuration dictionary used to build the graph data.
+
+    Returns:
+        Hex digest identifying the graph data.
+    """
+    hasher = hashlib.sha1()
+    for df in dfs:
+        if df is None:
+            hasher.update(b"none")
+        else:
+            hasher.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    hasher.update(np.asarray(used_cols, dtype=np.int64).tobytes())
+    graph_config = {key: model_config.get(key) for key in _GRAPH_CONFIG_KEYS}
+    hasher.update(json.dumps(graph_config, sort_keys=True).encode())
+    for file_signature in _get_input_file_signatures(dataset_dir):
+        hasher.update(file_signature.encode())
+    return hasher.hexdigest()
+
+
+def _get_input_file_signatures(dataset_dir: str) -> List[str]:
+    signatures = []
+    for directory in [dataset_dir, os.path.join(dataset_dir, "metadata")]:
+        if not os.path.isdir(directory):
+            continue
+        for filename in sorted(os.listdir(directory)):
+            path = os.path.join(directory, filename)
+            # *_expanded.csv files are written by the loaders themselves, so are not inputs.
+            if not os.path.isfile(path) or filename.endswith("_expanded.csv"):
+                continue
+            stat = os.stat(path)
+            signatures.append(f"{os.path.relpath(path, dataset_dir)}:{stat.st_size}:{stat.st_mtime_ns}")
+    return signatures
+
+
+def _get_cache_path(dataset_dir: str, cache_key: str) -> str:
+    return os.path.join(dataset_dir, _GRAPH_CACHE_DIR, f"graph_data_{cache_key}.pt")
+
+
+def load_cached_graph_data(dataset_dir: str, cache_key: str) -> Optional[Data]:
+    """
+    Load graph data cached under the given key, or return None if there is none. The torch random state is restored to
+    its value just after the graph data was originally built, so that subsequent random draws are unaffected by caching.
+    """
+    cache_path = _get_cache_path(dataset_dir, cache_key)
+    if not os.path.exists(cache_path):
+        return None
+    logger.info(f"Loading cached graph data from {cache_path}.")
+    cached = torch.load(cache_path)
+    torch.set_rng_state(cached["rng_state"])
+    return cached["graph_data"]
+
+
+def save_cached_graph_data(dataset_dir: str, cache_key: str, graph_data: Data) -> None:
+    """
+    Save graph data under the given key, together with the current torch random state.
+    """
+    cache_path = _get_cache_path(dataset_dir, cache_key)
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    # Write to a temporary file first, so that concurrent runs never read a partially written cache file.
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    torch.save({"graph_data": graph_data, "rng_state": torch.get_rng_state()}, tmp_path)
+    os.replace(tmp_path, cache_path)
+
+
+def append_edges_to_graph_data(graph_data: Data, new_df: DataFrame, split: str, use_discrete_edge_value: bool) -> Data:
+    """
+    Incrementally add new user-item edges to graph data built by the GNN dataset loaders, without rebuilding the graph.
+    The result is the same as rebuilding the graph with new_df appended to the DataFrame of the given split: the edges
+    are added, in both directions, to the edges of the split and to all edges, and their values are added to the labels
+    of the split.
+
+    Graphs with metadata nodes (node_init "topic_sep", "topic_sep_tree" or "topic_sep_tree_leaf") are supported. Their
+    edges to metadata nodes are left unchanged, and the new edges are inserted before them. Graphs with edge metadata
+    are not supported, as the edge metadata is normalised over all edges. Adding new users or items changes the node
+    indexing, and adding new discrete edge values changes the one-hot encoding of all edges, so both require the graph
+    to be rebuilt.
+
+    Args:
+        graph_data: Graph data to update in place.
+        new_df: DataFrame of new edges with columns (row, col, val), using the same row and column indices as the
+            DataFrames used to build the graph.
+        split: Split to add the edges to: "train", "test" or "val".
+        use_discrete_edge_value: Whether the graph was built with one-hot encoded edge values.
+
+    Returns:
+        The updated graph data.
+    """
+    splits = ("train", "test", "val")
+    assert split in splits
+    if graph_data.prediction_edge_metadata.numel() > 0:
+        raise NotImplementedError("Appending edges to graphs with edge metadata is not supported.")
+    if len(new_df) == 0:
+        return graph_data
+
+    n_user, n_item = graph_data.num_users, graph_data.num_items
+    rows, cols = new_df["row"].to_numpy(dtype=np.int64), new_df["col"].to_numpy(dtype=np.int64)
+    vals = torch.tensor(new_df["val"].to_numpy(dtype=np.float64))
+    if rows.min() < 0 or rows.max() >= n_user or cols.min() < 0 or cols.max() >= n_item:
+        raise ValueError("New edges must connect existing users and items. Rebuild the graph to add new nodes.")
+
+    # The directed edges of each split are its user-item edges followed by the edges to metadata nodes, which are the
+    # same for all splits. All edges hold the user-item edges of the train, test and val splits, in that order.
+    num_directed = graph_data.edge_index.shape[1] // 2
+    num_metadata_edges = int((graph_data.edge_index[1, :num_directed] >= n_user + n_item).sum())
+    num_user_item_edges = {s: len(graph_data[f"{s}_labels"]) - num_metadata_edges for s in splits}
+    num_all_user_item_edges = num_directed - num_metadata_edges
+
+    new_edge_index = torch.tensor(np.stack((rows, cols + n_user)), dtype=torch.long)
+    edge_attr = graph_data.edge_attr
+    if use_discrete_edge_value:
+        # The one-hot classes of edge values are followed by those of the edges to metadata nodes, if any.
+        edge_values = edge_attr[:num_all_user_item_edges].argmax(dim=1)
+        vals_int = vals.to(torch.int64)
+        if torch.sum(vals_int - vals) != 0 or not set(vals_int.tolist()) <= set(edge_values.tolist()):
+            raise ValueError(
+                "Discrete edge values must be integers which already occur in the graph. Rebuild the graph to add new "
+                "edge values."
+            )
+        new_edge_attr = one_hot(vals_int, num_classes=edge_attr.shape[1]).float()
+    else:
+        new_edge_attr = vals[:, None].float()
+    if new_edge_attr.shape[1] != edge_attr.shape[1]:
+        raise NotImplementedError("Appending edges to graphs with extra edge attributes is not supported.")
+
+    insert_positions = {
+        "": sum(num_user_item_edges[s] for s in splits[: splits.index(split) + 1]),
+        f"{split}_": num_user_item_edges[split],
+    }
+    for prefix, position in insert_positions.items():
+        graph_data[f"{prefix}edge_index"] = _insert_edges(
+            graph_data[f"{prefix}edge_index"], new_edge_index, new_edge_index.flip(0), position, dim=1
+        )
+        graph_data[f"{prefix}edge_attr"] = _insert_edges(
+            graph_data[f"{prefix}edge_attr"], new_edge_attr, new_edge_attr, position, dim=0
+        )
+    labels = graph_data[f"{split}_labels"]
+    position = num_user_item_edges[split]
+    graph_data[f"{split}_labels"] = torch.cat((labels[:position], vals.float(), labels[position:]))
+    return graph_data
+
+
+def _insert_edges(
+    edges: torch.Tensor, new_edges: torch.Tensor, new_reversed_edges: torch.Tensor, position: int, dim: int
+) -> torch.Tensor:
+    """
+    Insert new edges at the given position of the directed edges, and the reversed new edges at the same position of
+    the reversed edges, which follow the directed edges along dimension dim.
+    """
+    num_directed = edges.shape[dim] // 2
+    first, middle, last = torch.split(edges, [position, num_directed, num_directed - position], dim=dim)
+    return torch.cat((first, new_edges, middle, new_reversed_edges, last), dim=dim)
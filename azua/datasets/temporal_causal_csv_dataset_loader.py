@@ -167,38 +167,36 @@ class TemporalCausalCSVDatasetLoader(CausalCSVDatasetLoader):
                 val_idx_selection = series_index[num_test:]
 
             # Generate row index based on selected time series
-            # Select the data according to the time-series index.
-            train_rows = []
-            for train_series_index in train_idx_selection:
-                # This maps the time-series index to a list of rows index. In the above example, time-series index 0 will map to a list [0,1,2,...,96].
-                # So if we pick series [0,2] for training, then the train_rows will be [0,1,2,..,96,98]
-                train_rows += self._map_from_series_to_rows(train_series_index, series_column)
-
-            test_rows = []
-            for test_series_index in test_idx_selection:
-                test_rows += self._map_from_series_to_rows(test_series_index, series_column)
-
-            val_rows = []
-            if len(val_idx_selection) > 0:
-                for val_series_index in val_idx_selection:
-                    val_rows += self._map_from_series_to_rows(val_series_index, series_column)
+            # Select the data according to the time-series index. This maps each selected time-series index to the
+            # list of its rows, in the order in which the series were selected. E.g. if series 0 occupies rows
+            # [0,1,2,...,96] and series 2 occupies row [98], then picking series [0,2] gives [0,1,2,..,96,98].
+            train_rows = self._map_from_series_list_to_rows(train_idx_selection, series_column)
+            test_rows = self._map_from_series_list_to_rows(test_idx_selection, series_column)
+            val_rows = self._map_from_series_list_to_rows(val_idx_selection, series_column)
             return train_rows, val_rows, test_rows
 
-    def _map_from_series_to_rows(self, series_index: Union[int, np.int_], series_column: np.ndarray) -> List[int]:
+    def _map_from_series_list_to_rows(
+        self, series_selection: Union[List[int], np.ndarray], series_column: np.ndarray
+    ) -> List[int]:
         """
-        This will map the target time-series index to a list of index specifying the locations of that time series.
-        E.g. data containing 4 time-series with index [0,1,2,3] with length [97,1,1,1]. Then series_column will be [0,0,...,1,2,3].
-        If series_index is 0, then it will return [0,1,2,...,96]. If series_index is 2, it will return [98].
+        This maps a list of time-series indices to the row indices of all of these series in a single vectorized pass.
+        E.g. data containing 4 time-series with index [0,1,2,3] with length [97,1,1,1]. Then series_column will be
+        [0,0,...,1,2,3]. If series_selection is [2,0], it will return [98,0,1,...,96].
         Args:
-            series_index: target time series number
+            series_selection: target time series numbers, in the order in which their rows should be returned.
             series_column: the array that contains the series numbers.
         """
-        index_list = np.argwhere(series_column == series_index).squeeze()
-        if len(index_list.shape) == 0:
-            index_list_ = [index_list.tolist()]
-        else:
-            index_list_ = index_list.tolist()
-        return index_list_
+        series_selection = np.asarray(series_selection)
+        if len(series_selection) == 0:
+            return []
+        # For each row, find the position of its series in series_selection (if it is selected at all).
+        sorter = np.argsort(series_selection)
+        sorted_pos = np.searchsorted(series_selection, series_column, sorter=sorter)
+        selection_pos = sorter[np.clip(sorted_pos, 0, len(series_selection) - 1)]
+        rows = np.flatnonzero(series_selection[selection_pos] == series_column)
+        # Order rows by the position of their series in series_selection, keeping time order within each series.
+        rows = rows[np.argsort(selection_pos[rows], kind="stable")]
+        return rows.tolist()
 
     def load_predefined_dataset(
         self, max_num_rows: Optional[int] = None, negative_sample: bool = False, **kwargs,
@@ -289,20 +287,21 @@ class TemporalCausalCSVDatasetLoader(CausalCSVDatasetLoader):
     ) -> Tuple[np.ndarray, np.ndarray, List[Tuple[int, int]]]:
         """
         This removes the first column of the data, where we store the time-series index.
-        It also generates the corresponding index segmentations list.
+        It also generates the corresponding index segmentations list. The rows of each time series are assumed to be
+        contiguous.
         Args:
             data: Temporal data.
             mask: the corresponding masks of the data
             timeseries_column_index: the column index specifying the time series number
         """
-        num_series = len(np.unique(data[:, timeseries_column_index]))
-        start_idx = 0
-        series_seg = []
-        for i in range(num_series):
-            cur_series_number = data[start_idx, timeseries_column_index]
-            series_range = np.argwhere(data[:, timeseries_column_index] == cur_series_number)
-            series_seg.append((int(series_range[0]), int(series_range[-1])))
-            start_idx = int(series_range[-1]) + 1
+        # Series boundaries are the rows where the series number changes, found in a single vectorized pass.
+        series_column = data[:, timeseries_column_index]
+        if len(series_column) > 0:
+            seg_starts = np.concatenate([[0], np.flatnonzero(series_column[1:] != series_column[:-1]) + 1])
+            seg_ends = np.concatenate([seg_starts[1:] - 1, [len(series_column) - 1]])
+            series_seg = [(int(start), int(end)) for start, end in zip(seg_starts, seg_ends)]
+        else:
+            series_seg = []
         proc_data = np.delete(data, timeseries_column_index, 1)
         proc_mask = np.delete(mask, timeseries_column_index, 1)
         return proc_data, proc_mask, series_seg
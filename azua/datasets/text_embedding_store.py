@@ -0,0 +1,144 @@
+import hashlib
+import json
+import logging
+import os
+import uuid
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class TextEmbeddingStore:
+    """
+    Content-addressed on-disk store of transformer token embeddings of sentences. The embeddings are stored in float16
+    shards: each shard is a .npy file of shape (total_num_tokens, embedding_dim) holding the non-padding token
+    embeddings of a batch of sentences packed one after the other, next to a JSON index mapping the key of each
+    sentence to its (offset, num_tokens) in the shard. Keys are computed from the transformer model id, the maximum
+    token length and the sentence itself. Each shard is memory-mapped once, so embeddings are only loaded into memory
+    when used, and the number of memory maps grows with the number of shards rather than of sentences.
+
+    Shards are never modified once written, and each batch of sentences added to the store is written as a new shard,
+    so the store can be shared between concurrent runs, models and datasets, and populated offline (see
+    research_experiments/eedi/encode_sentence_with_bert.py).
+    """
+
+    _INDEX_SUFFIX = ".index.json"
+
+    def __init__(self, store_dir: str, model_id: str, max_length: int):
+        """
+        Args:
+            store_dir: Directory holding the store.
+            model_id: Id of the transformer model producing the embeddings, e.g. "bert-base-cased".
+            max_length: Maximum number of tokens per sentence. Longer sentences are truncated by the tokenizer.
+        """
+        self.store_dir = store_dir
+        self.model_id = model_id
+        self.max_length = max_length
+        self._index: Dict[str, Tuple[str, int, int]] = {}
+        self._loaded_shards: Set[str] = set()
+        self._shards: Dict[str, np.ndarray] = {}
+
+    def _get_key(self, sentence: str) -> str:
+        hasher = hashlib.sha1()
+        hasher.update(f"{self.model_id}\0{self.max_length}\0".encode())
+        hasher.update(sentence.encode())
+        return hasher.hexdigest()
+
+    def _refresh_index(self) -> None:
+        """
+        Add the entries of shards written since the index was last refreshed, e.g. by other runs, to the index.
+        """
+        if not os.path.isdir(self.store_dir):
+            return
+        for filename in sorted(os.listdir(self.store_dir)):
+            if not filename.endswith(self._INDEX_SUFFIX):
+                continue
+            shard = filename[: -len(self._INDEX_SUFFIX)]
+            if shard in self._loaded_shards:
+                continue
+            with open(os.path.join(self.store_dir, filename), "r") as f:
+                shard_index = json.load(f)
+            for key, (offset, num_tokens) in shard_index.items():
+                self._index.setdefault(key, (shard, offset, num_tokens))
+            self._loaded_shards.add(shard)
+
+    def _get_shard(self, shard: str) -> np.ndarray:
+        if shard not in self._shards:
+            self._shards[shard] = np.load(os.path.join(self.store_dir, f"{shard}.npy"), mmap_mode="r")
+        return self._shards[shard]
+
+    def _lookup(self, sentence: str) -> Optional[np.ndarray]:
+        entry = self._index.get(self._get_key(sentence))
+        if entry is None:
+            return None
+        shard, offset, num_tokens = entry
+        return self._get_shard(shard)[offset : offset + num_tokens]
+
+    def get(self, sentence: str) -> Optional[np.ndarray]:
+        """
+        Return the memory-mapped token embeddings of the sentence, with shape (num_tokens, embedding_dim), or None if
+        the sentence is not in the store.
+        """
+        token_embeddings = self._lookup(sentence)
+        if token_embeddings is None:
+            self._refresh_index()
+            token_embeddings = self._lookup(sentence)
+        return token_embeddings
+
+    def put(self, sentences: Sequence[str], token_embeddings: Sequence[np.ndarray]) -> None:
+        """
+        Add the token embeddings of the sentences, each of shape (num_tokens, embedding_dim), to the store as a new
+        shard.
+        """
+        if len(sentences) != len(token_embeddings):
+            raise ValueError("Expected one array of token embeddings per sentence.")
+        if not sentences:
+            return
+        os.makedirs(self.store_dir, exist_ok=True)
+        shard_index = {}
+        offset = 0
+        for sentence, embeddings in zip(sentences, token_embeddings):
+            shard_index[self._get_key(sentence)] = (offset, embeddings.shape[0])
+            offset += embeddings.shape[0]
+        shard = f"shard_{uuid.uuid4().hex}"
+        shard_path = os.path.join(self.store_dir, f"{shard}.npy")
+        index_path = os.path.join(self.store_dir, f"{shard}{self._INDEX_SUFFIX}")
+        # Write to temporary files first, and the index last, so that concurrent runs never read a partially written
+        # shard.
+        tmp_shard_path = f"{shard_path}.tmp.npy"
+        np.save(tmp_shard_path, np.concatenate(token_embeddings, axis=0).astype(np.float16))
+        os.replace(tmp_shard_path, shard_path)
+        tmp_index_path = f"{index_path}.tmp"
+        with open(tmp_index_path, "w") as f:
+            json.dump(shard_index, f)
+        os.replace(tmp_index_path, index_path)
+        for key, (offset, num_tokens) in shard_index.items():
+            self._index.setdefault(key, (shard, offset, num_tokens))
+        self._loaded_shards.add(shard)
+
+    def get_or_encode(
+        self, sentences: Sequence[str], encode_fn: Callable[[List[str]], List[np.ndarray]]
+    ) -> List[np.ndarray]:
+        """
+        Return the token embeddings of all sentences, encoding and storing only those missing from the store.
+
+        Args:
+            sentences: Sentences to get the token embeddings of.
+            encode_fn: Function mapping a list of sentences to a list of their token embeddings, each of shape
+                (num_tokens, embedding_dim) and without padding tokens. Only called if some sentences are missing.
+
+        Returns:
+            List of token embeddings, each of shape (num_tokens, embedding_dim), in the order of sentences.
+        """
+        self._refresh_index()
+        token_embeddings = [self._lookup(sentence) for sentence in sentences]
+        missing_sentences = sorted({s for s, emb in zip(sentences, token_embeddings) if emb is None})
+        if missing_sentences:
+            logger.info(f"Encoding {len(missing_sentences)} sentences missing from the text embedding store.")
+            self.put(missing_sentences, encode_fn(missing_sentences))
+            token_embeddings = [
+                emb if emb is not None else self._lookup(sentence) for sentence, emb in zip(sentences, token_embeddings)
+            ]
+        return token_embeddings  # type: ignore
@@ -1,6 +1,6 @@
-import bisect
 from typing import Tuple, List
 
+import numpy as np
 import torch
 from torch.utils.data import Dataset as torch_dataset
 
@@ -14,6 +14,10 @@ class TemporalTensorDataset(torch_dataset[Tuple[torch.Tensor, ...]]):
     [[0.2],[0.3],[0.4]] and index 2 (second time-series) is [[0.5],[0.6],[0.7]].
     The implementation strategy for __getitem__ is to convert the index
     of fold-time/AR format back to the index of original data. E.g. index 2 (fold-time) maps back to index 4 (original data)
+
+    All series are stored contiguously in the input tensors, and windows are served as strided views of them, so no
+    data is copied until a minibatch is gathered. Indexing with a slice, or a list/array/tensor of indices (e.g. as
+    produced by `IndexBatchSampler`), returns a whole minibatch of windows in a single gather.
     """
 
     tensors: Tuple[torch.Tensor, ...]
@@ -35,7 +39,10 @@ class TemporalTensorDataset(torch_dataset[Tuple[torch.Tensor, ...]]):
         assert all(tensors[0].size(0) == tensor.size(0) for tensor in tensors)
         self.tensors = tensors
         self._validate_dataset()
-        self.lag_index_segmentation_end = self._build_new_segmentation_end_with_lag()
+        self.window_starts = self._build_window_starts()
+        # Strided (zero-copy) views of shape [num_rows - lag, lag+1, node], where element i is the window starting at
+        # row i of the original data. Windows crossing series boundaries exist in the view but are never indexed.
+        self._windows = tuple(tensor.unfold(0, self.lag + 1, 1).transpose(1, 2) for tensor in self.tensors)
 
     def _validate_dataset(self) -> None:
         """
@@ -46,55 +53,45 @@ class TemporalTensorDataset(torch_dataset[Tuple[torch.Tensor, ...]]):
             min_length > self.lag
         ), f"Minimum series length ({min_length}) must be higher than specified lag ({self.lag})"
 
-    def _build_new_segmentation_end_with_lag(self) -> List[int]:
-        """
-        This is to adapt the original index segmentation to generate index segmentation for the fold-time/AR dataset
-        and only keep the end segmentation. The new returned segmentation is mainly used for mapping the fold-time/AR index
-        back to the index of original data.
-        For example, if the original index segmentation is [(0,3),(4,6)],
-        and the lag is 2; then the new index segmentation for fold-time/AR dataset is [(0,1), (2,2)]. Since we only keep
-        the end index, so the new_seg is [1,2].
-        """
-        new_seg = []
-        for series_idx, seg in enumerate(self.index_segmentation):
-            seg_end = seg[1] - (series_idx + 1) * self.lag
-            new_seg.append(int(seg_end))
-
-        return new_seg
-
-    def _find_series_number(self, index: int) -> int:
+    def _build_window_starts(self) -> np.ndarray:
         """
-        This is to search for how many time-series the fold-time/AR index has moved across.
-        This is achieved by finding the first end index in the format-time format that is larger or equal to the input fold-time/AR index.
-        E.g. if the end index segmentation for AR/Fold-time dataset is [1, 2], and the input fold-time/AR index is 1, then
-        the fold-time/AR index only move across 0 time-series.
-        Args:
-            index: data index
+        This maps every index of the fold-time/AR dataset back to the index of the original data at which its window
+        starts, computed for all indices at once. For example, if the original index segmentation is [(0,3),(4,6)],
+        and the lag is 2, the first series contains windows starting at original indices [0, 1] and the second series
+        a window starting at original index [4], so the returned array is [0, 1, 4].
         """
-
-        return bisect.bisect_left(self.lag_index_segmentation_end, index)
+        seg = np.asarray(self.index_segmentation, dtype=np.int64).reshape(-1, 2)
+        seg_starts, seg_ends = seg[:, 0], seg[:, 1]
+        windows_per_series = seg_ends - seg_starts + 1 - self.lag
+        # Index of the first window of each series in the fold-time/AR dataset.
+        first_window_idxs = np.cumsum(windows_per_series) - windows_per_series
+        return np.repeat(seg_starts - first_window_idxs, windows_per_series) + np.arange(windows_per_series.sum())
 
     def __getitem__(self, index):
         """
-        This is to get the data in fold-time/AR format with corresponding index. This is achieved by mapping the index (fold-time/AR) back to the
-        original index. Then we can directly return the original data[index_orig:index_orig+lag+1,:].
-        The intuition is that the differences between the fold-time/AR and original index happens when the fold-time/AR index
-        moves across time-series. For example, if the original index segmentation is [(0,3),(4,6)], and the lag is 2;
-        then fold-time/AR index 0 and 1 does not across the first time-series, so fold-time/AR index = original index.
-        However, if the fold-time/AR index is 2, then it moves across the first time-series, so to map it back to the original index,
-        we need to account for the additional lag created during the crossing. So original index = fold-time/AR index + lag*number of crossed time-series.
-        In the above example, the index 2 in fold-time/AR dataset maps back to index 4 in the original data.
-        The number of crossed time-series is found by _find_series_number, which requires the new index segmentation generated by _build_new_segmentation_end_with_lag.
+        This is to get the data in fold-time/AR format with corresponding index. This is achieved by mapping the index
+        (fold-time/AR) back to the original index, using the precomputed `window_starts`. Then we can directly return
+        the original data[index_orig:index_orig+lag+1,:]. For a batch of indices, windows are gathered from the strided
+        views of the data, giving tensors of shape [batch, lag+1, node] (AR) or [batch, node*(lag+1)] (fold-time).
         Args:
-            index: The index in fold-time/AR dataset.
+            index: The index (or batch of indices) in fold-time/AR dataset.
         """
-        index_orig = int(index + self._find_series_number(index) * self.lag)
+        if isinstance(index, (int, np.integer)):
+            index_orig = int(self.window_starts[index])
+            if self.is_autoregressive:
+                # Return the data with shape [lag+1, node]
+                return tuple(tensor[index_orig : index_orig + self.lag + 1, :] for tensor in self.tensors)
+            else:
+                # Return the data with shape [node*(lag+1)]
+                return tuple(tensor[index_orig : index_orig + self.lag + 1, :].flatten() for tensor in self.tensors)
+
+        if isinstance(index, torch.Tensor):
+            index = index.cpu().numpy()
+        index_orig = torch.as_tensor(self.window_starts[index], dtype=torch.long, device=self.tensors[0].device)
         if self.is_autoregressive:
-            # Return the data with shape [lag+1, node]
-            return tuple(tensor[index_orig : index_orig + self.lag + 1, :] for tensor in self.tensors)
+            return tuple(windows[index_orig] for windows in self._windows)
         else:
-            # Return the data with shape [node*(lag+1)]
-            return tuple(tensor[index_orig : index_orig + self.lag + 1, :].flatten() for tensor in self.tensors)
+            return tuple(windows[index_orig].flatten(start_dim=1) for windows in self._windows)
 
     def __len__(self):
-        return self.tensors[0].shape[0] - len(self.index_segmentation) * self.lag
+        return len(self.window_starts)
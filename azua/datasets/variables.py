@@ -5,6 +5,7 @@ import logging
 import warnings
 from collections import defaultdict
 from distutils.util import strtobool
+from functools import cached_property
 from typing import Any, DefaultDict, Dict, Tuple, cast, Iterator, List, Optional, overload, Union
 
 import numpy as np
@@ -17,6 +18,11 @@ from ..utils.io_utils import read_json_as, save_json
 class Variables:
     """
     This class represents any variables present in a model.
+
+    Properties derived from the column layout of the variables (e.g. `group_mask`, `processed_cols_by_type`) are
+    computed on first access and cached for the lifetime of the instance, as they are accessed in per-batch code.
+    Cached values are shared between callers and must not be modified in place. `subset` returns a new instance with
+    its own cache.
     """
 
     def __init__(
@@ -457,28 +463,28 @@ class Variables:
             return [True for _ in range(len(self))]
         return ~np.in1d(range(len(self)), unproc_cols_by_type["text"])
 
-    @property
+    @cached_property
     def num_unprocessed_cols(self) -> int:
         """
         Return number of columns in the unprocessed data represented by all variables
         """
         return sum([len(idxs) for idxs in self.unprocessed_cols])
 
-    @property
+    @cached_property
     def num_unprocessed_non_aux_cols(self) -> int:
         """
         Return number of columns in the unprocessed data represented by non auxiliary variables
         """
         return sum([len(idxs) for idxs in self.unprocessed_non_aux_cols])
 
-    @property
+    @cached_property
     def num_processed_cols(self) -> int:
         """
         Return number of columns in the processed data represented by all variables
         """
         return sum([len(idxs) for idxs in self.processed_cols])
 
-    @property
+    @cached_property
     def num_processed_non_aux_cols(self) -> int:
         """
         Return number of columns in the processed data represented by non auxiliary variables
@@ -492,27 +498,27 @@ class Variables:
         """
         return len(self.query_group_names)
 
-    @property
+    @cached_property
     def group_mask(self) -> np.ndarray:
         """
-        Return a mask of shape (num_groups, num_processed_cols) indicating which column
+        Return a read-only mask of shape (num_groups, num_processed_cols) indicating which column
         corresponds to which group.
         """
         mask = np.zeros((self.num_query_groups, self.num_processed_cols), dtype=np.bool_)
         for group_idx, group in enumerate(self.query_group_idxs):
-            for var in group:
-                for proc_col in self.processed_cols[var]:
-                    mask[group_idx, proc_col] = 1
+            group_cols = [proc_col for var in group for proc_col in self.processed_cols[var]]
+            mask[group_idx, group_cols] = True
+        mask.setflags(write=False)
         return mask
 
-    @property
+    @cached_property
     def proc_always_observed_list(self) -> List[Optional[bool]]:
         """
         The mask that indicates if the variable is always observed (for processed data)
         """
-        return sum(([var.always_observed] * var.processed_dim for var in self._all_variables), [])
+        return [var.always_observed for var in self._all_variables for _ in range(var.processed_dim)]
 
-    @property
+    @cached_property
     def processed_cols_by_type(self) -> Dict[str, List[List[int]]]:
         """
         Return a dictionary mapping each type of data (e.g. continuous, binary, ...) to a list of lists, where each
@@ -524,9 +530,9 @@ class Variables:
         grouped_vars: DefaultDict[str, List[List[int]]] = defaultdict(list)
         for var, cols in zip(self._all_variables, self.processed_cols):
             grouped_vars[var.type].append(cols)
-        return grouped_vars
+        return _ColsByType(list, grouped_vars)
 
-    @property
+    @cached_property
     def processed_non_aux_cols_by_type(self) -> Dict[str, List[List[int]]]:
         """
         Return a dictionary mapping each type of data (e.g. continuous, binary, ...) to a list of lists, where each
@@ -538,9 +544,9 @@ class Variables:
         grouped_vars: DefaultDict[str, List[List[int]]] = defaultdict(list)
         for var, cols in zip(self._variables, self.processed_cols):
             grouped_vars[var.type].append(cols)
-        return grouped_vars
+        return _ColsByType(list, grouped_vars)
 
-    @property
+    @cached_property
     def unprocessed_cols_by_type(self) -> DefaultDict[str, List[int]]:
         """
         Return a dictionary mapping each type of data (e.g. continuous, binary, ...) to a list containing the column
@@ -554,9 +560,9 @@ class Variables:
         for var, cols in zip(self._all_variables, self.unprocessed_cols):
             grouped_vars[var.type] += cols
             i += var.unprocessed_dim
-        return grouped_vars
+        return _ColsByType(list, grouped_vars)
 
-    @property
+    @cached_property
     def unprocessed_non_aux_cols_by_type(self) -> DefaultDict[str, List[int]]:
         """
         Return a dictionary mapping each type of data (e.g. continuous, binary, ...) to a list containing the column
@@ -570,7 +576,7 @@ class Variables:
         for var, cols in zip(self._variables, self.unprocessed_cols):
             grouped_vars[var.type] += cols
             i += var.unprocessed_dim
-        return grouped_vars
+        return _ColsByType(list, grouped_vars)
 
     def subset(self, idxs: List[int], auxiliary_idxs: List[int] = []) -> Variables:
         """
@@ -617,9 +623,103 @@ class Variables:
 
         return variables_to_query
 
+    @cached_property
+    def query_group_incidence(self) -> np.ndarray:
+        """
+        Return a read-only boolean array of shape (num_non_aux_variables, num_query_groups), where element [i, j] is
+        True if the ith variable belongs to the jth query group (groups ordered as in `self.query_group_names`).
+        """
+        incidence = np.zeros((len(self._variables), self.num_query_groups), dtype=np.bool_)
+        for group_idx, idxs in enumerate(self.query_group_idxs):
+            incidence[idxs, group_idx] = True
+        incidence.setflags(write=False)
+        return incidence
+
+    @cached_property
+    def is_query_var(self) -> np.ndarray:
+        """
+        Return a read-only boolean array of shape (num_non_aux_variables,), which is True for queriable variables.
+        """
+        is_query = np.zeros(len(self._variables), dtype=np.bool_)
+        is_query[self.query_var_idxs] = True
+        is_query.setflags(write=False)
+        return is_query
+
+    @overload
+    def any_var_in_query_groups(self, var_mask: np.ndarray) -> np.ndarray:
+        ...
+
+    @overload
+    def any_var_in_query_groups(self, var_mask: torch.Tensor) -> torch.Tensor:
+        ...
+
+    def any_var_in_query_groups(self, var_mask):
+        """
+        For each row of an (unprocessed) variable mask, find the query groups that contain at least one variable with a
+        nonzero mask value, using a single product with `self.query_group_incidence`.
+
+        Args:
+            var_mask (shape (batch_size, variable_count)): Mask over variables. Any columns for auxiliary variables
+                (after the first num_non_aux_variables columns) are ignored.
+
+        Returns:
+            group_mask (shape (batch_size, num_query_groups)): Boolean array (or tensor, if var_mask is a tensor), True
+                where the query group contains a variable that is nonzero in var_mask.
+        """
+        if var_mask.ndim != 2:
+            raise ValueError("Mask should be 2D, had %d dims and shape %s." % (var_mask.ndim, var_mask.shape))
+        var_mask = var_mask[:, : len(self._variables)]
+        if isinstance(var_mask, torch.Tensor):
+            incidence = torch.tensor(self.query_group_incidence, dtype=torch.float, device=var_mask.device)
+            return ((var_mask != 0).to(torch.float) @ incidence) > 0
+        return ((np.asarray(var_mask) != 0).astype(np.float32) @ self.query_group_incidence.astype(np.float32)) > 0
+
+    @overload
+    def get_observable_groups_mask(self, data_mask: np.ndarray, obs_mask: np.ndarray) -> np.ndarray:
+        ...
+
+    @overload
+    def get_observable_groups_mask(self, data_mask: torch.Tensor, obs_mask: torch.Tensor) -> torch.Tensor:
+        ...
+
+    def get_observable_groups_mask(self, data_mask, obs_mask):
+        """
+        Get a mask of the query groups that are still observable in each row, for a whole batch of rows at once.
+
+        Args:
+            data_mask (shape (batch_size, num_non_aux_variables)): Contains 1 for observed variables and 0 for
+                unobserved in the underlying data.
+            obs_mask (shape (batch_size, num_non_aux_variables)): Contains 1 for variables observed during active
+                learning and 0 for ones unobserved.
+
+        Returns:
+            observable_groups_mask (shape (batch_size, num_query_groups)): Boolean array (or tensor, if the masks are
+                tensors), True where the group can be observed, with groups ordered as in `self.query_group_names`.
+        """
+        if data_mask.ndim != 2 or obs_mask.ndim != 2:
+            raise ValueError(
+                "Masks should be 2D, had shapes %s (data_mask) and %s (obs_mask)." % (data_mask.shape, obs_mask.shape)
+            )
+        if data_mask.shape != obs_mask.shape or data_mask.shape[1] != len(self._variables):
+            # One likely cause is accidentally passing 'processed' masks, which may be longer
+            # if some variables are categorical.
+            raise ValueError(
+                "Shapes of data_mask %s and obs_mask %s should be the same, with the number of columns equal to the "
+                "length of the variables list (%d)." % (data_mask.shape, obs_mask.shape, len(self._variables))
+            )
+        # Variables with an underlying data value (data_mask == 1), that we haven't yet queried (obs_mask == 0) and
+        # which are queriable.
+        if isinstance(data_mask, torch.Tensor):
+            is_query_var = torch.tensor(self.is_query_var, device=data_mask.device)
+        else:
+            is_query_var = self.is_query_var
+        observable_vars = (data_mask == 1) & (obs_mask == 0) & is_query_var
+        return self.any_var_in_query_groups(observable_vars)
+
     def get_observable_groups(self, data_mask_row: np.ndarray, obs_mask_row: np.ndarray) -> List[int]:
         """
-        Get list of indices for groups that are still observable in the current row
+        Get list of indices for groups that are still observable in the current row. For a batch of rows, use
+        `get_observable_groups_mask` instead.
         Args:
             data_mask_row: 1D numpy array containing 1 for observed variables and 0 for unobserved in the underlying data
             obs_mask_row: 1D numpy array containing 1 for variables observed during active learning and 0 for ones unobserved
@@ -628,12 +728,9 @@ class Variables:
             list of indices of groups that can be observed, where the indices correspond to the corresponding group 
             names in `self.query_group_names`.
         """
-        observable_variables_idxs = self.get_observable_variable_idxs(data_mask_row, obs_mask_row)
-        observable_groups_idxs: List[int] = []
-        for group_idx, idxs in enumerate(self.query_group_idxs):
-            if any([i in observable_variables_idxs for i in idxs]):
-                observable_groups_idxs.append(group_idx)
-        return observable_groups_idxs
+        self._check_mask_rows(data_mask_row, obs_mask_row)
+        observable_groups_mask = self.get_observable_groups_mask(data_mask_row[np.newaxis], obs_mask_row[np.newaxis])
+        return np.flatnonzero(observable_groups_mask[0]).tolist()
 
     def get_observable_variable_idxs(self, data_mask_row: np.ndarray, obs_mask_row: np.ndarray) -> List[int]:
         """
@@ -645,6 +742,12 @@ class Variables:
         Returns:
             observable_vars: List of indices of variables that can be observed.
         """
+        self._check_mask_rows(data_mask_row, obs_mask_row)
+        # Get ids where there is an underlying data value (test_mask == 1) and that we haven't yet queried (obs_mask == 0)
+        # and which are queriable.
+        return np.flatnonzero((data_mask_row == 1) & (obs_mask_row == 0) & self.is_query_var).tolist()
+
+    def _check_mask_rows(self, data_mask_row: np.ndarray, obs_mask_row: np.ndarray) -> None:
         if data_mask_row.ndim != 1:
             raise ValueError(
                 "Test mask should be 1D, had %d dims and shape %s." % (data_mask_row.ndim, data_mask_row.shape)
@@ -661,12 +764,6 @@ class Variables:
                 "and variables list (%d) should all be the same."
                 % (len(obs_mask_row), len(data_mask_row), len(self._variables))
             )
-        # Get ids where there is an underlying data value (test_mask == 1) and that we haven't yet queried (obs_mask == 0)
-        unobserved_idxs = np.where((data_mask_row == 1) & (obs_mask_row == 0))[0]
-
-        # Intersection of these and query_var_idxs.
-        observable_idx_set = set(unobserved_idxs).intersection(set(self.query_var_idxs))
-        return list(observable_idx_set)
 
     @overload
     def get_var_cols_from_data(self, var_idx: int, data: np.ndarray) -> np.ndarray:
@@ -740,6 +837,17 @@ class Variables:
         return empty_data
 
 
+class _ColsByType(defaultdict):
+    """
+    Cached mapping from variable type to column indices, as returned by e.g. `Variables.processed_cols_by_type`.
+    Looking up a type with no variables returns an empty list, as for a defaultdict, but without inserting the key,
+    so that lookups by one caller do not change the cached mapping seen by others.
+    """
+
+    def __missing__(self, key: str) -> list:
+        return []
+
+
 class Variable:
     """
     Class representing a variable for the model.
@@ -1,8 +1,12 @@
+import importlib.abc
+import sys
+from types import ModuleType
 from typing import Any, Callable, Dict, List, Optional
 
 from dependency_injector import containers, providers
 
 from .imetrics_logger import IMetricsLogger, ISystemMetricsLogger
+from .profiler import ExperimentProfiler
 
 
 def mock_download_dataset(dataset_name: str, data_dir: str):
@@ -56,6 +60,8 @@ class AzuaContext(containers.DeclarativeContainer):
     # System metrics logger used for a run
     sys_mock_metric_logger = MockSystemMetricsLogger()  # type:ISystemMetricsLogger
     system_metrics_logger = providers.Object(sys_mock_metric_logger)
+    # Profiler recording the time and memory used by each phase of a run. Enabled by the run's arguments.
+    profiler = providers.Object(ExperimentProfiler(enabled=False))
     # Evaluation pipeline used for a run
     # If no evaluation pipeline used, None is passed
     pipeline = providers.Object(None)  # type:ignore # TODO: Add typing by adding IEvaluationPipeline to azua/?
@@ -67,3 +73,60 @@ class AzuaContext(containers.DeclarativeContainer):
     # it can be transferred to the cloud, where it can be run
     # b) in running mode, the method is simply run
     aml_step = providers.Callable(aml_step)
+
+
+def wire_package(container: containers.Container, package: ModuleType) -> None:
+    """
+    Wire the container to the modules of package that are already imported, and to the modules of package imported
+    later, when they are imported. Unlike container.wire(packages=[package]), this does not import the whole package,
+    so e.g. models are only imported (with their dependencies) when they are used.
+
+    Calling this again for the same package (e.g. with a new container for another run in the same process) replaces
+    the import hook installed by the previous call, so later imports are only wired to the latest container.
+    """
+    prefix = f"{package.__name__}."
+    imported_modules = [
+        module for name, module in list(sys.modules.items()) if name == package.__name__ or name.startswith(prefix)
+    ]
+    container.wire(modules=imported_modules)
+    for finder in list(sys.meta_path):
+        if isinstance(finder, _WiringFinder) and finder.prefix == prefix:
+            sys.meta_path.remove(finder)
+    sys.meta_path.insert(0, _WiringFinder(container, prefix))
+
+
+class _WiringFinder(importlib.abc.MetaPathFinder):
+    # Finds modules of a package with the other finders, and wires the container to them once they are executed.
+    def __init__(self, container: containers.Container, prefix: str):
+        self._container = container
+        self.prefix = prefix
+
+    def find_spec(self, fullname, path, target=None):
+        if not fullname.startswith(self.prefix):
+            return None
+        for finder in sys.meta_path:
+            if isinstance(finder, _WiringFinder) or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                if spec.loader is not None:
+                    spec.loader = _WiringLoader(spec.loader, self._container)
+                return spec
+        return None
+
+
+class _WiringLoader(importlib.abc.Loader):
+    def __init__(self, loader: importlib.abc.Loader, container: containers.Container):
+        self._loader = loader
+        self._container = container
+
+    def __getattr__(self, name: str) -> Any:
+        # Delegate everything else (e.g. get_source) to the wrapped loader.
+        return getattr(self._loader, name)
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        self._loader.exec_module(module)
+        self._container.wire(modules=[module])
@@ -0,0 +1,140 @@
+import json
+import queue
+import threading
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from torch.utils.tensorboard import SummaryWriter
+
+from .imetrics_logger import IMetricsLogger
+
+
+class BackgroundMetricsWriter:
+    """
+    Writes metrics to a tensorboard SummaryWriter, an optional local JSONL file and a metrics logger from a background
+    thread, so that logging does not block the training loop. Metrics queued while the thread is busy are written
+    together as one batch, followed by a single flush of the SummaryWriter and JSONL file.
+
+    Each batch is written to the JSONL file in columnar form, as one line per metric:
+    {"tag": <metric name>, "steps": [...], "values": [...]}.
+    """
+
+    _CLOSE = object()
+
+    def __init__(
+        self,
+        summary_writer: SummaryWriter,
+        metrics_logger: IMetricsLogger,
+        jsonl_path: Optional[str] = None,
+        log_every_n_steps: int = 1,
+    ):
+        """
+        Args:
+            summary_writer: tensorboard SummaryWriter to write scalars to. It is closed by close().
+            metrics_logger: Metrics logger (e.g. AzureML) to log the metrics dicts to.
+            jsonl_path: Optional path of a JSONL file to append the scalars written to tensorboard to.
+            log_every_n_steps: Downsampling of series logged with log_series: only values at steps which are multiples
+                of this are logged.
+        """
+        if log_every_n_steps < 1:
+            raise ValueError("log_every_n_steps must be positive.")
+        self.summary_writer = summary_writer
+        self.metrics_logger = metrics_logger
+        self.log_every_n_steps = log_every_n_steps
+        self._jsonl_file = None if jsonl_path is None else open(jsonl_path, "a")
+        self._queue: queue.Queue = queue.Queue()
+        self._error: Optional[Exception] = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def log(
+        self,
+        metrics: Dict[str, Any],
+        step: Optional[int] = None,
+        to_summary_writer: bool = True,
+        to_metrics_logger: bool = True,
+    ) -> None:
+        """
+        Queue a dict of metrics to be logged to the metrics logger if to_metrics_logger is True and, if
+        to_summary_writer is True, written to tensorboard and the JSONL file as scalars at the given step.
+        """
+        self._raise_error()
+        scalars = [(name, [step], [value]) for name, value in metrics.items()] if to_summary_writer else []
+        self._queue.put((scalars, metrics if to_metrics_logger else None, None))
+
+    def log_series(
+        self, series: Dict[str, Sequence[float]], start_step: int = 0, to_metrics_logger: bool = False
+    ) -> None:
+        """
+        Queue series of values, e.g. the loss terms of each inner step, to be written to tensorboard and the JSONL file,
+        with the i-th value of each series at step start_step + i. Values are downsampled to the steps which are
+        multiples of log_every_n_steps. If to_metrics_logger is True, the downsampled series are also logged to the
+        metrics logger as lists.
+        """
+        self._raise_error()
+        scalars = []
+        for name, values in series.items():
+            first_index = -start_step % self.log_every_n_steps
+            steps = list(range(start_step + first_index, start_step + len(values), self.log_every_n_steps))
+            # Slicing copies the values, so the caller is free to modify the series once this returns.
+            scalars.append((name, steps, list(values[first_index :: self.log_every_n_steps])))
+        lists = {name: values for name, _, values in scalars} if to_metrics_logger else None
+        self._queue.put((scalars, None, lists))
+
+    def close(self) -> None:
+        """
+        Write all queued metrics, stop the background thread and close the SummaryWriter and JSONL file.
+        """
+        self._queue.put(self._CLOSE)
+        self._thread.join()
+        self.summary_writer.close()
+        if self._jsonl_file is not None:
+            self._jsonl_file.close()
+        self._raise_error()
+
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def _run(self) -> None:
+        closed = False
+        while not closed:
+            items = [self._queue.get()]
+            while True:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            columns: Dict[str, Tuple[List, List]] = defaultdict(lambda: ([], []))
+            for item in items:
+                if item is self._CLOSE:
+                    closed = True
+                    break
+                if self._error is not None:
+                    continue
+                scalars, metrics, lists = item
+                try:
+                    for name, steps, values in scalars:
+                        for step, value in zip(steps, values):
+                            self.summary_writer.add_scalar(name, value, step)
+                        columns[name][0].extend(steps)
+                        columns[name][1].extend(float(value) for value in values)
+                    if metrics is not None:
+                        self.metrics_logger.log_dict(metrics)
+                    if lists is not None:
+                        for name, values in lists.items():
+                            self.metrics_logger.log_list(name, values)
+                except Exception as e:  # pylint: disable=broad-except
+                    # Re-raised in the training thread.
+                    self._error = e
+            self.summary_writer.flush()
+            if self._jsonl_file is not None and columns:
+                try:
+                    self._jsonl_file.writelines(
+                        json.dumps({"tag": name, "steps": steps, "values": values}) + "\n"
+                        for name, (steps, values) in columns.items()
+                    )
+                    self._jsonl_file.flush()
+                except Exception as e:  # pylint: disable=broad-except
+                    self._error = e
@@ -0,0 +1,121 @@
+import glob
+import logging
+import multiprocessing
+import os
+import shutil
+import traceback
+from typing import Any, Dict, List, Optional, Tuple
+
+import torch
+
+from .run_single_seed_experiment import run_single_seed_experiment, ExperimentArguments
+from .steps.step_func import clear_preloaded_data, get_load_data_key, preload_data
+
+logger = logging.getLogger(__name__)
+
+# Written by run_single_seed_experiment once an experiment has finished.
+_COMPLETED_RESULTS_FILE = "running_times.json"
+
+
+def get_job_dir(models_dir: str, job_index: int, model_seed: Any, dataset_seed: Any) -> str:
+    """
+    Return the directory holding the outputs of the job_index-th single-seed experiment of a run.
+    """
+    if isinstance(dataset_seed, (list, tuple)):
+        dataset_seed = "-".join(str(seed) for seed in dataset_seed)
+    return os.path.join(models_dir, f"job_{job_index}_model_seed_{model_seed}_dataset_seed_{dataset_seed}")
+
+
+def is_job_completed(job_dir: str) -> bool:
+    return bool(glob.glob(os.path.join(job_dir, "**", _COMPLETED_RESULTS_FILE), recursive=True))
+
+
+def run_experiment_jobs(kwargs_dicts: List[Dict[str, Any]], num_workers: int = 1) -> None:
+    """
+    Run single-seed experiments locally, in a pool of worker processes. Each experiment saves its outputs to the
+    output_dir given in its kwargs, which should be a separate directory per experiment. Experiments whose output_dir
+    already holds complete results are skipped, and partial results are removed and rerun, so an interrupted run can
+    be resumed by calling this again with the same kwargs.
+
+    Each experiment runs in a fresh process forked from this one, with torch limited to an equal share of the CPU
+    threads. Datasets are loaded before forking, and shared read-only between experiments using the same data. To
+    bound memory use, experiments are run in rounds: each round takes the experiments of the next datasets until it
+    has at least num_workers experiments, so at most num_workers datasets are held in memory at once, and releases
+    its datasets once its experiments have finished. If processes cannot be forked on this platform, the experiments
+    run one after another in this process.
+
+    Args:
+        kwargs_dicts: Keyword arguments of ExperimentArguments for each experiment.
+        num_workers: Number of experiments to run at the same time.
+    """
+    pending_kwargs = []
+    for kwargs_dict in kwargs_dicts:
+        job_dir = kwargs_dict["output_dir"]
+        if is_job_completed(job_dir):
+            logger.info(f"Skipping {job_dir}, which already has results.")
+            continue
+        if os.path.isdir(job_dir):
+            logger.info(f"Removing partial results in {job_dir}.")
+            shutil.rmtree(job_dir)
+        os.makedirs(job_dir)
+        pending_kwargs.append(kwargs_dict)
+    logger.info(f"Running {len(pending_kwargs)} of {len(kwargs_dicts)} experiments with {num_workers} workers.")
+
+    if num_workers <= 1 or "fork" not in multiprocessing.get_all_start_methods():
+        for kwargs_dict in pending_kwargs:
+            run_single_seed_experiment(ExperimentArguments(**kwargs_dict))
+        return
+
+    jobs_by_dataset: Dict[str, List[Dict[str, Any]]] = {}
+    for kwargs_dict in pending_kwargs:
+        key = get_load_data_key(*_get_load_data_args(kwargs_dict))
+        jobs_by_dataset.setdefault(key, []).append(kwargs_dict)
+    rounds: List[List[Dict[str, Any]]] = []
+    for dataset_jobs in jobs_by_dataset.values():
+        if not rounds or len(rounds[-1]) >= num_workers:
+            rounds.append([])
+        rounds[-1].extend(dataset_jobs)
+
+    num_threads = max(1, (os.cpu_count() or 1) // num_workers)
+    context = multiprocessing.get_context("fork")
+    failures = []
+    for round_kwargs in rounds:
+        for kwargs_dict in round_kwargs:
+            preload_data(*_get_load_data_args(kwargs_dict))
+        # A new process is forked for every experiment, so each starts from the state of this process, including the
+        # preloaded datasets, and no experiment sees changes made by a previous one.
+        with context.Pool(num_workers, maxtasksperchild=1) as pool:
+            failures.extend(
+                failure
+                for failure in pool.imap_unordered(
+                    _run_job, [(kwargs_dict, num_threads) for kwargs_dict in round_kwargs]
+                )
+                if failure is not None
+            )
+        clear_preloaded_data()
+    if failures:
+        for job_dir, error in failures:
+            logger.error(f"Experiment in {job_dir} failed:\n{error}")
+        raise RuntimeError(f"{len(failures)} of {len(pending_kwargs)} experiments failed. Rerun to resume them.")
+
+
+def _get_load_data_args(kwargs_dict: Dict[str, Any]) -> Tuple[Any, ...]:
+    return (
+        kwargs_dict["dataset_name"],
+        kwargs_dict["data_dir"],
+        kwargs_dict["dataset_seed"],
+        kwargs_dict["dataset_config"],
+        kwargs_dict["model_config"],
+        kwargs_dict["tiny"],
+    )
+
+
+def _run_job(job: Tuple[Dict[str, Any], int]) -> Optional[Tuple[str, str]]:
+    kwargs_dict, num_threads = job
+    torch.set_num_threads(num_threads)
+    try:
+        run_single_seed_experiment(ExperimentArguments(**kwargs_dict))
+    except Exception:  # pylint: disable=broad-except
+        # Report the failure to the parent process, and let the other experiments finish.
+        return kwargs_dict["output_dir"], traceback.format_exc()
+    return None
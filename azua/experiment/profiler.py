@@ -0,0 +1,125 @@
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+import torch
+
+try:
+    import resource
+except ImportError:  # Not available on Windows.
+    resource = None  # type: ignore
+
+
+class _PhaseStats:
+    def __init__(self):
+        self.calls = 0
+        self.time = 0.0
+        self.peak_rss_increase_mb = 0.0
+        self.cuda_peak_mb = 0.0
+        self.counts: Dict[str, float] = {}
+
+
+class ExperimentProfiler:
+    """
+    Records where time and memory go in an experiment. Code is divided into nested phases with `phase`, and for each
+    phase (identified by its path of nested phase names) the profiler accumulates the number of calls, the wall-clock
+    time, the largest increase of the peak resident set size of the process during a call, and the peak memory
+    allocated by torch on the GPU. Items processed in a phase, e.g. rows or graphs, can be counted with `count`, and are
+    reported as throughputs.
+
+    The peak resident set size is only available as a high-water mark over the lifetime of the process, so a phase
+    whose memory use stays below that of an earlier phase records no increase.
+
+    A disabled profiler does nothing, so phases can be left in the code at negligible cost.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._stats: Dict[str, _PhaseStats] = {}
+        self._stack: List[str] = []
+
+    def reset(self) -> None:
+        """
+        Forget all recorded phases.
+        """
+        self._stats = {}
+        self._stack = []
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """
+        Context manager recording a phase with the given name, nested in the currently running phase if any.
+        """
+        if not self.enabled:
+            yield
+            return
+        path = "/".join(self._stack + [name])
+        stats = self._stats.setdefault(path, _PhaseStats())
+        track_cuda = torch.cuda.is_available() and torch.cuda.is_initialized()
+        if track_cuda:
+            self._update_cuda_peaks()
+            torch.cuda.reset_peak_memory_stats()
+        self._stack.append(name)
+        start_peak_rss_mb = _get_peak_rss_mb()
+        start_time = time.time()
+        try:
+            yield
+        finally:
+            stats.time += time.time() - start_time
+            stats.calls += 1
+            self._stack.pop()
+            stats.peak_rss_increase_mb = max(stats.peak_rss_increase_mb, _get_peak_rss_mb() - start_peak_rss_mb)
+            if track_cuda:
+                stats.cuda_peak_mb = max(stats.cuda_peak_mb, torch.cuda.max_memory_allocated() / 2 ** 20)
+                # The peak of this phase is also a peak of the phases it is nested in.
+                self._update_cuda_peaks(stats.cuda_peak_mb)
+
+    def count(self, name: str, value: float) -> None:
+        """
+        Add value to the counter with the given name (e.g. "rows") of the currently running phase.
+        """
+        if not self.enabled or not self._stack:
+            return
+        counts = self._stats["/".join(self._stack)].counts
+        counts[name] = counts.get(name, 0) + value
+
+    def summary(self, prefix: str = "profile") -> Dict[str, float]:
+        """
+        Return the recorded statistics as a flat dictionary, with keys "{prefix}/{phase path}/{statistic}".
+        Statistics are calls, time_s (total time in seconds), peak_rss_increase_mb (if a call raised the peak resident
+        set size of the process), cuda_peak_mb (if CUDA was used) and "{name}_per_s" for each counter. The peak
+        resident set size of the process over its lifetime so far is reported as "{prefix}/process_peak_rss_mb".
+        """
+        summary: Dict[str, float] = {}
+        process_peak_rss_mb = _get_peak_rss_mb()
+        if process_peak_rss_mb > 0:
+            summary[f"{prefix}/process_peak_rss_mb"] = process_peak_rss_mb
+        for path, stats in self._stats.items():
+            key = f"{prefix}/{path}"
+            summary[f"{key}/calls"] = stats.calls
+            summary[f"{key}/time_s"] = stats.time
+            if stats.peak_rss_increase_mb > 0:
+                summary[f"{key}/peak_rss_increase_mb"] = stats.peak_rss_increase_mb
+            if stats.cuda_peak_mb > 0:
+                summary[f"{key}/cuda_peak_mb"] = stats.cuda_peak_mb
+            for name, value in stats.counts.items():
+                summary[f"{key}/{name}"] = value
+                if stats.time > 0:
+                    summary[f"{key}/{name}_per_s"] = value / stats.time
+        return summary
+
+    def _update_cuda_peaks(self, peak_mb: Optional[float] = None) -> None:
+        if peak_mb is None:
+            peak_mb = torch.cuda.max_memory_allocated() / 2 ** 20
+        for depth in range(1, len(self._stack) + 1):
+            stats = self._stats["/".join(self._stack[:depth])]
+            stats.cuda_peak_mb = max(stats.cuda_peak_mb, peak_mb)
+
+
+def _get_peak_rss_mb() -> float:
+    if resource is None:
+        return 0.0
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS, and in kilobytes on Linux.
+    return max_rss / 2 ** 20 if sys.platform == "darwin" else max_rss / 2 ** 10
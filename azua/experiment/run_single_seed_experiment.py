@@ -2,6 +2,7 @@ from ..datasets.dataset import CausalDataset
 from dependency_injector.wiring import Provide, inject
 from dataclasses import dataclass
 from .azua_context import AzuaContext
+from .imetrics_logger import IMetricsLogger
 import logging
 from typing import Any, Dict, List, Optional, Tuple, Union, cast
 from ..utils.io_utils import save_json, save_txt
@@ -17,6 +18,7 @@ from ..models.transformer_imputer import TransformerImputer
 import os
 import time
 import shutil
+from torch.utils.tensorboard import SummaryWriter
 
 
 @dataclass
@@ -49,6 +51,7 @@ class ExperimentArguments:
     aml_tags: Dict[str, Any]
     logger_level: str
     eval_likelihood: bool = True
+    profile: bool = False
     azua_context: AzuaContext = Provide[AzuaContext]
 
 
@@ -72,6 +75,9 @@ def run_single_seed_experiment(args: ExperimentArguments):
     metrics_logger = args.azua_context.metrics_logger()
     metrics_logger.set_tags(args.aml_tags)
     running_times: Dict[str, float] = {}
+    profiler = args.azua_context.profiler()
+    profiler.reset()
+    profiler.enabled = args.profile
 
     _clean_partial_results_in_aml_run(args.output_dir, logger, args.azua_context)
 
@@ -81,31 +87,35 @@ def run_single_seed_experiment(args: ExperimentArguments):
 
     # Load data
     logger.info("Loading data.")
-    dataset = load_data(
-        args.dataset_name, args.data_dir, args.dataset_seed, args.dataset_config, args.model_config, args.tiny
-    )
+    with profiler.phase("load_data"):
+        dataset = load_data(
+            args.dataset_name, args.data_dir, args.dataset_seed, args.dataset_config, args.model_config, args.tiny
+        )
     assert dataset.variables is not None
 
     # Preprocess configs based on args and dataset
-    preprocess_configs(args.model_config, args.train_hypers, args.model_type, dataset, args.data_dir, args.tiny)
+    with profiler.phase("preprocess_configs"):
+        preprocess_configs(args.model_config, args.train_hypers, args.model_type, dataset, args.data_dir, args.tiny)
 
     # Loading/training model
     if args.model_id is not None:
         logger.info("Loading pretrained model")
-        model = load_model(args.model_id, args.model_dir, args.device)
+        with profiler.phase("load_model"):
+            model = load_model(args.model_id, args.model_dir, args.device)
     else:
         start_time = time.time()
-        model = run_train_main(
-            logger=logger,
-            model_type=args.model_type,
-            output_dir=args.output_dir,
-            variables=dataset.variables,
-            dataset=dataset,
-            device=args.device,
-            model_config=args.model_config,
-            train_hypers=args.train_hypers,
-            metrics_logger=metrics_logger,
-        )
+        with profiler.phase("train"):
+            model = run_train_main(
+                logger=logger,
+                model_type=args.model_type,
+                output_dir=args.output_dir,
+                variables=dataset.variables,
+                dataset=dataset,
+                device=args.device,
+                model_config=args.model_config,
+                train_hypers=args.train_hypers,
+                metrics_logger=metrics_logger,
+            )
         running_times["train/running-time"] = (time.time() - start_time) / 60
     save_json(args.dataset_config, os.path.join(model.save_dir, "dataset_config.json"))
     save_txt(args.dataset_name, os.path.join(model.save_dir, "dataset_name.txt"))
@@ -124,25 +134,27 @@ def run_single_seed_experiment(args: ExperimentArguments):
             "neuropathic_pain_3",
             "neuropathic_pain_4",
         }
-        run_eval_main(
-            logger=logger,
-            model=model,
-            dataset=dataset,
-            vamp_prior_data=None,
-            impute_config=args.impute_config,
-            objective_config=args.objective_config,
-            extra_eval=args.extra_eval,
-            split_type=args.dataset_config.get("split_type", "rows"),
-            seed=args.dataset_seed if isinstance(args.dataset_seed, int) else args.dataset_seed[0],
-            metrics_logger=metrics_logger,
-            impute_train_data=impute_train_data,
-        )
+        with profiler.phase("imputation"):
+            run_eval_main(
+                logger=logger,
+                model=model,
+                dataset=dataset,
+                vamp_prior_data=None,
+                impute_config=args.impute_config,
+                objective_config=args.objective_config,
+                extra_eval=args.extra_eval,
+                split_type=args.dataset_config.get("split_type", "rows"),
+                seed=args.dataset_seed if isinstance(args.dataset_seed, int) else args.dataset_seed[0],
+                metrics_logger=metrics_logger,
+                impute_train_data=impute_train_data,
+            )
 
     # Evaluate causal discovery
     if args.causal_discovery:
         assert isinstance(model, IModelForCausalInference)
         causal_model = cast(IModelForCausalInference, model)
-        eval_causal_discovery(logger, dataset, causal_model, metrics_logger)
+        with profiler.phase("causal_discovery"):
+            eval_causal_discovery(logger, dataset, causal_model, metrics_logger)
 
     # Treatment effect estimation
     if args.treatment_effects:
@@ -151,9 +163,10 @@ def run_single_seed_experiment(args: ExperimentArguments):
         if not isinstance(dataset, CausalDataset):
             raise ValueError("This dataset type does not support treatment effect estimation.")
         preprocess_data_for_treatment = isinstance(model, DECI)
-        eval_treatment_effects(
-            logger, dataset, model, metrics_logger, args.eval_likelihood, preprocess_data_for_treatment
-        )
+        with profiler.phase("treatment_effects"):
+            eval_treatment_effects(
+                logger, dataset, model, metrics_logger, args.eval_likelihood, preprocess_data_for_treatment
+            )
 
     # Active learning
     if args.active_learning is not None:
@@ -168,27 +181,30 @@ def run_single_seed_experiment(args: ExperimentArguments):
         assert test_data is not None
         assert test_mask is not None
 
-        run_active_learning_main(
-            logger=logger,
-            model=model,
-            data=test_data,
-            mask=test_mask,
-            vamp_prior_data=None,
-            active_learning_strategies=args.active_learning,
-            objective_config=args.objective_config,
-            impute_config=args.impute_config,
-            users_to_plot=args.active_learning_users_to_plot,
-            seed=args.model_seed,
-            max_steps=args.max_steps,
-            max_rows=args.max_al_rows,
-            metrics_logger=metrics_logger,
-        )
+        with profiler.phase("active_learning"):
+            run_active_learning_main(
+                logger=logger,
+                model=model,
+                data=test_data,
+                mask=test_mask,
+                vamp_prior_data=None,
+                active_learning_strategies=args.active_learning,
+                objective_config=args.objective_config,
+                impute_config=args.impute_config,
+                users_to_plot=args.active_learning_users_to_plot,
+                seed=args.model_seed,
+                max_steps=args.max_steps,
+                max_rows=args.max_al_rows,
+                metrics_logger=metrics_logger,
+            )
         running_times["nbq/running-time"] = (time.time() - start_time) / 60
 
     # Log speed/system metrics
     system_metrics = system_metrics_logger.end_log()
     metrics_logger.log_dict(system_metrics)
     save_json(system_metrics, os.path.join(model.save_dir, "system_metrics.json"))
+    if profiler.enabled:
+        _save_profile(profiler.summary(), model.save_dir, metrics_logger)
     metrics_logger.log_dict(running_times)
     save_json(running_times, os.path.join(model.save_dir, "running_times.json"))
     metrics_logger.finalize()
@@ -198,6 +214,15 @@ def run_single_seed_experiment(args: ExperimentArguments):
     return model, args.model_config
 
 
+def _save_profile(profile: Dict[str, float], save_dir: str, metrics_logger: IMetricsLogger):
+    metrics_logger.log_dict(profile)
+    save_json(profile, os.path.join(save_dir, "profile.json"))
+    writer = SummaryWriter(os.path.join(save_dir, "profile"))
+    for name, value in profile.items():
+        writer.add_scalar(name, value, 0)
+    writer.close()
+
+
 def _clean_partial_results_in_aml_run(output_dir: str, logger: logging.Logger, azua_context: AzuaContext):
     if azua_context.is_azureml_run():
         # If node is preempted (e.g. long running exp), it's possible
@@ -71,7 +71,7 @@ def create_summary(
 
     # Summary over all seeds
     summary_dict = _get_summary_dict_from_dataframe(df)
-    result_fields = ["results", "target_results", "auic", "running_times", "system_metrics"]
+    result_fields = ["results", "target_results", "auic", "running_times", "system_metrics", "profile"]
     save_results(summary_dict, output_dir, result_fields, variables)
 
     # Summary per data split
@@ -119,6 +119,8 @@ def create_summary(
             metrics_logger.log_dict({f"all_seeds.{x}": summary_dict["system_metrics"][x]}, True)
     else:
         logger.info("No system metrics to log to AML")
+    if "profile" in summary_dict:
+        metrics_logger.log_dict({f"all_seeds.{x}": summary_dict["profile"][x] for x in summary_dict["profile"]}, True)
 
 
 def _get_summary_dict_from_dataframe(df: pd.DataFrame) -> dict:
@@ -188,6 +190,7 @@ def get_configs_and_results(model_dir: str) -> dict:
         "auic": "active_learning/auic.json",
         "running_times": "running_times.json",
         "system_metrics": "system_metrics.json",
+        "profile": "profile.json",
     }.items():
         fnames = glob.glob(os.path.join(model_dir, pattern))
         if len(fnames) > 1:
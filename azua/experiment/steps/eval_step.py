@@ -105,35 +105,23 @@ def run_eval_main(
     # Marginal log likelihood
     if extra_eval and issubclass(type(model), PVAEBaseModel):
         model = cast(PVAEBaseModel, model)
-
-        if impute_train_data:
-            train_imputation_mll = model.get_marginal_log_likelihood(
-                impute_config=impute_config,
-                data=train_data,
-                observed_mask=train_obs_mask,
-                target_mask=train_target_mask,
-                evaluate_imputation=True,
-            )
-            train_metrics["Imputation MLL"] = train_imputation_mll
-
+        splits = [(test_metrics, test_data, test_obs_mask, test_target_mask)]
         if val_data is not None:
-            val_imputation_mll = model.get_marginal_log_likelihood(
+            splits.insert(0, (val_metrics, val_data, val_obs_mask, val_target_mask))
+        if impute_train_data:
+            splits.insert(0, (train_metrics, train_data, train_obs_mask, train_target_mask))
+        for metrics, data, obs_mask, target_mask in splits:
+            imputation_mll, imputation_mll_standard_error = model.estimate_marginal_log_likelihood(
                 impute_config=impute_config,
-                data=val_data,
-                observed_mask=val_obs_mask,
-                target_mask=val_target_mask,
+                data=data,
+                observed_mask=obs_mask,
+                target_mask=target_mask,
                 evaluate_imputation=True,
+                # If set, importance sampling stops early once the standard errors are below this tolerance.
+                standard_error_tolerance=impute_config.get("mll_standard_error_tolerance"),
             )
-            val_metrics["Imputation MLL"] = val_imputation_mll
-
-        test_imputation_mll = model.get_marginal_log_likelihood(
-            impute_config=impute_config,
-            data=test_data,
-            observed_mask=test_obs_mask,
-            target_mask=test_target_mask,
-            evaluate_imputation=True,
-        )
-        test_metrics["Imputation MLL"] = test_imputation_mll
+            metrics["Imputation MLL"] = imputation_mll
+            metrics["Imputation MLL standard error"] = imputation_mll_standard_error
 
     save_confusion = len(variables.continuous_idxs) == 0
     save_train_val_test_metrics(
@@ -185,6 +173,11 @@ def run_eval_main(
         metrics_logger.log_dict({"train_data.Imputation MLL": train_metrics.get("Imputation MLL", {})})
         metrics_logger.log_dict({"val_data.Imputation MLL": val_metrics.get("Imputation MLL", {})})
         metrics_logger.log_dict({"test_data.Imputation MLL": test_metrics.get("Imputation MLL", {})})
+        for split, metrics in [("train", train_metrics), ("val", val_metrics), ("test", test_metrics)]:
+            if "Imputation MLL standard error" in metrics:
+                metrics_logger.log_dict(
+                    {f"{split}_data.Imputation MLL standard error": metrics["Imputation MLL standard error"]}
+                )
 
         # Label in AzureML with 'target' otherwise for example, MEDV.RMSE can mean two different things - they are imputations with
         # different masks. We no longer report the non-target metrics per variable, but we used to.
@@ -2,10 +2,56 @@
 # shouldn't be steps on their own, but rather be part of each step (i.e. dataset loading)
 from ...datasets.sparse_csv_dataset_loader import SparseCSVDatasetLoader
 from ...datasets.datasets_factory import create_dataset_loader
+import json
 import os
 from ...datasets.dataset import Dataset, SparseDataset, CausalDataset
 from typing import Any, Dict, Tuple, Union
 
+# Datasets loaded ahead of time by preload_data, keyed by the arguments of load_data.
+_preloaded_datasets: Dict[str, Any] = {}
+
+
+def get_load_data_key(
+    dataset_name: str,
+    data_dir: str,
+    dataset_seed: Union[int, Tuple[int, int]],
+    dataset_config: Dict[str, Any],
+    model_config: Dict[str, Any],
+    tiny: bool,
+) -> str:
+    """
+    Return the key of the dataset loaded by load_data with these arguments. Experiments with the same key use the same
+    dataset.
+    """
+    # Only the GNN dataset loaders use the model config, so datasets for other loaders can be shared between models.
+    uses_model_config = dataset_config.get("dataset_format", "csv").startswith("gnn")
+    key_args = [dataset_name, data_dir, dataset_seed, dataset_config, model_config if uses_model_config else None, tiny]
+    return json.dumps(key_args, sort_keys=True, default=str)
+
+
+def preload_data(
+    dataset_name: str,
+    data_dir: str,
+    dataset_seed: Union[int, Tuple[int, int]],
+    dataset_config: Dict[str, Any],
+    model_config: Dict[str, Any],
+    tiny: bool,
+) -> None:
+    """
+    Load a dataset and keep it in memory, so that later calls to load_data with the same arguments, including calls in
+    processes forked from this one, reuse it rather than loading it again.
+    """
+    key = get_load_data_key(dataset_name, data_dir, dataset_seed, dataset_config, model_config, tiny)
+    if key not in _preloaded_datasets:
+        _preloaded_datasets[key] = load_data(dataset_name, data_dir, dataset_seed, dataset_config, model_config, tiny)
+
+
+def clear_preloaded_data() -> None:
+    """
+    Release all datasets kept in memory by preload_data.
+    """
+    _preloaded_datasets.clear()
+
 
 def load_data(
     dataset_name: str,
@@ -15,6 +61,10 @@ def load_data(
     model_config: Dict[str, Any],
     tiny: bool,
 ):
+    key = get_load_data_key(dataset_name, data_dir, dataset_seed, dataset_config, model_config, tiny)
+    if key in _preloaded_datasets:
+        return _preloaded_datasets[key]
+
     use_predefined_dataset = dataset_config.get("use_predefined_dataset", False)
     dataset_test_fraction = dataset_config.get("test_fraction", 0.1) if not use_predefined_dataset else None
     dataset_val_fraction = dataset_config.get("val_fraction", 0.0) if not use_predefined_dataset else None
@@ -23,6 +23,7 @@ from .variational_distributions import VarDistA_Simple, VarDistA_ENCO, Determini
 from ...datasets.dataset import CausalDataset, Dataset, TemporalDataset
 from ...datasets.variables import Variables
 from ...experiment.azua_context import AzuaContext
+from ...experiment.background_metrics_writer import BackgroundMetricsWriter
 from ..imodel import (
     IModelForInterventions,
     IModelForImputation,
@@ -1083,8 +1084,14 @@ class DECI(TorchModel, IModelForInterventions, IModelForCausalInference, IModelF
         # initialise logging machinery
         train_output_dir = os.path.join(self.save_dir, "train_output")
         os.makedirs(train_output_dir, exist_ok=True)
-        writer = SummaryWriter(os.path.join(train_output_dir, "summary"), flush_secs=1)
-        metrics_logger = azua_context.metrics_logger()
+        # Metrics of every inner step are written from a background thread, downsampled to every
+        # log_every_n_steps-th inner step.
+        metrics_writer = BackgroundMetricsWriter(
+            SummaryWriter(os.path.join(train_output_dir, "summary")),
+            azua_context.metrics_logger(),
+            jsonl_path=os.path.join(train_output_dir, "metrics.jsonl"),
+            log_every_n_steps=train_config_dict.get("log_every_n_steps", 1),
+        )
 
         rho = train_config_dict["rho"]
         alpha = train_config_dict["alpha"]
@@ -1165,7 +1172,7 @@ class DECI(TorchModel, IModelForInterventions, IModelForCausalInference, IModelF
                         adj_metrics = None
 
                     base_idx = _log_epoch_metrics(
-                        metrics_logger, writer, tracker_loss_terms, adj_metrics, step, outer_step_time, base_idx
+                        metrics_writer, tracker_loss_terms, adj_metrics, step, outer_step_time, base_idx
                     )
 
             else:
@@ -1178,6 +1185,8 @@ class DECI(TorchModel, IModelForInterventions, IModelForCausalInference, IModelF
                 print("Dag penalty: %.15f" % dag_penalty)
                 print("Rho: %.2f, alpha: %.2f" % (rho, alpha))
 
+        metrics_writer.close()
+
     def optimize_inner_auglag(
         self,
         rho: float,
@@ -1285,8 +1294,7 @@ class DECI(TorchModel, IModelForInterventions, IModelForCausalInference, IModelF
 
 # Auxiliary method that loggs training metrics to AML and tensorboard
 def _log_epoch_metrics(
-    metrics_logger,
-    writer: SummaryWriter,
+    metrics_writer: BackgroundMetricsWriter,
     tracker_loss_terms: dict,
     adj_metrics: Optional[dict],
     step: int,
@@ -1296,8 +1304,7 @@ def _log_epoch_metrics(
     """
     Logging method for DECI training loop
     Args:
-        metrics_logger: azua context metrics logger
-        writer: tensorboard summarywriter used to log experiment results
+        metrics_writer: writer logging to tensorboard and the azua context metrics logger in the background
         tracker_loss_terms: dictionary containing arrays with values generated at each inner-step during the inner optimisation procedure
         adj_metrics: Optional dictionary with adjacency matrixx discovery metrics
         step: outer step number
@@ -1305,24 +1312,24 @@ def _log_epoch_metrics(
         base_idx: cummulative inner step number
     """
 
-    # iterate over tracker vectors
-    for key, value_list in tracker_loss_terms.items():
-        metrics_logger.log_list(f"step_{step}_" + key, value_list)  # AzureML
-
-        for i in range(len(tracker_loss_terms[key])):
-            writer.add_scalar(f"step_{step}_" + key, tracker_loss_terms[key][i], i)  # tensorboard
-            writer.add_scalar(key, tracker_loss_terms[key][i], i + base_idx)  # tensorboard
+    # log tracker vectors
+    metrics_writer.log_series(
+        {f"step_{step}_" + key: value_list for key, value_list in tracker_loss_terms.items()}, to_metrics_logger=True
+    )  # tensorboard and AzureML
+    metrics_writer.log_series(tracker_loss_terms, start_step=base_idx)  # tensorboard
 
-    base_idx += len(tracker_loss_terms[key])
+    base_idx += len(tracker_loss_terms["loss"])
 
     # Log time
-    metrics_logger.log_value(f"step_{step}_time", epoch_time)
-    writer.add_scalar("step_time", epoch_time, step)
+    metrics_writer.log({f"step_{step}_time": epoch_time}, to_summary_writer=False)  # AzureML
+    metrics_writer.log({"step_time": epoch_time}, step=step, to_metrics_logger=False)  # tensorboard
 
     # log adjacency matrix metrics
     if adj_metrics is not None:
+        adj_summary = {}
         for key, value in adj_metrics.items():
-            writer.add_scalar(key + "_mean", np.mean(value), step)  # tensorboard
-            writer.add_scalar(key + "std", np.std(value), step)  # tensorboard
+            adj_summary[key + "_mean"] = np.mean(value)
+            adj_summary[key + "std"] = np.std(value)
+        metrics_writer.log(adj_summary, step=step, to_metrics_logger=False)  # tensorboard
 
     return base_idx
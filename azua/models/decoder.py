@@ -80,13 +80,28 @@ class Decoder(torch.nn.Module):
         mean = self._forward_sequence(latent_sample)  # Shape (batch_size, output_dim)
 
         mean = self._featurewise_activation(mean)
-        if not self.__variance_autotune:
-            logvar = torch.full_like(mean, fill_value=self.__logvar, device=self._device)
-        else:
-            logvar = self.__trainable_logvar(mean)
+        logvar = self.get_logvar(mean)
 
         return mean, logvar
 
+    @property
+    def variance_autotune(self) -> bool:
+        return self.__variance_autotune
+
+    def get_logvar(self, mean):
+        """
+        Output log-variances of the decoder.
+
+        Args:
+            mean: Output means with shape (..., output_dimension).
+
+        Returns:
+            log_variances: shape (..., output_dimension)
+        """
+        if not self.__variance_autotune:
+            return torch.full_like(mean, fill_value=self.__logvar, device=self._device)
+        return self.__trainable_logvar(mean)
+
     def save_onnx(self, save_dir):
         raise ONNXNotImplemented
         # dummy_input = (
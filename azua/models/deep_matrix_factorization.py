@@ -12,10 +12,11 @@ from torch.nn import ReLU
 from torch.utils.tensorboard import SummaryWriter
 import torch.nn.functional as F
 from torch.utils.data import DataLoader, TensorDataset, BatchSampler, RandomSampler, SequentialSampler, Sampler
-from scipy.sparse import issparse
+from scipy.sparse import coo_matrix, csr_matrix
 
 from ..models.torch_model import TorchModel
 from ..models.model import Model
+from ..models.imodel import IModelForRecommendation
 from ..utils.torch_utils import (
     get_torch_device,
     generate_fully_connected,
@@ -27,7 +28,7 @@ from ..experiment.azua_context import AzuaContext
 from dependency_injector.wiring import Provide, inject
 
 
-class DeepMatrixFactorization(TorchModel):
+class DeepMatrixFactorization(TorchModel, IModelForRecommendation):
     """
     Deep Matrix Factorization (IJCAI 2017)
     https://www.ijcai.org/Proceedings/2017/0447.pdf
@@ -39,6 +40,7 @@ class DeepMatrixFactorization(TorchModel):
     __variables_path = "variables.json"
 
     __model_file = "model.pt"
+    _user_item_embeddings_file = "user_item_embeddings.pt"
 
     def __init__(
         self,
@@ -155,6 +157,8 @@ class DeepMatrixFactorization(TorchModel):
         epochs: int,
         loss_function: str = "BCE",
         missing_fill_val: float = 0.5,
+        cache_embeddings: bool = True,
+        negative_sampling_ratio: float = 0.0,
         azua_context: AzuaContext = Provide[AzuaContext],
     ) -> Dict[str, List[float]]:
         """
@@ -171,6 +175,10 @@ class DeepMatrixFactorization(TorchModel):
             loss_function (str): Loss function for training. Currently, only MSE and BCE are supported.
             missing_fill_val (float): TODO In current binary train_data, missing values and negative labels are both set to be 0.
                 Add argument missing_fill_val, which is in default set to be 0.5 to differentiate this.
+            cache_embeddings (bool): Whether to save the user and item representations of the best model computed from
+                the training data, so that they can be reused for scoring (see get_user_item_embeddings).
+            negative_sampling_ratio (float): Number of unobserved entries, used as negative examples with value 0, to
+                add to each minibatch of observed entries, as a fraction of the minibatch size.
         Returns:
             train_results (dictionary): Train loss for each epoch as a dictionary.
         """
@@ -190,24 +198,28 @@ class DeepMatrixFactorization(TorchModel):
         data_test, mask_test = self.data_processor.process_data_and_masks(*dataset.test_data_and_mask)
         data_val, mask_val = self.data_processor.process_data_and_masks(*dataset.val_data_and_mask)
 
-        if issparse(data):
-            data_, mask_ = data.todense(), mask.todense()
-            data_test_, mask_test_ = data_test.todense(), mask_test.todense()
-            data_val_, mask_val_ = data_val.todense(), mask_val.todense()
-
         # TODO: reuse the logic for resizing elementwise data splits in SparseCSVDatasetLoader
         # TODO: Do unit test for this
         def change_dim_data_and_mask(data_, mask_, idxs):
-            data = np.zeros((self.input_dim_item_j, self.input_dim_user_i))
-            mask = np.zeros((self.input_dim_item_j, self.input_dim_user_i))
-            data[dataset.data_split[idxs]] = data_
-            mask[dataset.data_split[idxs]] = mask_
-            return data, mask
-
-        data, mask = change_dim_data_and_mask(data_, mask_, "train_idxs")
-
-        data_test, mask_test = change_dim_data_and_mask(data_test_, mask_test_, "test_idxs")
-        data_val, mask_val = change_dim_data_and_mask(data_val_, mask_val_, "val_idxs")
+            # Place the rows of the split at their original row indices, keeping the data sparse.
+            row_idxs = np.asarray(dataset.data_split[idxs])
+            shape = (self.input_dim_item_j, self.input_dim_user_i)
+            data_, mask_ = coo_matrix(data_), coo_matrix(mask_)
+            data = csr_matrix((data_.data, (row_idxs[data_.row], data_.col)), shape=shape)
+            mask = csr_matrix((mask_.data, (row_idxs[mask_.row], mask_.col)), shape=shape)
+            mask.eliminate_zeros()
+            # User inputs are the rows of data, and item inputs its columns, so also keep the transpose as CSR.
+            return (data, data.T.tocsr()), mask
+
+        data, mask = change_dim_data_and_mask(data, mask, "train_idxs")
+
+        data_test, mask_test = change_dim_data_and_mask(data_test, mask_test, "test_idxs")
+        data_val, mask_val = change_dim_data_and_mask(data_val, mask_val, "val_idxs")
+
+        if negative_sampling_ratio > 0:
+            observed_keys = np.sort(np.ravel_multi_index(mask.nonzero(), mask.shape))
+            # Seed from the global random state, so that training stays reproducible.
+            rng = np.random.default_rng(np.random.randint(2 ** 31))
 
         results_dict: Dict[str, List] = {"training_loss": [], "training_acc": []}
 
@@ -225,10 +237,18 @@ class DeepMatrixFactorization(TorchModel):
             )
 
             for indices_i, indices_j in tqdm(dataloader, desc="Batches", disable=is_quiet):
+                indices_i, indices_j = indices_i.numpy(), indices_j.numpy()
+                if negative_sampling_ratio > 0:
+                    num_negatives = int(round(len(indices_i) * negative_sampling_ratio))
+                    negatives_i, negatives_j = self._sample_unobserved_indices(
+                        observed_keys, mask.shape, num_negatives, rng
+                    )
+                    indices_i = np.concatenate((indices_i, negatives_i))
+                    indices_j = np.concatenate((indices_j, negatives_j))
                 batch_size_ = len(indices_i)
                 mask_sum += batch_size_
 
-                total_loss, y, output = self._get_loss(data, indices_i, indices_j, loss_function, True)
+                total_loss, y, output = self._get_loss(*data, indices_i, indices_j, loss_function, True)
 
                 optimizer.zero_grad()
 
@@ -248,10 +268,12 @@ class DeepMatrixFactorization(TorchModel):
             training_acc = correct_sum / mask_sum
 
             dataloader_val = self._create_index_dataloader_for_dmf(
-                mask_val, batch_size=len(mask_val), iterations=-1, sample_randomly=False,
+                mask_val, batch_size=mask_val.shape[0], iterations=-1, sample_randomly=False,
             )
 
-            loss_val, y_val, output_val = self._get_loss(data_val, *next(iter(dataloader_val)), loss_function, False)  # type: ignore
+            loss_val, y_val, output_val = self._get_loss(  # type: ignore
+                *data_val, *next(iter(dataloader_val)), loss_function, False
+            )
             if output_val.is_cuda:
                 output_val = output_val.cpu().data.numpy()
             else:
@@ -268,11 +290,11 @@ class DeepMatrixFactorization(TorchModel):
                 best_epoch = epoch
 
                 dataloader_test = self._create_index_dataloader_for_dmf(
-                    mask_test, batch_size=len(mask_test), iterations=-1, sample_randomly=False,
+                    mask_test, batch_size=mask_test.shape[0], iterations=-1, sample_randomly=False,
                 )
 
                 loss_test, y_test, output_test = self._get_loss(
-                    data_test, *next(iter(dataloader_test)), loss_function, False  # type: ignore
+                    *data_test, *next(iter(dataloader_test)), loss_function, False  # type: ignore
                 )
 
                 y_hat_test = np.zeros(y_test.shape)
@@ -282,6 +304,8 @@ class DeepMatrixFactorization(TorchModel):
 
                 # Save model.
                 self.save()
+                if cache_embeddings:
+                    self._save_user_item_embeddings(*data)
 
             # Save useful quantities.
             writer.add_scalar("train/loss-train", training_loss_avg, epoch)
@@ -304,28 +328,155 @@ class DeepMatrixFactorization(TorchModel):
 
         return results_dict
 
+    def _save_user_item_embeddings(self, data_rows: csr_matrix, data_cols: csr_matrix, batch_size: int = 10000) -> None:
+        """
+        Compute the user and item representations p_i and q_j from the given input matrix, and save them.
+
+        Args:
+            data_rows: Sparse input data, with users as rows and items as columns.
+            data_cols: Transpose of data_rows.
+            batch_size: Number of users or items to compute the representations of at once.
+        """
+        was_training = self.training
+        with torch.no_grad():
+            self.eval()
+            user_embeddings = torch.cat(
+                [
+                    self._apply_tower(self._user_i_fnn, data_rows[i : i + batch_size])
+                    for i in range(0, data_rows.shape[0], batch_size)
+                ]
+            )
+            item_embeddings = torch.cat(
+                [
+                    self._apply_tower(self._item_j_fnn, data_cols[j : j + batch_size])
+                    for j in range(0, data_cols.shape[0], batch_size)
+                ]
+            )
+        self.train(was_training)
+        self._user_item_embeddings = (user_embeddings, item_embeddings)
+        torch.save(
+            {"user_embeddings": user_embeddings.cpu(), "item_embeddings": item_embeddings.cpu()},
+            os.path.join(self.save_dir, self._user_item_embeddings_file),
+        )
+
+    def get_user_item_embeddings(self) -> Tuple[torch.Tensor, torch.Tensor]:
+        if getattr(self, "_user_item_embeddings", None) is None:
+            embeddings_path = os.path.join(self.save_dir, self._user_item_embeddings_file)
+            if not os.path.exists(embeddings_path):
+                raise FileNotFoundError(
+                    f"No cached user and item embeddings found at {embeddings_path}. Train with cache_embeddings=True."
+                )
+            embeddings = torch.load(embeddings_path, map_location=self._device)
+            self._user_item_embeddings = (embeddings["user_embeddings"], embeddings["item_embeddings"])
+        return self._user_item_embeddings
+
+    def score_user_item_embeddings(
+        self, user_embeddings: torch.Tensor, item_embeddings: torch.Tensor, mu: float = 1e-6, eps: float = 1e-6
+    ) -> torch.Tensor:
+        """
+        Score all pairs of the given users and items by the cosine similarity of their representations, as in forward,
+        using a single matrix product.
+
+        Args:
+            user_embeddings: Shape (user_count, output_dim). User representations p_i.
+            item_embeddings: Shape (item_count, output_dim). Item representations q_j.
+            mu: A small value added to make the cosine similarity non-negative.
+            eps: A small value to avoid division by zero.
+
+        Returns:
+            Shape (user_count, item_count). Predicted values.
+        """
+        user_norms = user_embeddings.norm(dim=1, keepdim=True)
+        item_norms = item_embeddings.norm(dim=1, keepdim=True)
+        cos = (user_embeddings @ item_embeddings.T) / torch.clamp(user_norms * item_norms.T, min=eps)
+        return torch.clamp(cos, min=mu)
+
+    def _apply_tower(self, fnn: torch.nn.Module, sparse_input: csr_matrix) -> torch.Tensor:
+        """
+        Apply the user or item FNN to sparse input rows. The first linear layer is applied with torch.sparse.mm, so the
+        inputs are never densified.
+
+        Args:
+            fnn: The user or item FNN, as built by generate_fully_connected.
+            sparse_input: Sparse input rows of shape (batch_size, input_dim).
+
+        Returns:
+            Shape (batch_size, output_dim). Representations of the rows.
+        """
+        first_block = fnn[0]
+        if isinstance(first_block, torch.nn.Sequential):
+            first_linear, first_block_rest = first_block[0], first_block[1:]
+        else:
+            first_linear, first_block_rest = first_block, torch.nn.Identity()
+
+        sparse_input = sparse_input.tocoo()
+        input_tensor = torch.sparse_coo_tensor(
+            torch.as_tensor(np.vstack((sparse_input.row, sparse_input.col)), dtype=torch.long),
+            torch.as_tensor(sparse_input.data, dtype=torch.float),
+            sparse_input.shape,
+            device=self._device,
+        )
+        hidden = torch.sparse.mm(input_tensor, first_linear.weight.T) + first_linear.bias
+        return fnn[1:](first_block_rest(hidden))
+
+    def _forward_sparse(
+        self,
+        data_rows: csr_matrix,
+        data_cols: csr_matrix,
+        indices_i: np.ndarray,
+        indices_j: np.ndarray,
+        mu: float = 1e-6,
+    ) -> torch.Tensor:
+        """
+        Forward pass of deep matrix factorization for the entries (indices_i, indices_j) of a sparse input matrix.
+        Equivalent to forward with the dense rows data[indices_i, :] and columns data[:, indices_j].T as inputs.
+
+        Args:
+            data_rows: Sparse input data.
+            data_cols: Transpose of data_rows.
+            indices_i: Row indices of the entries.
+            indices_j: Column indices of the entries.
+            mu: A small value added to make the cosine similarity non-negative.
+        """
+        user_i_representation = self._apply_tower(self._user_i_fnn, data_rows[indices_i])
+        item_j_representation = self._apply_tower(self._item_j_fnn, data_cols[indices_j])
+
+        cos = self._cosine_similarity(user_i_representation, item_j_representation)
+
+        # Make sure that the return value is non-negative.
+        cos[cos < mu] = mu
+        return cos
+
     def _get_loss(
-        self, data: np.ndarray, indices_i: np.ndarray, indices_j: np.ndarray, loss_function: str, is_train: bool
+        self,
+        data_rows: csr_matrix,
+        data_cols: csr_matrix,
+        indices_i: np.ndarray,
+        indices_j: np.ndarray,
+        loss_function: str,
+        is_train: bool,
     ):
         """
         Compute loss based on minibatch dataset.
 
         Args:
-            data: Dense input data array.
+            data_rows: Sparse input data.
+            data_cols: Transpose of data_rows.
             indices_i: Indices of the rowwise input for DMF.
             indices_j: Indices of the columnwise input for DMF.
             loss_function: Type of lossfunction chosen from (MSE, BCE). 
             is_train: boolean that tells whether current computation of loss is for training for not (inference).
         """
+        indices_i, indices_j = np.asarray(indices_i), np.asarray(indices_j)
         with torch.set_grad_enabled(is_train):
             if not is_train:
                 self.eval()
 
-            input_user_i = torch.as_tensor(data[indices_i, :], dtype=torch.float, device=self._device)
-            input_item_j = torch.as_tensor(data[:, indices_j].T, dtype=torch.float, device=self._device)
-            y = torch.as_tensor(data[indices_i, indices_j], dtype=torch.float, device=self._device).flatten()
+            y = torch.as_tensor(
+                np.asarray(data_rows[indices_i, indices_j]), dtype=torch.float, device=self._device
+            ).flatten()
 
-            output = self(input_user_i, input_item_j)
+            output = self._forward_sparse(data_rows, data_cols, indices_i, indices_j)
             if loss_function == "BCE":
                 total_loss = F.binary_cross_entropy(output, y, reduction="mean")
             else:
@@ -333,6 +484,37 @@ class DeepMatrixFactorization(TorchModel):
 
         return total_loss, y, output
 
+    @staticmethod
+    def _sample_unobserved_indices(
+        observed_keys: np.ndarray, shape: Tuple[int, int], num_samples: int, rng: np.random.Generator
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Sample entries uniformly at random from the unobserved entries of a matrix.
+
+        Args:
+            observed_keys: Sorted flat (row-major) indices of the observed entries.
+            shape: Shape of the matrix.
+            num_samples: Number of entries to sample.
+            rng: Random number generator.
+
+        Returns:
+            Tuple (indices_i, indices_j) of the sampled entries.
+        """
+        num_entries = shape[0] * shape[1]
+        if num_samples == 0 or len(observed_keys) == num_entries:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        samples = np.zeros(0, dtype=np.int64)
+        # Rejection sampling: draw more candidates than needed to account for the observed ones.
+        observed_fraction = len(observed_keys) / num_entries
+        while len(samples) < num_samples:
+            num_candidates = int(np.ceil((num_samples - len(samples)) / (1 - observed_fraction) * 1.1)) + 1
+            candidates = rng.integers(num_entries, size=num_candidates)
+            if len(observed_keys) > 0:
+                positions = np.minimum(np.searchsorted(observed_keys, candidates), len(observed_keys) - 1)
+                candidates = candidates[observed_keys[positions] != candidates]
+            samples = np.concatenate((samples, candidates))
+        return np.unravel_index(samples[:num_samples], shape)
+
     # Iteratively find non-empty indices using masks and return in return it as an insance of Dataloader.
     def _create_index_dataloader_for_dmf(
         self, mask: np.ndarray, batch_size: int, iterations: int = -1, sample_randomly: bool = True
@@ -359,7 +541,8 @@ class DeepMatrixFactorization(TorchModel):
                 torch.as_tensor(data_j, dtype=torch.int),
             )
 
-        dataset = TensorDataset(*to_tensors(*np.where(mask)))
+        # mask can be dense or sparse. Sparse masks are never densified, and their entries are in row-major order.
+        dataset = TensorDataset(*to_tensors(*mask.nonzero()))
 
         row_count = len(dataset)
         max_iterations = np.ceil(row_count / batch_size)
@@ -409,15 +592,16 @@ class DeepMatrixFactorization(TorchModel):
         """
         self.eval()
         return_array = np.zeros(mask.shape)
+        data_rows = csr_matrix(data)
+        data_cols = data_rows.T.tocsr()
 
         index_dataloader = self._create_index_dataloader_for_dmf(
             mask, batch_size=batch_size, iterations=-1, sample_randomly=True
         )
         for indices_i, indices_j in tqdm(index_dataloader, desc="Batches", disable=True):
-            input_user_i = torch.as_tensor(data[indices_i, :], dtype=torch.float, device=self._device)
-            input_item_j = torch.as_tensor(data[:, indices_j].T, dtype=torch.float, device=self._device)
+            indices_i, indices_j = indices_i.numpy(), indices_j.numpy()
             with torch.no_grad():
-                output = self(input_user_i, input_item_j)
-            return_array[indices_i, indices_j] = output.numpy()
+                output = self._forward_sparse(data_rows, data_cols, indices_i, indices_j)
+            return_array[indices_i, indices_j] = output.cpu().numpy()
 
         return return_array
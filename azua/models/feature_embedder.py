@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Optional, Tuple
 
 import torch
 
@@ -67,38 +67,64 @@ class FeatureEmbedder(torch.nn.Module):
         """
 
         batch_size, _ = x.size()  # Shape (batch_size, input_dim).
-        x_flat = x.reshape(batch_size * self._input_dim, 1)
+        x_expanded = x.reshape(batch_size, self._input_dim, 1)
 
-        # Repeat weights and bias for each instance of each feature.
-        if self._metadata is not None:
-            embedding_weights_and_metadata = torch.cat((self._embedding_weights, self._metadata), dim=1)
-            repeat_embedding_weights = embedding_weights_and_metadata.repeat([batch_size, 1, 1])
-        else:
-            repeat_embedding_weights = self._embedding_weights.repeat([batch_size, 1, 1])
-
-        # Shape (batch_size * input_dim, embedding_dim)
-        repeat_embedding_weights = repeat_embedding_weights.reshape([batch_size * self._input_dim, -1])
-
-        repeat_embedding_bias = self._embedding_bias.repeat((batch_size, 1, 1))
-        repeat_embedding_bias = repeat_embedding_bias.reshape((batch_size * self._input_dim, 1))
+        # Broadcast weights and bias over the batch, without copying them for each instance of each feature.
+        embedding_weights = self._get_embedding_weights().expand(batch_size, -1, -1)
+        embedding_bias = self._embedding_bias.expand(batch_size, -1, -1)
 
         if self._multiply_weights:
             features_to_concatenate = [
-                x_flat,
-                x_flat * repeat_embedding_weights,
-                repeat_embedding_bias,
+                x_expanded,
+                x_expanded * embedding_weights,
+                embedding_bias,
             ]
         else:
             features_to_concatenate = [
-                x_flat,
-                repeat_embedding_weights,
-                repeat_embedding_bias,
+                x_expanded,
+                embedding_weights,
+                embedding_bias,
             ]
 
         # Shape (batch_size*input_dim, output_dim)
-        feature_embedded_x = torch.cat(features_to_concatenate, dim=1)
+        feature_embedded_x = torch.cat(features_to_concatenate, dim=2).reshape(batch_size * self._input_dim, -1)
         return feature_embedded_x
 
+    def _get_embedding_weights(self) -> torch.Tensor:
+        """
+        Returns:
+            embedding_weights (torch.Tensor): Feature ID embeddings, followed by the metadata if there is any, of shape
+                (input_dim, output_dim - 2).
+        """
+        if self._metadata is not None:
+            return torch.cat((self._embedding_weights, self._metadata), dim=1)
+        return self._embedding_weights
+
+    def get_feature_projection(self, linear: torch.nn.Linear) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        Fold a linear layer applied to the output of the feature embedder into a per-feature scale and offset, so that
+        it can be applied to the feature values directly, without embedding them first. The value x of feature i is
+        mapped by the linear layer to x * scale[i] + offset[i].
+
+        Args:
+            linear (torch.nn.Linear): Linear layer with input dimension output_dim.
+
+        Returns:
+            scale, offset (torch.Tensor): Each of shape (input_dim, linear.out_features).
+        """
+        weight = linear.weight  # Shape (out_features, output_dim)
+        value_weight, embedding_weight, bias_weight = weight[:, 0], weight[:, 1:-1], weight[:, -1]
+
+        # Shape (input_dim, out_features)
+        embedding_projection = torch.matmul(self._get_embedding_weights(), embedding_weight.T)
+        offset = self._embedding_bias * bias_weight + linear.bias
+        if self._multiply_weights:
+            scale = value_weight + embedding_projection
+        else:
+            scale = value_weight.expand(self._input_dim, -1)
+            offset = offset + embedding_projection
+        return scale, offset
+
     def __repr__(self):
         return f"FeatureEmbedder(input_dim={self._input_dim}, embedding_dim={self._embedding_dim}, multiply_weights={self._multiply_weights}, output_dim={self.output_dim})"
 
@@ -126,47 +152,43 @@ class SparseFeatureEmbedder(FeatureEmbedder):
         if self._metadata is not None:
             raise NotImplementedError("metadata parameter is not currently supported in SparseFeatureEmbedder.")
 
-        batch_size, _ = x.size()
-
-        # Reshape input so that the first dimension contains all input datapoints stacked on top of one another
-        x_flat = x.reshape(batch_size * self._input_dim, 1)
-        mask = mask.reshape(batch_size * self._input_dim, 1)
-
-        # Select only the observed features
-        obs_features = torch.nonzero(mask, as_tuple=False)[:, 0]
-        x_flat = x_flat[
-            obs_features,
-        ]  # shape (num_observed_features, 1)
-
-        # Repeat weights and bias for each observed instance of each feature.
-        repeat_embedding_weights = self._embedding_weights.repeat([batch_size, 1, 1])
-        repeat_embedding_weights = repeat_embedding_weights.reshape([batch_size * self._input_dim, self._embedding_dim])
+        # Select only the observed features, as (row, feature) index pairs in row-major order.
+        row_idxs, feature_idxs = get_observed_indices(mask)
+        x_obs = x[row_idxs, feature_idxs].unsqueeze(1)  # shape (num_observed_features, 1)
 
+        # Gather weights and bias for each observed instance of each feature.
         # shape (num_observed_features, embedding_dim)
-        repeat_embedding_weights = repeat_embedding_weights[
-            obs_features,
-        ]
-
-        repeat_embedding_bias = self._embedding_bias.repeat((batch_size, 1, 1))
-        repeat_embedding_bias = repeat_embedding_bias.reshape((batch_size * self._input_dim, 1))
-
+        embedding_weights = self._embedding_weights[feature_idxs]
         # shape (num_observed_features, 1)
-        repeat_embedding_bias = repeat_embedding_bias[
-            obs_features,
-        ]
+        embedding_bias = self._embedding_bias[feature_idxs]
 
         if self._multiply_weights:
             features_to_concatenate = [
-                x_flat,
-                x_flat * repeat_embedding_weights,
-                repeat_embedding_bias,
+                x_obs,
+                x_obs * embedding_weights,
+                embedding_bias,
             ]
         else:
             features_to_concatenate = [
-                x_flat,
-                repeat_embedding_weights,
-                repeat_embedding_bias,
+                x_obs,
+                embedding_weights,
+                embedding_bias,
             ]
 
         # Shape (num_observed_features, output_dim)
         return torch.cat(features_to_concatenate, dim=1)
+
+
+def get_observed_indices(mask: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+    """
+    Packed representation of the observed elements of each set, in row-major order.
+
+    Args:
+        mask (torch.Tensor): Mask of shape (batch_size, input_dim) indicating observed variables.
+            1 is observed, 0 is un-observed.
+
+    Returns:
+        row_idxs, feature_idxs (torch.Tensor): Each of shape (num_observed_features,). The set (row of mask) and the
+            feature of each observed element.
+    """
+    return torch.nonzero(mask, as_tuple=True)
@@ -1,8 +1,10 @@
 # This is required in python 3 to allow return types of the same class.
 from __future__ import annotations
 
+import functools
 import logging
 import os
+import time
 from tqdm import trange  # type: ignore
 from typing import Dict, List, Optional, Callable, Any, TypeVar, Tuple
 
@@ -13,7 +15,7 @@ import torch.nn as nn
 from torch.nn import ReLU, Linear, Sigmoid, Parameter
 from torch.utils.tensorboard import SummaryWriter
 import torch.nn.functional as F
-from torch_geometric.data import NeighborSampler
+from torch.utils.checkpoint import checkpoint
 from torch_geometric.data import Data as GraphData
 from torch_geometric.typing import Adj
 from torch_geometric.utils.dropout import dropout_adj
@@ -22,11 +24,14 @@ from transformers import BertTokenizer
 
 from ..experiment.azua_context import AzuaContext
 from ..models.torch_model import TorchModel
+from ..models.imodel import IModelForRecommendation
 from ..models.graph_convs import ConvModel, GATModel
 from ..utils.torch_utils import generate_fully_connected
 from ..utils.io_utils import save_json
+from ..utils.neighbor_sampler import PrefetchNeighborSampler, sample_full_neighborhood
 from ..datasets.variables import Variables
 from ..datasets.dataset import GraphDataset
+from ..datasets.text_embedding_store import TextEmbeddingStore
 from dependency_injector.wiring import inject, Provide
 
 # Create type variable with upper bound of `GraphNeuralNetwork`, in order to precisely specify return types of create/load
@@ -34,7 +39,7 @@ from dependency_injector.wiring import inject, Provide
 T = TypeVar("T", bound="GraphNeuralNetwork")
 
 
-class GraphNeuralNetwork(TorchModel):
+class GraphNeuralNetwork(TorchModel, IModelForRecommendation):
     """
     Graph Neural Network for recommendation
     """
@@ -44,6 +49,7 @@ class GraphNeuralNetwork(TorchModel):
     __variables_path = "variables.json"
 
     __model_file = "model.pt"
+    _node_embeddings_file = "node_embeddings.pt"
 
     def __init__(
         self,
@@ -74,6 +80,8 @@ class GraphNeuralNetwork(TorchModel):
         max_transformer_length: int,
         is_inductive_task: bool,
         aggregation_type: str,
+        text_embedding_store_dir: Optional[str] = None,
+        attention_memory_budget_mb: float = 256,
         **kwargs,
     ) -> None:
         """
@@ -119,6 +127,12 @@ class GraphNeuralNetwork(TorchModel):
                 then 'transductive', therefore is_inductive_task = False.
             aggregation_type: Message aggregation type, chosen from ("CONV", "ATTENTION"). 
                 Choosing option "CONV" corresponds to GCN and "ATTENTION" to GAT.
+            text_embedding_store_dir: Directory of the on-disk store of transformer embeddings of item sentences, used
+                when use_transformer is True. Sentences missing from the store are encoded and added to it. The store
+                keeps the embeddings in float16, so setting it changes the precision of the word embeddings. If None,
+                all sentences are encoded on each run in float32.
+            attention_memory_budget_mb: Memory budget (in MB) for the word embeddings gathered per chunk of edges
+                when computing the word attentions of CoRGi. Larger budgets use fewer, larger chunks.
         """
         super().__init__(model_id, variables, save_dir, device)
 
@@ -153,6 +167,9 @@ class GraphNeuralNetwork(TorchModel):
         self.max_transformer_length = max_transformer_length
         self.is_inductive_task = is_inductive_task
         self.aggregation_type = aggregation_type
+        self.attention_memory_budget_mb = attention_memory_budget_mb
+        # Word attention scores of the training edges, only kept when requested during training.
+        self.attention: Optional[Tensor] = None
 
         # Message passing layers and message update layers
         if separate_msg_channels_by_labels:
@@ -207,6 +224,11 @@ class GraphNeuralNetwork(TorchModel):
             assert self.corgi_attention_method in ("concat", "dot-product")
             self.tokenizer = BertTokenizer.from_pretrained(transformer_model_id)
             self.transformer_model = BertModel.from_pretrained(transformer_model_id)
+            self.text_embedding_store = (
+                None
+                if text_embedding_store_dir is None
+                else TextEmbeddingStore(text_embedding_store_dir, transformer_model_id, max_transformer_length)
+            )
 
             self.W_source = Linear(node_dim, message_dim)
             self.W_target = nn.Sequential(Linear(item_meta_dim, message_dim), nn.Dropout(node_update_dropout),)
@@ -339,9 +361,68 @@ class GraphNeuralNetwork(TorchModel):
         # Reload best saved model into this class.
         self = self.load(self.model_id, self.save_dir, self._device)
 
+    def get_node_embeddings(self) -> Tensor:
+        """
+        Get the final embeddings of all (user, item and metadata) nodes computed by the best model during training,
+        which were saved when training with cache_node_embeddings = True. The embeddings are loaded once and kept in
+        memory for repeated scoring.
+
+        Returns:
+            Shape (number_of_nodes, node_dim). Node embeddings, with users first, followed by items.
+        """
+        return self._load_node_embeddings()["node_embeddings"]
+
+    def _load_node_embeddings(self) -> Dict[str, Any]:
+        if getattr(self, "_node_embeddings", None) is None:
+            node_embeddings_path = os.path.join(self.save_dir, self._node_embeddings_file)
+            if not os.path.exists(node_embeddings_path):
+                raise FileNotFoundError(
+                    f"No cached node embeddings found at {node_embeddings_path}. Train with cache_node_embeddings=True."
+                )
+            self._node_embeddings = torch.load(node_embeddings_path, map_location=self._device)
+        return self._node_embeddings
+
+    def get_user_item_embeddings(self) -> Tuple[Tensor, Tensor]:
+        node_embeddings = self._load_node_embeddings()
+        num_users, num_items = node_embeddings["num_users"], node_embeddings["num_items"]
+        X_embeddings = node_embeddings["node_embeddings"]
+        return X_embeddings[:num_users], X_embeddings[num_users : num_users + num_items]
+
+    def score_user_item_embeddings(self, user_embeddings: Tensor, item_embeddings: Tensor) -> Tensor:
+        """
+        Score all pairs of the given users and items with the prediction MLP. The first linear layer of the MLP acts on
+        the concatenated user and item embeddings, so it is applied to the users and items separately, and the pairwise
+        inputs are never materialised.
+
+        Args:
+            user_embeddings: Shape (user_count, node_dim).
+            item_embeddings: Shape (item_count, node_dim).
+
+        Returns:
+            Shape (user_count, item_count). Predicted edge values.
+        """
+        if self.prediction_metadata_dim != 0:
+            raise NotImplementedError(
+                "score_user_item_embeddings does not support models with prediction edge metadata "
+                "(prediction_metadata_dim != 0)."
+            )
+        with torch.no_grad():
+            self.eval()
+            first_block = self.prediction_mlp[0]
+            if isinstance(first_block, nn.Sequential):
+                first_linear, first_block_rest = first_block[0], first_block[1:]
+            else:
+                first_linear, first_block_rest = first_block, nn.Identity()
+            weight_user, weight_item = first_linear.weight[:, : self.node_dim], first_linear.weight[:, self.node_dim :]
+            hidden_user = user_embeddings @ weight_user.T
+            hidden_item = item_embeddings @ weight_item.T + first_linear.bias
+            hidden = first_block_rest(hidden_user.unsqueeze(1) + hidden_item.unsqueeze(0))
+            return self.prediction_mlp[1:](hidden).squeeze(-1)
+
     def _encode_sentence_using_transformer(self, sentences: np.ndarray):
         """
-        encode a list of sentences using transformer model.
+        encode a list of sentences using transformer model. If a text embedding store is set, the token embeddings are
+        read from the store, and only sentences missing from the store are encoded (and added to the store).
 
         Args:
             sentences: List of sentences
@@ -355,22 +436,58 @@ class GraphNeuralNetwork(TorchModel):
         nonempty_idxs = [i for i, v in enumerate(sentences) if v != ""]
 
         if len(nonempty_idxs) != 0:
-            transformer_tokenized = self.tokenizer(
-                list(sentences[nonempty_idxs]),
-                return_tensors="pt",
-                truncation=True,
-                padding=True,
-                max_length=self.max_transformer_length,
-            )
-            with torch.no_grad():
-                self.transformer_model.eval()
-                transformer_output = self.transformer_model(**transformer_tokenized.to(self._device))[0]
-
-            padding_mask_ = transformer_tokenized["attention_mask"]
-            sentences_encoded[nonempty_idxs] = transformer_output
-            padding_mask[nonempty_idxs] = padding_mask_
+            nonempty_sentences = list(sentences[nonempty_idxs])
+            if self.text_embedding_store is None:
+                transformer_output, attention_mask = self._run_transformer(nonempty_sentences)
+                num_tokens = transformer_output.shape[1]
+                # Zero the embeddings of padding tokens, as they are left out of the text embedding store.
+                sentences_encoded[nonempty_idxs, :num_tokens] = transformer_output * attention_mask.unsqueeze(-1)
+                padding_mask[nonempty_idxs, :num_tokens] = attention_mask
+            else:
+                token_embeddings = self.text_embedding_store.get_or_encode(
+                    nonempty_sentences, self._run_transformer_without_padding
+                )
+                for i, embeddings in zip(nonempty_idxs, token_embeddings):
+                    num_tokens = embeddings.shape[0]
+                    sentences_encoded[i, :num_tokens] = torch.as_tensor(np.asarray(embeddings, dtype=np.float32))
+                    padding_mask[i, :num_tokens] = 1
         return sentences_encoded, padding_mask
 
+    def _run_transformer(self, sentences: List[str]) -> Tuple[Tensor, Tensor]:
+        """
+        Run the transformer model on a list of sentences.
+
+        Args:
+            sentences: List of non-empty sentences.
+
+        Returns:
+            transformer_output: Token embeddings with shape (num_sentences, num_tokens, item_meta_dim), where sentences
+                are padded to num_tokens <= max_transformer_length tokens.
+            attention_mask: Shape (num_sentences, num_tokens). 1 for the actual tokens and 0 for the padding.
+        """
+        transformer_tokenized = self.tokenizer(
+            sentences, return_tensors="pt", truncation=True, padding=True, max_length=self.max_transformer_length,
+        ).to(self._device)
+        with torch.no_grad():
+            self.transformer_model.eval()
+            transformer_output = self.transformer_model(**transformer_tokenized)[0]
+        return transformer_output, transformer_tokenized["attention_mask"]
+
+    def _run_transformer_without_padding(self, sentences: List[str]) -> List[np.ndarray]:
+        """
+        Run the transformer model on a list of sentences, for the text embedding store.
+
+        Args:
+            sentences: List of non-empty sentences.
+
+        Returns:
+            List of token embeddings of shape (num_tokens, item_meta_dim) for each sentence, without padding tokens.
+        """
+        transformer_output, attention_mask = self._run_transformer(sentences)
+        num_tokens = attention_mask.sum(dim=1).tolist()
+        transformer_output = transformer_output.cpu().numpy()
+        return [output[:n] for output, n in zip(transformer_output, num_tokens)]
+
     def _compute_node_embeddings(
         self,
         x: Tensor,
@@ -413,40 +530,82 @@ class GraphNeuralNetwork(TorchModel):
         messages = edge_attr
 
         for level, (conv, message_update, adj) in enumerate(zip(convs, message_updates, adjs)):
-            edge_index_minibatch, original_edge_index, sizes = adj
-            edge_index_minibatch = edge_index_minibatch.to(self._device)
+            x_target = self._apply_message_passing_layer(
+                level, conv, message_update, adj, x, messages, edge_dropout, num_nodes, sentences_encoded, padding_mask
+            )
+            if is_inductive:
+                x[: adj[2][1]] = x_target
+            else:
+                x = x_target
+        if is_inductive:
+            x = x_target
+        return x
+
+    def _apply_message_passing_layer(
+        self,
+        level: int,
+        conv: nn.Module,
+        message_update: nn.Module,
+        adj: Adj,
+        x: Tensor,
+        messages: Tensor,
+        edge_dropout: float,
+        num_nodes: int,
+        sentences_encoded: Tensor,
+        padding_mask: Tensor,
+    ) -> Tensor:
+        """
+        Compute the embeddings of the target nodes of adj after one message passing layer.
 
-            messages_minibatch = messages[original_edge_index].to(self._device)
+        Args:
+            level: Index of the message passing layer.
+            conv: GCN or GAT convolution of the layer.
+            message_update: message update of the layer.
+            adj: 3-tuple (edge_index_minibatch, original_edge_index, sizes), see _compute_node_embeddings.
+            x: Shape (sizes[0], dim). Embeddings of the subgraph nodes, with the target nodes first.
+            messages: Shape (number_of_edges, edge_input_dim). Edge attributes, indexed by original_edge_index.
+            edge_dropout: Edge dropout rate set for message passing (during training).
+            num_nodes: number of nodes in the data.
+            sentences_encoded: Shape (sizes[1], max_transformer_length, message_dim). Transformer outputs of the
+                sentences of the target nodes, with dimension compression using W_target.
+            padding_mask: Shape (sizes[1], max_transformer_length). Mask for sentences_encoded.
 
-            if self.update_edge_embeddings:
-                embedding_source = x[edge_index_minibatch[0]]
-                messages_minibatch = message_update(torch.cat((embedding_source, messages_minibatch), dim=-1))
+        Returns:
+            Shape (sizes[1], output_dim). Embeddings of the target nodes.
+        """
+        edge_index_minibatch, original_edge_index, sizes = adj
+        edge_index_minibatch = edge_index_minibatch.to(self._device)
 
-            if (level == len(self.convs) - 1) and self.use_transformer:
-                messages_updated, attention = self._message_update_using_transformer(
-                    messages_minibatch, edge_index_minibatch, x, sentences_encoded, padding_mask,
-                )
-                self.message_cache[original_edge_index] = messages_updated.cpu()
-                self.attention[original_edge_index] = attention
+        messages_minibatch = messages[original_edge_index].to(self._device)
 
-            # Update the edge embeddings with the edge embeddings computed using content-attentions (CA).
-            # i.e., e_{ij}^{(l)} = e_{ij}^{(l)\prime} + e_{ij, \text{CA}}^{(l)} following the notations from the CoRGi paper.
-            if self.use_transformer:
-                messages_minibatch = messages_minibatch + self.message_cache[original_edge_index].to(self._device)
+        if self.update_edge_embeddings:
+            embedding_source = x[edge_index_minibatch[0]]
+            messages_minibatch = message_update(torch.cat((embedding_source, messages_minibatch), dim=-1))
 
-            edge_index_minibatch, messages_minibatch = dropout_adj(
-                edge_index_minibatch, messages_minibatch, edge_dropout, num_nodes=num_nodes
+        if (level == len(self.convs) - 1) and self.use_transformer and edge_index_minibatch.shape[1] > 0:
+            messages_updated, attention = self._message_update_using_transformer(
+                messages_minibatch,
+                edge_index_minibatch,
+                x,
+                sentences_encoded,
+                padding_mask,
+                return_attention=self.attention is not None,
             )
+            self.message_cache[original_edge_index] = messages_updated.cpu()
+            if attention is not None:
+                self.attention[original_edge_index] = attention
 
-            x_target = x[: sizes[1]]
-            if is_inductive:
-                x_target = conv((x, x_target), edge_index_minibatch, messages_minibatch)
-                x[: sizes[1]] = x_target
-            else:
-                x = conv((x, x_target), edge_index_minibatch, messages_minibatch)
-        if is_inductive:
-            x = x_target
-        return x
+        # Update the edge embeddings with the edge embeddings computed using content-attentions (CA).
+        # i.e., e_{ij}^{(l)} = e_{ij}^{(l)\prime} + e_{ij, \text{CA}}^{(l)} following the notations from the CoRGi paper.
+        if self.use_transformer:
+            messages_minibatch = messages_minibatch + self.message_cache[original_edge_index].to(self._device)
+
+        edge_index_minibatch, messages_minibatch = dropout_adj(
+            edge_index_minibatch, messages_minibatch, edge_dropout, num_nodes=num_nodes
+        )
+
+        x_target = x[: sizes[1]]
+        return conv((x, x_target), edge_index_minibatch, messages_minibatch)
 
     def _build_convs_and_message_updates(self, separate_msg_channels_by_labels: bool):
         """
@@ -503,12 +662,17 @@ class GraphNeuralNetwork(TorchModel):
         negative_slope: float = 0.2,
         LARGE_NEGATIVE_NUMBER: int = -1000,
         eps: float = 1e-30,
-    ):
+        return_attention: bool = False,
+    ) -> Tuple[Tensor, Optional[Tensor]]:
         """
         Update messages (or, edge attributes) by the weighted sum of word embeddings from transformers
         with its corresponding word attention values.
         This part of the code corresponds to  Equations (4-6) in the CoRGi paper.
 
+        Edges are processed in chunks, so that the word embeddings gathered for each chunk of edges fit in
+        self.attention_memory_budget_mb. When computing gradients over more than one chunk, each chunk is
+        checkpointed, i.e. its gathered word embeddings are recomputed in the backward pass rather than stored.
+
         Args:
             edge_index: Edge indices of shape (2, num_edges).
             x: Shape (number_of_nodes, node_input_dim). Data to be used for the
@@ -520,7 +684,12 @@ class GraphNeuralNetwork(TorchModel):
             negative_slope: LeakyReLU negative slope.
             LARGE_NEGATIVE_NUMBER: A large negative integer used in softmax calculation for numerical stability.
             eps: A small float used in softmax calculation.
+            return_attention: Whether to also return the word attention scores of each edge.
 
+        Returns:
+            Tuple (messages_updated, attention_score). messages_updated has shape (num_edges, message_dim).
+            attention_score is a CPU tensor of shape (num_edges, max_transformer_length) if return_attention is True,
+            and None otherwise.
         """
         target_size: int = int(torch.max(edge_index_minibatch[1]).item()) + 1
 
@@ -529,48 +698,56 @@ class GraphNeuralNetwork(TorchModel):
 
         max_length = sentences_encoded.shape[1]
         messages_updated = torch.zeros(edge_index_minibatch.shape[1], self.message_dim, device=self._device)
-        attention_score_ = torch.zeros(edge_index_minibatch.shape[1], max_length)
-
-        nonempty_idxs = torch.where(padding_mask[:, 0])[0]
-
-        def torch_in1d(ar1: Tensor, ar2: Tensor):
-            if not len(ar1) or not len(ar2):
-                return torch.tensor([])
-            mask = ar2.new_zeros((max(ar1.max(), ar2.max()) + 1,), dtype=torch.bool)  # type: ignore
-            mask[ar2.unique()] = True
-            return mask[ar1]
+        attention_score_ = torch.zeros(edge_index_minibatch.shape[1], max_length) if return_attention else None
 
-        edge_index_nonempty_idx = torch.where(torch_in1d(edge_index_minibatch[1], nonempty_idxs))[0]
+        edge_index_nonempty_idx = torch.where(padding_mask[edge_index_minibatch[1], 0] != 0)[0]
         if len(edge_index_nonempty_idx) != 0:
             edge_index_minibatch_nonempty = edge_index_minibatch[:, edge_index_nonempty_idx]
-
             edge_index_target = edge_index_minibatch_nonempty[1]
 
             x = self.W_source(x)
-
             x_source = x[edge_index_minibatch_nonempty[0]]
-            sentences_target = sentences_encoded[edge_index_target]
-            padding_mask_target = padding_mask[edge_index_target]
 
             if self.corgi_attention_method == "concat":
-                att_x_source = self.W_attention[:, :, : self.message_dim] * x_source.unsqueeze(1)
-                att_sentences_target = self.W_attention[:, :, self.message_dim :] * sentences_target
-                attention_coefficient = torch.sum(att_x_source, dim=-1) + torch.sum(att_sentences_target, dim=-1)
-
+                # The attention coefficient is the sum of a source term and a target term, so the target term is
+                # computed once per target node and shared across its incoming edges.
+                source = x_source @ self.W_attention[0, 0, : self.message_dim]
+                target_term: Optional[Tensor] = sentences_encoded @ self.W_attention[0, 0, self.message_dim :]
             else:
-                attention_coefficient = torch.sum(
-                    x_source.unsqueeze(1).expand(-1, max_length, -1) * sentences_target, dim=-1
-                )
-            attention_coefficient = F.leaky_relu(attention_coefficient, negative_slope)
-
-            attention_coefficient = attention_coefficient - torch.max(attention_coefficient, dim=1)[0].unsqueeze(1)
-            attention_coefficient = attention_coefficient + (1 - padding_mask_target) * LARGE_NEGATIVE_NUMBER
-
-            attention_coefficient = torch.exp(attention_coefficient)
-            attention_score = attention_coefficient / (torch.sum(attention_coefficient, dim=1) + eps).unsqueeze(1)
-            messages_updated_nonempty_only = torch.sum(attention_score.unsqueeze(-1) * sentences_target, dim=1)
-            messages_updated[edge_index_nonempty_idx] = messages_updated_nonempty_only
-            attention_score_[edge_index_nonempty_idx] = attention_score.detach().cpu()
+                source = x_source
+                target_term = None
+
+            bytes_per_edge = 4 * max_length * (self.message_dim + 2)
+            chunk_size = max(1, int(self.attention_memory_budget_mb * 2 ** 20) // bytes_per_edge)
+            use_checkpoint = torch.is_grad_enabled() and len(edge_index_target) > chunk_size
+
+            # checkpoint saves its inputs with save_for_backward, so only tensors are passed to it, and the other
+            # arguments are bound beforehand. target_term is passed as an input when it is a tensor, so that its
+            # gradient is accumulated over the chunks in the backward pass.
+            compute_word_attention = functools.partial(
+                _compute_word_attention,
+                negative_slope=negative_slope,
+                LARGE_NEGATIVE_NUMBER=LARGE_NEGATIVE_NUMBER,
+                eps=eps,
+            )
+            tensor_args: Tuple[Tensor, ...] = ()
+            if target_term is None:
+                compute_word_attention = functools.partial(compute_word_attention, target_term=None)
+            else:
+                tensor_args = (target_term,)
+
+            messages_updated_nonempty_only = []
+            for start in range(0, len(edge_index_target), chunk_size):
+                chunk = slice(start, start + chunk_size)
+                args = (sentences_encoded, padding_mask, edge_index_target[chunk], source[chunk], *tensor_args)
+                if use_checkpoint:
+                    messages_chunk, attention_score = checkpoint(compute_word_attention, *args)
+                else:
+                    messages_chunk, attention_score = compute_word_attention(*args)
+                messages_updated_nonempty_only.append(messages_chunk)
+                if attention_score_ is not None:
+                    attention_score_[edge_index_nonempty_idx[chunk]] = attention_score.detach().cpu()
+            messages_updated[edge_index_nonempty_idx] = torch.cat(messages_updated_nonempty_only)
 
         return messages_updated, attention_score_
 
@@ -692,18 +869,9 @@ class GraphNeuralNetwork(TorchModel):
                 x[data.num_users : data.num_users + data.num_items] = encoded_item_x.cpu()
             x_small = x[n_id].to(self._device)
 
-            if self.use_transformer:
-                sentences_encoded_small = torch.zeros(
-                    len(n_id), sentences_encoded.shape[1], self.message_dim, device=self._device
-                )
-                item_ids = torch.where(n_id > data.num_users)[0]
-                sentences_encoded_small_items = sentences_encoded[n_id[item_ids] - data.num_users]
-                sentences_encoded_small_items = self.W_target(sentences_encoded_small_items.to(self._device))
-                sentences_encoded_small[item_ids] = sentences_encoded_small_items
-
-                padding_mask_small = padding_mask[n_id].to(self._device)
-            else:
-                sentences_encoded_small = padding_mask_small = torch.tensor([])
+            sentences_encoded_small, padding_mask_small = self._get_sentences_encoded_for_nodes(
+                n_id, data, sentences_encoded, padding_mask
+            )
 
             x_embeddings = self(
                 x_small,
@@ -719,6 +887,133 @@ class GraphNeuralNetwork(TorchModel):
             X_embeddings[sampled_node_idx] = x_embeddings
         return
 
+    def _get_sentences_encoded_for_nodes(
+        self, n_id: Tensor, data: GraphData, sentences_encoded: Tensor, padding_mask: Tensor
+    ) -> Tuple[Tensor, Tensor]:
+        """
+        Get the transformer outputs of the sentences of the given nodes, with dimension compression using W_target,
+        and their padding mask. Empty tensors are returned if self.use_transformer is False.
+
+        Args:
+            n_id: node IDs.
+            data: GraphData.
+            sentences_encoded: Transformer output from the text metadata for items.
+            padding_mask: Mask for the sentences_encoded.
+
+        Returns:
+            Tuple (sentences_encoded_small, padding_mask_small) with shapes (len(n_id), max_transformer_length,
+            message_dim) and (len(n_id), max_transformer_length).
+        """
+        if not self.use_transformer:
+            return torch.tensor([]), torch.tensor([])
+        sentences_encoded_small = torch.zeros(
+            len(n_id), sentences_encoded.shape[1], self.message_dim, device=self._device
+        )
+        item_ids = torch.where(n_id > data.num_users)[0]
+        sentences_encoded_small_items = sentences_encoded[n_id[item_ids] - data.num_users]
+        sentences_encoded_small_items = self.W_target(sentences_encoded_small_items.to(self._device))
+        sentences_encoded_small[item_ids] = sentences_encoded_small_items
+
+        padding_mask_small = padding_mask[n_id].to(self._device)
+        return sentences_encoded_small, padding_mask_small
+
+    def _update_X_embeddings_layerwise(
+        self,
+        X_embeddings: Tensor,
+        data: GraphData,
+        x: Tensor,
+        item_x: Tensor,
+        sentences_encoded: Tensor,
+        padding_mask: Tensor,
+        edge_index: Tensor,
+        edge_attr: Tensor,
+        chunk_size: Optional[int] = None,
+        node_idx: Optional[Tensor] = None,
+        is_inductive: bool = False,
+    ):
+        """
+        Compute node embeddings over the full graph, one message passing layer at a time, and store them in
+        X_embeddings. Each layer computes the embeddings of all target nodes, in chunks, from the full neighbourhoods
+        of the previous layer's embeddings, so every node is computed exactly once per layer and the result is
+        deterministic. This method is only used for inference, hence with self.eval().
+
+        Args:
+            X_embeddings: Shape (number_of_nodes, node_dim)
+            data: GraphData.
+            x: Shape (number_of_nodes, node_input_dim). Data to be used for the
+                forward pass. number_of_nodes corresponds to n_user + n_items.
+            item_x: Item node init embeddings from pre-trained sequence embedders. It is passed to self.item_x_encoder for
+                dim. reduction and then incorporated in x.
+            sentences_encoded: Transformer output from the text metadata for items.
+                Non-item nodes are also assigned with zeros tensors.
+            padding_mask: Mask for the sentences_encoded.
+            edge_index: Shape (2, num_edges). Edges to pass messages along.
+            edge_attr: Shape (num_edges, edge_input_dim). Edge attributes of edge_index.
+            chunk_size: Number of target nodes to compute at once. If None, all target nodes are computed at once.
+            node_idx: Target nodes to compute the embeddings of. If None, all nodes are used.
+            is_inductive: boolean telling whether the current computation is for inductive task. When True, the
+                embeddings of the target nodes are updated from X_embeddings, keeping those of other nodes fixed.
+        """
+        if node_idx is None:
+            node_idx = torch.arange(data.num_nodes)
+        if len(node_idx) == 0:
+            return
+        chunk_size = chunk_size or len(node_idx)
+        chunks = torch.split(node_idx, chunk_size)
+        # Full neighbourhoods do not change between layers, so are only computed once.
+        subgraphs = [sample_full_neighborhood(edge_index, chunk, data.num_nodes)[1:] for chunk in chunks]
+
+        if is_inductive:
+            x = X_embeddings
+        with torch.no_grad():
+            self.eval()
+            if self.node_init in ["text_init", "sbert_init", "neural_bow_init", "bert_cls_init", "bert_avg_init"]:
+                encoded_item_x = self.item_x_encoder(item_x)
+                x[data.num_users : data.num_users + data.num_items] = encoded_item_x.cpu()
+
+            def compute_layers(convs: nn.ModuleList, message_updates: nn.ModuleList, messages: Tensor) -> Tensor:
+                x_layer = x
+                for level, (conv, message_update) in enumerate(zip(convs, message_updates)):
+                    x_next: Optional[Tensor] = x_layer.clone() if is_inductive else None
+                    for chunk, (n_id, adjs) in zip(chunks, subgraphs):
+                        sentences_encoded_small, padding_mask_small = self._get_sentences_encoded_for_nodes(
+                            chunk, data, sentences_encoded, padding_mask
+                        )
+                        x_target = self._apply_message_passing_layer(
+                            level,
+                            conv,
+                            message_update,
+                            adjs[0],
+                            x_layer[n_id].to(self._device),
+                            messages,
+                            0,
+                            data.num_nodes,
+                            sentences_encoded_small,
+                            padding_mask_small,
+                        )
+                        if x_next is None:
+                            x_next = torch.zeros(len(x_layer), x_target.shape[1], device=x_layer.device)
+                        x_next[chunk] = x_target.to(x_layer.device)
+                    assert x_next is not None
+                    x_layer = x_next
+                return x_layer
+
+            if self.separate_msg_channels_by_labels:
+                x_final = torch.cat(
+                    [
+                        compute_layers(
+                            self.convs[msg_type], self.message_updates[msg_type], edge_attr[:, msg_type][:, None]
+                        )
+                        for msg_type in range(self.edge_input_dim)
+                    ],
+                    dim=1,
+                )
+            else:
+                x_final = compute_layers(self.convs, self.message_updates, edge_attr)
+
+            for chunk in chunks:
+                X_embeddings[chunk] = self.node_embedding_mlp(x_final[chunk].to(self._device))
+
     def _update_X_embeddings_for_inductive_task(
         self,
         X_embeddings: Tensor,
@@ -728,6 +1023,7 @@ class GraphNeuralNetwork(TorchModel):
         sentences_encoded: Tensor,
         padding_mask: Tensor,
         dataset_type: str,
+        chunk_size: Optional[int] = None,
     ):
         """
         Computed node embeddings for the nodes that are unseen during training and only appear in
@@ -745,6 +1041,7 @@ class GraphNeuralNetwork(TorchModel):
                 Non-item nodes are also assigned with zeros tensors.
             padding_mask: Mask for the sentences_encoded. 
             dataset_type: Whether the inductive task is targeted for test or validation set.
+            chunk_size: Number of user nodes to compute at once. If None, all user nodes are computed at once.
         """
         self.eval()
         assert dataset_type in ("test", "val")
@@ -758,32 +1055,19 @@ class GraphNeuralNetwork(TorchModel):
         unique_nodes = edge_index.unique()
         unique_user_nodes = unique_nodes[unique_nodes < data.num_users]
 
-        minibatch_loader_inductive = NeighborSampler(
-            edge_index,
-            node_idx=unique_user_nodes,
-            sizes=[-1],
-            batch_size=data.num_nodes,
-            shuffle=False,
-            num_nodes=data.num_nodes,
-            num_workers=0,
-        )
-        bs_inductive, n_id_inductive, adjs_inductive = next(iter(minibatch_loader_inductive))
-        adjs_inductive = [adjs_inductive] * len(self.convs)
-
-        self._update_X_embeddings(
+        # The users are only connected to items, whose embeddings stay fixed, so the users can be computed in chunks.
+        self._update_X_embeddings_layerwise(
             X_embeddings,
-            bs_inductive,
-            n_id_inductive,
-            adjs_inductive,
             data,
             x,
             item_x,
-            0,
             sentences_encoded,
             padding_mask,
+            edge_index,
             edge_attr,
-            False,
-            True,
+            chunk_size=chunk_size,
+            node_idx=unique_user_nodes,
+            is_inductive=True,
         )
 
     @inject
@@ -800,6 +1084,11 @@ class GraphNeuralNetwork(TorchModel):
         inference_at_every: int,
         edge_dropout: float,
         test_val_heldout_ratio: float,
+        sampler_num_workers: int = 0,
+        prefetch_batches: int = 2,
+        save_attention_scores: bool = False,
+        layerwise_inference: bool = True,
+        cache_node_embeddings: bool = True,
         azua_context: AzuaContext = Provide[AzuaContext],
     ) -> Dict[str, List[float]]:
         """
@@ -822,6 +1111,15 @@ class GraphNeuralNetwork(TorchModel):
                 For prediction MLP, this rate is neglected.
             test_val_heldout_ratio: The ratio of the heldout data over the rest of the datapoints
                 for test and validation datasets. Only effective when self.is_inductive_task = True, and during inference.
+            sampler_num_workers: Number of DataLoader worker processes used for neighbour sampling.
+            prefetch_batches: Number of sampled minibatches to prepare in a background thread while the model computes
+                on the current minibatch. If 0, neighbour sampling runs synchronously.
+            save_attention_scores: Whether to keep the word attention scores of all training edges (only used when
+                self.use_transformer = True), and save them with the best model as train_attention.pt.
+            layerwise_inference: Whether to compute the node embeddings used for evaluation layer by layer over the
+                full graph (see _update_X_embeddings_layerwise), rather than from neighbour-sampled minibatches.
+            cache_node_embeddings: Whether to save the final node embeddings with the best model, so that they can be
+                reused for scoring (see get_node_embeddings).
 
         Returns:
             train_results: Train loss for each epoch as a dictionary.
@@ -845,13 +1143,16 @@ class GraphNeuralNetwork(TorchModel):
 
         if self.use_transformer:
             self.message_cache = torch.zeros(data.train_edge_attr.shape[0], self.message_dim)
-            self.attention = torch.zeros(data.train_edge_attr.shape[0], self.max_transformer_length)
+            if save_attention_scores:
+                self.attention = torch.zeros(data.train_edge_attr.shape[0], self.max_transformer_length)
 
         results_dict: Dict[str, List] = {
             "training_loss": [],
             "training_acc": [],
             "val_acc": [],
             "best_test_acc": [],
+            "sampler_time": [],
+            "compute_time": [],
         }
 
         optimizer = torch.optim.Adam(self.parameters(), lr=learning_rate)
@@ -876,19 +1177,20 @@ class GraphNeuralNetwork(TorchModel):
 
         total_iteration = 0
 
+        # The sampler builds the adjacency of the training graph once, and reshuffles the seed nodes every epoch.
+        minibatch_loader = PrefetchNeighborSampler(
+            train_edge_index,
+            sizes=neighbor_sampling_sizes,
+            batch_size=data.num_nodes // n_split,
+            num_nodes=data.num_nodes,
+            shuffle=True,
+            num_workers=sampler_num_workers,
+            prefetch_batches=prefetch_batches,
+        )
+
         for epoch in trange(epochs, desc="Epochs", disable=is_quiet):
-            minibatch_loader = NeighborSampler(
-                train_edge_index,
-                node_idx=None,
-                sizes=neighbor_sampling_sizes,
-                batch_size=data.num_nodes // n_split,
-                shuffle=True,
-                num_nodes=data.num_nodes,
-                num_workers=0,
-            )
+            epoch_start_time = time.time()
             for iteration, (bs, n_id, adjs) in enumerate(minibatch_loader):
-                if len(neighbor_sampling_sizes) == 1:
-                    adjs = [adjs]
                 self.train()
                 optimizer.zero_grad()
 
@@ -949,10 +1251,20 @@ class GraphNeuralNetwork(TorchModel):
                 if total_iteration % inference_at_every == 0:
                     if edge_dropout == 0 and self.node_update_dropout == 0 and self.prediction_dropout == 0:
                         X_embeddings_inference = X_embeddings
+                    elif layerwise_inference:
+                        self._update_X_embeddings_layerwise(
+                            X_embeddings_inference,
+                            data,
+                            x,
+                            item_x,
+                            sentences_encoded,
+                            padding_mask,
+                            train_edge_index,
+                            data.train_edge_attr,
+                            chunk_size=data.num_nodes // n_split,
+                        )
                     else:
                         for iteration_inference, (bs, n_id, adjs) in enumerate(minibatch_loader):
-                            if len(neighbor_sampling_sizes) == 1:
-                                adjs = [adjs]
                             self._update_X_embeddings(
                                 X_embeddings_inference,
                                 bs,
@@ -979,10 +1291,24 @@ class GraphNeuralNetwork(TorchModel):
                         self.val_heldout_idx = torch.cat((val_heldout_idx, val_heldout_idx))
 
                         self._update_X_embeddings_for_inductive_task(
-                            X_embeddings_inference, data, x, item_x, sentences_encoded, padding_mask, "val"
+                            X_embeddings_inference,
+                            data,
+                            x,
+                            item_x,
+                            sentences_encoded,
+                            padding_mask,
+                            "val",
+                            chunk_size=data.num_nodes // n_split,
                         )
                         self._update_X_embeddings_for_inductive_task(
-                            X_embeddings_inference, data, x, item_x, sentences_encoded, padding_mask, "test"
+                            X_embeddings_inference,
+                            data,
+                            x,
+                            item_x,
+                            sentences_encoded,
+                            padding_mask,
+                            "test",
+                            chunk_size=data.num_nodes // n_split,
                         )
 
                         if self.prediction_metadata_dim != 0:
@@ -1021,7 +1347,16 @@ class GraphNeuralNetwork(TorchModel):
                         )
                         # Save model.
                         self.save()
-                        if self.use_transformer:
+                        if cache_node_embeddings:
+                            torch.save(
+                                {
+                                    "node_embeddings": X_embeddings_inference.cpu(),
+                                    "num_users": data.num_users,
+                                    "num_items": data.num_items,
+                                },
+                                os.path.join(self.save_dir, self._node_embeddings_file),
+                            )
+                        if self.attention is not None:
                             torch.save(self.attention, os.path.join(self.train_output_dir, "train_attention.pt"))
 
                     # AzureML
@@ -1047,7 +1382,19 @@ class GraphNeuralNetwork(TorchModel):
                         logger.info("Training loss is NaN. Exiting early.")
                         break
                 total_iteration += 1
+            sampler_time = minibatch_loader.pop_sample_time()
+            compute_time = time.time() - epoch_start_time - sampler_time
+            writer.add_scalar("train/sampler-time", sampler_time, epoch)
+            writer.add_scalar("train/compute-time", compute_time, epoch)
+            results_dict["sampler_time"].append(sampler_time)
+            results_dict["compute_time"].append(compute_time)
         metrics_logger.log_dict({"test_data.all.Accuracy": best_test_acc})
+        metrics_logger.log_dict(
+            {
+                "train/sampler-time": sum(results_dict["sampler_time"]),
+                "train/compute-time": sum(results_dict["compute_time"]),
+            }
+        )
         logger.info(
             "Best model found at epoch %d, with train_loss %.4f, training_acc %.4f, val_acc %.4f, test_acc %.4f"
             % (best_epoch, best_train_loss, best_training_acc, best_val_acc, best_test_acc)
@@ -1055,3 +1402,50 @@ class GraphNeuralNetwork(TorchModel):
         writer.close()
 
         return results_dict
+
+
+def _compute_word_attention(
+    sentences_encoded: Tensor,
+    padding_mask: Tensor,
+    edge_index_target: Tensor,
+    source: Tensor,
+    target_term: Optional[Tensor],
+    negative_slope: float,
+    LARGE_NEGATIVE_NUMBER: int,
+    eps: float,
+) -> Tuple[Tensor, Tensor]:
+    """
+    Compute the word attention scores of a chunk of edges and the resulting updated messages.
+
+    Args:
+        sentences_encoded: Shape (number_of_target_nodes, max_transformer_length, message_dim).
+        padding_mask: Shape (number_of_target_nodes, max_transformer_length).
+        edge_index_target: Shape (num_edges, ). Target node of each edge.
+        source: For dot-product attention, the source node embeddings with shape (num_edges, message_dim). For concat
+            attention, the source term of the attention coefficient with shape (num_edges, ).
+        target_term: None for dot-product attention. For concat attention, the target term of the attention
+            coefficient for each target node and word, with shape (number_of_target_nodes, max_transformer_length).
+        negative_slope: LeakyReLU negative slope.
+        LARGE_NEGATIVE_NUMBER: A large negative integer used in softmax calculation for numerical stability.
+        eps: A small float used in softmax calculation.
+
+    Returns:
+        Tuple (messages_updated, attention_score) with shapes (num_edges, message_dim) and
+        (num_edges, max_transformer_length).
+    """
+    sentences_target = sentences_encoded[edge_index_target]
+    padding_mask_target = padding_mask[edge_index_target]
+
+    if target_term is None:
+        attention_coefficient = torch.bmm(sentences_target, source.unsqueeze(-1)).squeeze(-1)
+    else:
+        attention_coefficient = source.unsqueeze(1) + target_term[edge_index_target]
+    attention_coefficient = F.leaky_relu(attention_coefficient, negative_slope)
+
+    attention_coefficient = attention_coefficient - torch.max(attention_coefficient, dim=1)[0].unsqueeze(1)
+    attention_coefficient = attention_coefficient + (1 - padding_mask_target) * LARGE_NEGATIVE_NUMBER
+
+    attention_coefficient = torch.exp(attention_coefficient)
+    attention_score = attention_coefficient / (torch.sum(attention_coefficient, dim=1) + eps).unsqueeze(1)
+    messages_updated = torch.bmm(attention_score.unsqueeze(1), sentences_target).squeeze(1)
+    return messages_updated, attention_score
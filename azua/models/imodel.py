@@ -238,3 +238,21 @@ class IModelForCounterfactuals(IModel):
         Calculate the individual treatment effect on interventions on observations X.
         """
         raise NotImplementedError
+
+
+class IModelForRecommendation(IModel):
+    @abstractmethod
+    def get_user_item_embeddings(self) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        Returns cached embeddings of all users and all items, as tensors of shape (user_count, user_embedding_dim)
+        and (item_count, item_embedding_dim) on the model's device.
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    def score_user_item_embeddings(self, user_embeddings: torch.Tensor, item_embeddings: torch.Tensor) -> torch.Tensor:
+        """
+        Returns scores of shape (user_count, item_count) for all pairs of the given users and items, where a higher
+        score means a stronger recommendation.
+        """
+        raise NotImplementedError()
@@ -0,0 +1,230 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import torch
+
+from ..models.torch_imputation import impute_batches
+from ..models.torch_model import TorchModel
+from ..utils.data_mask_utils import to_tensors
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyHistogram:
+    """
+    Thread-safe histogram of latencies, with exponentially growing buckets from 0.1ms to 100s.
+    """
+
+    BUCKET_BOUNDS_MS = [0.1 * 2 ** i for i in range(21)]
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = [0] * (len(self.BUCKET_BOUNDS_MS) + 1)
+        self._total_ms = 0.0
+
+    def record(self, latency_s: float) -> None:
+        latency_ms = latency_s * 1000
+        bucket = int(np.searchsorted(self.BUCKET_BOUNDS_MS, latency_ms))
+        with self._lock:
+            self._counts[bucket] += 1
+            self._total_ms += latency_ms
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Return the number of latencies recorded, their mean, upper bounds of their 50th, 90th and 99th percentiles, and
+        the count in each bucket (keyed by the bucket's upper bound in ms, or "inf").
+        """
+        with self._lock:
+            counts = list(self._counts)
+            total_ms = self._total_ms
+        count = sum(counts)
+        summary: Dict[str, Any] = {"count": count, "mean_ms": total_ms / count if count else None}
+        cumulative_counts = np.cumsum(counts)
+        bounds = self.BUCKET_BOUNDS_MS + [float("inf")]
+        for percentile in [50, 90, 99]:
+            if count:
+                bucket = int(np.searchsorted(cumulative_counts, count * percentile / 100))
+                summary[f"p{percentile}_ms"] = bounds[bucket]
+            else:
+                summary[f"p{percentile}_ms"] = None
+        summary["buckets"] = {
+            ("inf" if bound == float("inf") else f"{bound:g}"): bucket_count
+            for bound, bucket_count in zip(bounds, counts)
+            if bucket_count
+        }
+        return summary
+
+
+class _ImputationRequest:
+    def __init__(self, data: np.ndarray, mask: np.ndarray, average: bool):
+        self.data = data
+        self.mask = mask
+        self.average = average
+        self.future: Future = Future()
+        self.received_time = time.time()
+
+
+class ImputationServer:
+    """
+    Keeps a trained model loaded and imputes requests submitted from any number of threads. Requests are queued and
+    coalesced into larger batches by a single worker thread: once a request arrives, the worker waits up to
+    max_delay_ms for more requests, or until at least max_batch_rows rows are queued, and imputes them all together.
+
+    The latency of each request is recorded, split into the time spent queueing and the time spent imputing its batch.
+    """
+
+    _CLOSE = object()
+
+    def __init__(
+        self,
+        model: TorchModel,
+        impute_config_dict: Dict[str, Any],
+        vamp_prior_data: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+        max_batch_rows: Optional[int] = None,
+        max_delay_ms: float = 5.0,
+    ):
+        """
+        Args:
+            model: Trained model to impute with. It must support torch_imputation.impute, e.g. PVAE or VAEM.
+            impute_config_dict: Imputation config, e.g. {"sample_count": 10, "batch_size": 100}.
+            vamp_prior_data: Optional unprocessed data and mask for the VampPrior of PVAE models. It is processed once,
+                when the server is created, and reused for every batch.
+            max_batch_rows: Maximum number of rows to coalesce into one batch. Defaults to the imputation config's
+                batch size. A single request larger than this is imputed on its own.
+            max_delay_ms: Maximum time a request waits for other requests to be coalesced with.
+        """
+        self.model = model
+        self.impute_config_dict = impute_config_dict
+        self.max_batch_rows = impute_config_dict["batch_size"] if max_batch_rows is None else max_batch_rows
+        self.max_delay_s = max_delay_ms / 1000
+        self._vamp_prior_kwargs: Dict[str, Any] = {}
+        if vamp_prior_data is not None:
+            processed_vamp_data_array = model.data_processor.process_data_and_masks(*vamp_prior_data)
+            # Keep processed VampPrior data on CPU, as in PVAEBaseModel.impute.
+            self._vamp_prior_kwargs["vamp_prior_data"] = to_tensors(
+                *processed_vamp_data_array, device=torch.device("cpu")
+            )
+
+        self.queue_latency = LatencyHistogram()
+        self.compute_latency = LatencyHistogram()
+        self._num_batches = 0
+        self._num_batch_rows = 0
+        self._queue: queue.Queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, data: np.ndarray, mask: np.ndarray, average: bool = True) -> Future:
+        """
+        Queue unprocessed data and mask to be imputed.
+
+        Returns:
+            Future of the imputed data, as returned by model.impute().
+        """
+        if data.ndim != 2 or data.shape != mask.shape or data.shape[0] == 0:
+            raise ValueError("Data and mask must be non-empty 2D arrays of the same shape.")
+        # Checked here, rather than when imputing, so that a malformed request fails alone instead of failing the
+        # whole batch it would be coalesced into.
+        num_cols = self.model.variables.num_unprocessed_cols
+        if data.shape[1] != num_cols:
+            raise ValueError(f"Data and mask must have {num_cols} columns, but have {data.shape[1]}.")
+        request = _ImputationRequest(data, mask, average)
+        self._queue.put(request)
+        return request.future
+
+    def impute(self, data: np.ndarray, mask: np.ndarray, average: bool = True) -> np.ndarray:
+        """
+        Impute unprocessed data and mask, waiting for the result.
+        """
+        return self.submit(data, mask, average).result()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return latency histograms of queueing and imputation, and the number and mean size of the imputed batches.
+        """
+        num_batches, num_batch_rows = self._num_batches, self._num_batch_rows
+        return {
+            "queue_latency": self.queue_latency.summary(),
+            "compute_latency": self.compute_latency.summary(),
+            "batches": num_batches,
+            "mean_batch_rows": num_batch_rows / num_batches if num_batches else None,
+        }
+
+    def close(self) -> None:
+        """
+        Impute all queued requests and stop the worker thread.
+        """
+        self._queue.put(self._CLOSE)
+        self._thread.join()
+
+    def _run(self) -> None:
+        closed = False
+        while not closed:
+            request = self._queue.get()
+            if request is self._CLOSE:
+                break
+            requests = [request]
+            rows = request.data.shape[0]
+            deadline = request.received_time + self.max_delay_s
+            while rows < self.max_batch_rows:
+                # Requests which queued up while the previous batch was imputed are taken without waiting, even if the
+                # first request's deadline has passed.
+                timeout = deadline - time.time()
+                try:
+                    request = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if request is self._CLOSE:
+                    closed = True
+                    break
+                requests.append(request)
+                rows += request.data.shape[0]
+            for average in (True, False):
+                batch_requests = [request for request in requests if request.average == average]
+                if batch_requests:
+                    self._impute_requests(batch_requests, average)
+
+    def _impute_requests(self, requests: List[_ImputationRequest], average: bool) -> None:
+        # Skip requests whose futures were cancelled while they were queued.
+        requests = [request for request in requests if request.future.set_running_or_notify_cancel()]
+        if not requests:
+            return
+        start_time = time.time()
+        for request in requests:
+            self.queue_latency.record(start_time - request.received_time)
+        try:
+            data = np.concatenate([request.data for request in requests], axis=0)
+            mask = np.concatenate([request.mask for request in requests], axis=0)
+            imputed = np.concatenate(
+                [
+                    imputed_rows
+                    for _, imputed_rows in impute_batches(
+                        self.model,
+                        data,
+                        mask,
+                        self.impute_config_dict,
+                        average=average,
+                        show_progress=False,
+                        **self._vamp_prior_kwargs,
+                    )
+                ],
+                axis=-2,
+            )
+        except Exception as e:  # pylint: disable=broad-except
+            logger.exception("Imputation of a batch of requests failed.")
+            for request in requests:
+                request.future.set_exception(e)
+            return
+        compute_time = time.time() - start_time
+        self._num_batches += 1
+        self._num_batch_rows += data.shape[0]
+        row_start = 0
+        for request in requests:
+            row_end = row_start + request.data.shape[0]
+            self.compute_latency.record(compute_time)
+            request.future.set_result(imputed[..., row_start:row_end, :])
+            row_start = row_end
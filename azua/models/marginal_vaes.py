@@ -5,7 +5,7 @@ from ..models.torch_vae import TorchVAE
 from ..models.vae import VAE
 from ..datasets.variables import Variables
 import os
-from typing import Any, Dict, Tuple
+from typing import Any, Dict, List, Tuple
 
 import torch
 
@@ -27,6 +27,7 @@ class MarginalVAEs(TorchVAE):
         self.vae_latent_dim = model_config_dict["latent_dim"]
         # Total processed dim
         self._output_dim = sum([var.processed_dim for var in self.variables])
+        self._variable_groups = self._create_variable_groups()
 
     def _create_marginal_vaes(self, vae_config: Dict[str, Any]) -> torch.nn.ModuleList:
         # Returns a nn.ModuleList with one VAE per variable
@@ -49,6 +50,23 @@ class MarginalVAEs(TorchVAE):
             device=self._device,
         )
 
+    def _create_variable_groups(self) -> List[Tuple[List[int], torch.Tensor]]:
+        """
+        Group variables whose marginal VAEs have the same architecture, i.e. variables with the same type and processed
+        dim, so that the VAEs of each group can be run together as a single batched network.
+
+        Returns:
+            List of (var_idxs, var_cols) tuples, one per group, where var_idxs are the indices of the variables in the
+            group and var_cols, with shape (group_size, processed_dim), their processed columns.
+        """
+        groups: Dict[Tuple[str, int], List[int]] = {}
+        for idx, variable in enumerate(self.variables):
+            groups.setdefault((variable.type, variable.processed_dim), []).append(idx)
+        return [
+            (var_idxs, torch.tensor([self.variables.processed_cols[i] for i in var_idxs], device=self._device))
+            for var_idxs in groups.values()
+        ]
+
     # CLASS METHODS #
     @classmethod
     def name(cls) -> str:
@@ -65,35 +83,31 @@ class MarginalVAEs(TorchVAE):
             mean, logvar: Latent space samples of shape (batch_size, variable_count * latent_dim).
         """
         data = input_tensors[0]
-        output_tensor_size = (data.shape[0], len(self.variables) * self.vae_latent_dim)
-        all_encoder_mean = torch.zeros(output_tensor_size, device=self._device)
-        all_encoder_logvar = torch.zeros(output_tensor_size, device=self._device)
-        for i, variable in enumerate(self.variables):  # TODO: parallelize
-            var_data = self.variables.get_var_cols_from_data(i, data)  # Shape(batch_size, processed_dim)
+        batch_size = data.shape[0]
+        all_encoder_mean = torch.zeros((batch_size, len(self.variables), self.vae_latent_dim), device=self._device)
+        all_encoder_logvar = torch.zeros_like(all_encoder_mean)
+        for var_idxs, var_cols in self._variable_groups:
+            encoders = [self._marginal_vaes[i]._encoder for i in var_idxs]
+            var_data = data[:, var_cols].transpose(0, 1)  # Shape (group_size, batch_size, processed_dim)
             # Encode data into latent space.
-            var_latent_slice = slice(self.vae_latent_dim * i, self.vae_latent_dim * i + self.vae_latent_dim)
-            all_encoder_mean[:, var_latent_slice], all_encoder_logvar[:, var_latent_slice] = self._encode_single_var(
-                i, var_data
-            )  # Each with shape (batch_size, latent_dim)
+            output = _grouped_forward([encoder._forward_sequence for encoder in encoders], var_data)
+            encoder_mean, encoder_logvar = output.chunk(2, dim=2)  # Each with shape (group_size, batch_size, latent_dim)
+            all_encoder_mean[:, var_idxs] = encoder_mean.transpose(0, 1)
+            all_encoder_logvar[:, var_idxs] = encoder_logvar.transpose(0, 1)
+        all_encoder_mean = all_encoder_mean.reshape(batch_size, -1)
+        all_encoder_logvar = all_encoder_logvar.reshape(batch_size, -1)
 
         # Allow running with mask and without
         # TODO: refactor VAEM, so not allowing running without mask anymore
         if len(input_tensors) > 1:
             # Nullify rows which are masked
             mask = input_tensors[1]
-            for idx in range(len(self.variables)):
-                var_mask = self.variables.get_var_cols_from_data(idx, mask)
-
-                rows_not_to_keep = torch.where(var_mask[:, 0] == 0)[0]
-                var_cols = slice(self.vae_latent_dim * idx, self.vae_latent_dim * idx + self.vae_latent_dim)
-                all_encoder_mean[rows_not_to_keep, var_cols] = 0
-                all_encoder_logvar[rows_not_to_keep, var_cols] = 0
+            first_cols = [self.variables.processed_cols[idx][0] for idx in range(len(self.variables))]
+            is_masked = (mask[:, first_cols] == 0).repeat_interleave(self.vae_latent_dim, dim=1)
+            all_encoder_mean = all_encoder_mean.masked_fill(is_masked, 0)
+            all_encoder_logvar = all_encoder_logvar.masked_fill(is_masked, 0)
         return all_encoder_mean, all_encoder_logvar
 
-    def _encode_single_var(self, var_idx: int, data: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
-        vae = self._marginal_vaes[var_idx]
-        return vae.encode(data)
-
     def decode(self, data: torch.Tensor, *input_tensors: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
         """
         Decoding part of Marginal VAEs
@@ -105,26 +119,56 @@ class MarginalVAEs(TorchVAE):
             mean, logvar: Output of shape (batch_size, total_processed_dim)
         """
         batch_size = data.shape[0]
-        data = data.reshape(batch_size, len(self.variables), -1).permute(1, 0, 2)
+        data = data.reshape(batch_size, len(self.variables), -1)
 
         recon_x_means = torch.zeros((batch_size, self._output_dim), device=self._device)
         recon_x_logvars = torch.zeros((batch_size, self._output_dim), device=self._device)
-        i = 0
-        for x_var_id, var_z in enumerate(data):  # TODO: parallelize
+        for var_idxs, var_cols in self._variable_groups:
+            decoders = [self._marginal_vaes[i]._decoder for i in var_idxs]
+            var_z = data[:, var_idxs].transpose(0, 1)  # Shape (group_size, batch_size, latent_dim)
             # decode data into observation space.
-            recon_x_mean, recon_x_logvar = self._decode_single_var(x_var_id, var_z)
-            num_cols = recon_x_mean.shape[1]
+            recon_x_mean = _grouped_forward([decoder._forward_sequence for decoder in decoders], var_z)
+            recon_x_mean = decoders[0]._featurewise_activation(recon_x_mean.flatten(end_dim=1)).reshape(
+                recon_x_mean.shape
+            )  # Shape (group_size, batch_size, processed_dim)
+            if decoders[0].variance_autotune:
+                recon_x_logvar = torch.stack([decoder.get_logvar(m) for decoder, m in zip(decoders, recon_x_mean)])
+            else:
+                # The decoders share the same fixed variance, set by the model config.
+                recon_x_logvar = decoders[0].get_logvar(recon_x_mean)
 
             # Add results to tensors.
-            recon_x_means[:, i : i + num_cols] = recon_x_mean
-            recon_x_logvars[:, i : i + num_cols] = recon_x_logvar
-            i += num_cols
+            recon_x_means[:, var_cols] = recon_x_mean.transpose(0, 1)
+            recon_x_logvars[:, var_cols] = recon_x_logvar.transpose(0, 1)
         return recon_x_means, recon_x_logvars
 
-    def _decode_single_var(self, var_id: int, data: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
-        vae = self._marginal_vaes[var_id]
-        return vae.decode(data)
-
     # TODO: remove once, we start using StackedEncoder and StackedDecoder which support save_onnx() method
     def save_onnx(self, save_dir: str) -> None:
         raise ONNXNotImplemented
+
+
+def _grouped_forward(networks: List[torch.nn.Module], x: torch.Tensor) -> torch.Tensor:
+    """
+    Run networks with the same architecture (as built by generate_fully_connected) on stacked inputs, one network per
+    group member. The linear layers of all networks are run together as a single batched matrix multiplication.
+
+    Args:
+        networks: Networks to run.
+        x: Inputs of the networks, with shape (group_size, batch_size, input_dim).
+
+    Returns:
+        Outputs of the networks, with shape (group_size, batch_size, output_dim).
+    """
+    network = networks[0]
+    if isinstance(network, torch.nn.Linear):
+        weight = torch.stack([n.weight for n in networks])  # Shape (group_size, output_dim, input_dim)
+        bias = torch.stack([n.bias for n in networks])  # Shape (group_size, output_dim)
+        return torch.baddbmm(bias.unsqueeze(1), x, weight.transpose(1, 2))
+    if isinstance(network, torch.nn.Sequential):
+        for layers in zip(*networks):
+            x = _grouped_forward(list(layers), x)
+        return x
+    if any(True for _ in network.parameters()):
+        raise NotImplementedError(f"Grouped forward pass is not supported for {type(network).__name__} layers.")
+    # Layers without parameters (non-linearities, dropout) are elementwise, so are applied to the whole group at once.
+    return network(x)
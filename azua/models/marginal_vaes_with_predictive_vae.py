@@ -121,6 +121,8 @@ class MarginalVAEsWithPredictiveVAE(TorchVAE):
         batch_size: int,
         iterations: int,
         epochs: int,
+        checkpoint_period_epochs: Optional[int] = None,
+        resume_from_checkpoint: bool = False,
     ) -> Dict[str, List[float]]:
         logger = logging.getLogger()
         logger.info("Training marginal VAEs.")
@@ -137,12 +139,22 @@ class MarginalVAEsWithPredictiveVAE(TorchVAE):
             batch_size=batch_size,
             iterations=iterations,
             epochs=epochs,
+            checkpoint_period_epochs=checkpoint_period_epochs,
+            resume_from_checkpoint=resume_from_checkpoint,
         )
         var_dir = os.path.join(train_output_dir, "var_id_%s" % self._y_variable.name)
         os.makedirs(var_dir, exist_ok=True)
         logger.info("Training Predictive VAE for variable %s" % self._y_variable.name)
         predictive_vae_results = self._y_vae._train(
-            dataset, var_dir, report_progress_callback, learning_rate, batch_size, iterations, epochs,
+            dataset,
+            var_dir,
+            report_progress_callback,
+            learning_rate,
+            batch_size,
+            iterations,
+            epochs,
+            checkpoint_period_epochs=checkpoint_period_epochs,
+            resume_from_checkpoint=resume_from_checkpoint,
         )
 
         # Combine both training results, and propagate back
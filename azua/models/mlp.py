@@ -21,6 +21,7 @@ from ..utils.torch_utils import (
     create_dataloader,
 )
 from ..utils.io_utils import save_json
+from ..utils.tensor_file import save_tensor_file
 
 
 class MLP(TorchModel):
@@ -135,7 +136,7 @@ class MLP(TorchModel):
                 results_dict["training_loss"].append(training_loss_avg)
                 # Save model.
                 model_path = os.path.join(self.save_dir, self._model_file)
-                torch.save(self.state_dict(), model_path)
+                save_tensor_file(model_path, self.state_dict(), metadata={"model_type": self.name()})
 
             # Save useful quantities.
             writer.add_scalar("train/loss-train", training_loss_avg, epoch)
@@ -5,7 +5,7 @@ import torch
 from torch.nn import Linear, ReLU, Sequential
 
 from ..models.set_encoder_base_model import SetEncoderBaseModel
-from ..models.feature_embedder import FeatureEmbedder, SparseFeatureEmbedder
+from ..models.feature_embedder import FeatureEmbedder, SparseFeatureEmbedder, get_observed_indices
 from ..utils.exceptions import ONNXNotImplemented
 
 
@@ -58,18 +58,13 @@ class PointNet(SetEncoderBaseModel):
         Returns:
             set_embedding: Embedded output tensor with shape (batch_size, set_embedding_dim).
         """
-        feature_embedded_x = self._feature_embedder(
-            x
-        )  # Shape (batch_size * input_dim, self._feature_embedder.output_dim)
+        # Apply the first linear layer to the feature values directly, instead of to their embeddings.
+        scale, offset = self._feature_embedder.get_feature_projection(self._forward_sequence[0])
         batch_size, _ = x.size()
-        embedded = self._forward_sequence(feature_embedded_x)
-        embedded = embedded.reshape(
-            [batch_size, self._input_dim, self._set_embedding_dim]
-        )  # Shape (batch_size, input_dim, set_embedding_dim)
+        # Shape (batch_size, input_dim, set_embedding_dim)
+        embedded = self._forward_sequence[1:](torch.addcmul(offset, x.reshape(batch_size, self._input_dim, 1), scale))
 
         mask = mask.reshape((batch_size, self._input_dim, 1))
-        mask = mask.repeat([1, 1, self._set_embedding_dim])  # Shape (batch_size, input_dim, set_embedding_dim)
-
         masked_embedding = embedded * mask  # Shape (batch_size, input_dim, set_embedding_dim)
         set_embedding = self._set_encoding_func(masked_embedding, dim=1)  # Shape (batch_size, set_embedding_dim)
 
@@ -120,20 +115,24 @@ class SparsePointNet(PointNet):
             set_embedding: Embedded output tensor with shape (batch_size, set_embedding_dim).
         """
 
-        # Shape (total_observed_features, 1 + embedding_dim + 1)
-        feature_embedded_x = self._feature_embedder(x, mask)
-
-        mask = mask.reshape(-1, 1)
-        obs_features = torch.nonzero(mask, as_tuple=False)[:, 0]
+        row_idxs, feature_idxs = get_observed_indices(mask)
         batch_size, _ = x.size()  # Shape (batch_size, input_dim).
 
+        # Apply the first linear layer to the observed feature values directly, instead of to their embeddings.
+        scale, offset = self._feature_embedder.get_feature_projection(self._forward_sequence[0])
         # Shape (total_observed_features, set_embedding_dim)
-        feature_embedded_x = self._forward_sequence(feature_embedded_x)
+        feature_embedded_x = self._forward_sequence[1:](
+            torch.addcmul(offset[feature_idxs], x[row_idxs, feature_idxs].unsqueeze(1), scale[feature_idxs])
+        )
+
+        if self._set_encoding_func is torch.sum:
+            # Sum the observed features of each set directly into the output.
+            set_embedding = torch.zeros([batch_size, self._set_embedding_dim], device=self._device)
+            return set_embedding.index_add(0, row_idxs, feature_embedded_x)
 
         # Create empty output tensor to copy sparse set embedding outputs into
-        embedded = torch.zeros([batch_size * self._input_dim, self._set_embedding_dim], device=self._device)
-        embedded[obs_features, :] = feature_embedded_x
-        embedded = embedded.reshape([batch_size, self._input_dim, self._set_embedding_dim])
+        embedded = torch.zeros([batch_size, self._input_dim, self._set_embedding_dim], device=self._device)
+        embedded[row_idxs, feature_idxs] = feature_embedded_x
         set_embedding = self._set_encoding_func(embedded, dim=1)  # Shape (batch_size, set_embedding_dim)
 
         return set_embedding
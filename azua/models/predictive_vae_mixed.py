@@ -69,6 +69,8 @@ class PredictiveVAEMixed(VAEMixed):
         score_reconstruction: bool,
         score_imputation: bool,
         lr_warmup_epochs: int = 0,
+        checkpoint_period_epochs: Optional[int] = None,
+        resume_from_checkpoint: bool = False,
     ):
         """
         Train the model using the given data.
@@ -86,6 +88,8 @@ class PredictiveVAEMixed(VAEMixed):
             train_output_dir (str): Path to save any training information to, including tensorboard summary files.
             report_progress_callback: Function to report model progress for API.        # TODO: needs to be used.
             lr_warmup_epochs: number of epochs for learning rate warmup for the dependency network
+            checkpoint_period_epochs, resume_from_checkpoint: Checkpointing of the marginal networks and dependency
+                network, as in VAEMixed. Fine-tuning the predictive VAE is short and always restarts from scratch.
         Returns:
             results_dict (dictionary): Train loss, KL divergence, and NLL for each epoch as a dictionary.
         """
@@ -109,6 +113,8 @@ class PredictiveVAEMixed(VAEMixed):
             score_imputation=score_imputation,
             rewind_to_best_epoch=rewind_to_best_epoch,
             lr_warmup_epochs=lr_warmup_epochs,
+            checkpoint_period_epochs=checkpoint_period_epochs,
+            resume_from_checkpoint=resume_from_checkpoint,
         )
 
         logger = logging.getLogger()
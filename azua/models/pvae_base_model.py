@@ -266,18 +266,20 @@ class PVAEBaseModel(TorchModel, IModelForObjective):
             proc_target_data_array, proc_target_mask_array, device=self._device
         )
 
-        # Expand target data and mask to be shape (sample_count, batch_size, feature_count)
-        proc_target_data = proc_target_data.expand(sample_count, *proc_target_data.shape)
-        proc_target_mask = proc_target_mask.expand(sample_count, *proc_target_mask.shape)
-
         # Compute PVAE outputs given input features (parameters of the Gaussian mixture)
         (dec_mean, dec_logvar), _, _ = self.reconstruct(proc_feature_data, proc_feature_mask, count=sample_count)
+        dec_mean = dec_mean.reshape(sample_count, proc_target_data.shape[0], -1)
+        dec_logvar = dec_logvar.reshape(sample_count, proc_target_data.shape[0], -1)
 
-        # Compute Gaussian negative log-likelihood per sample in sample_count
+        # Compute Gaussian negative log-likelihood of the target column per sample in sample_count. Target data and mask
+        # are broadcast over samples.
         gnll = gaussian_negative_log_likelihood(
-            proc_target_data, dec_mean, dec_logvar, mask=proc_target_mask, sum_type=None
-        )
-        gnll = gnll[:, :, target_idx]
+            proc_target_data[:, target_idx],
+            dec_mean[:, :, target_idx],
+            dec_logvar[:, :, target_idx],
+            mask=proc_target_mask[:, target_idx],
+            sum_type=None,
+        )  # Shape (sample_count, batch_size)
         predictive_ll = -gnll
         predictive_ll = torch.logsumexp(predictive_ll, dim=0) - np.log(sample_count)
         predictive_ll = predictive_ll.mean()
@@ -299,6 +301,8 @@ class PVAEBaseModel(TorchModel, IModelForObjective):
         - Imputation MLL -> imputed data given the observed data log p(x_u|x_o) if evaluate_imputation is True
         - Reconstruction MLL -> all data log p(x) otherwise
 
+        See estimate_marginal_log_likelihood, which also returns the standard error of the estimate.
+
         Args:
             impute_config: Dictionary containing options for inference.
             data: Data in unprocessed form to be used with shape (num_rows, input_dim).
@@ -308,9 +312,57 @@ class PVAEBaseModel(TorchModel, IModelForObjective):
                 If None, nothing is marked as an imputation target.
             evaluate_imputation: Whether to estimate Imputation MLL log p(x_u|x_o) or Reconstruction MLL log p(x).
             num_importance_samples: The number of importance samples to be taken.
+            **kwargs: Extra keyword arguments required by estimate_marginal_log_likelihood and reconstruct.
+        Returns:
+            marginal_log_likelihood: The estimated marginal log likelihood averaged across data points.
+        """
+        marginal_log_likelihood, _ = self.estimate_marginal_log_likelihood(
+            impute_config,
+            data,
+            observed_mask=observed_mask,
+            target_mask=target_mask,
+            evaluate_imputation=evaluate_imputation,
+            num_importance_samples=num_importance_samples,
+            **kwargs,
+        )
+        return marginal_log_likelihood
+
+    def estimate_marginal_log_likelihood(
+        self,
+        impute_config: Dict[str, int],
+        data: Union[np.ndarray, csr_matrix],
+        observed_mask: Optional[Union[np.ndarray, csr_matrix]] = None,
+        target_mask: Optional[Union[np.ndarray, csr_matrix]] = None,
+        evaluate_imputation: Optional[bool] = False,
+        num_importance_samples: int = 5000,
+        importance_samples_chunk_size: int = 500,
+        standard_error_tolerance: Optional[float] = None,
+        **kwargs
+    ) -> Tuple[float, float]:
+        """
+        Estimate marginal log-likelihood of the data using importance sampling, as in get_marginal_log_likelihood.
+
+        Importance samples are drawn in chunks, and the estimate for each row is accumulated with a running
+        log-sum-exp, so memory use is bounded by the chunk size rather than the total number of samples. The Monte
+        Carlo standard error of the estimate for each row is tracked online, so sampling can stop early once it is
+        below a tolerance.
+
+        Args:
+            impute_config: Dictionary containing options for inference.
+            data: Data in unprocessed form to be used with shape (num_rows, input_dim).
+            mask: If not None, mask indicating observed variables with shape (num_rows, input_dim). 1 is observed,
+                  0 is un-observed. If None everything is marked as observed.
+            target_mask: Values masked during imputation to use as prediction targets, where 1 is a target, 0 is not.
+                If None, nothing is marked as an imputation target.
+            evaluate_imputation: Whether to estimate Imputation MLL log p(x_u|x_o) or Reconstruction MLL log p(x).
+            num_importance_samples: The maximum number of importance samples to be taken.
+            importance_samples_chunk_size: The number of importance samples taken at once.
+            standard_error_tolerance: If not None, stop sampling for a minibatch of rows once the standard errors of the
+                estimates for all of its rows are below this value.
             **kwargs: Extra keyword arguments required by reconstruct.
         Returns:
             marginal_log_likelihood: The estimated marginal log likelihood averaged across data points.
+            standard_error: The Monte Carlo standard error of marginal_log_likelihood.
         """
         # TODO(17895): Add Generation MLL option to the marginal log-likelihood metric.
 
@@ -341,6 +393,7 @@ class PVAEBaseModel(TorchModel, IModelForObjective):
             data, observed_mask, target_mask
         )
         marginal_log_likelihood = np.empty((num_rows,), dtype=processed_data.dtype)
+        standard_error = np.empty((num_rows,), dtype=processed_data.dtype)
 
         with torch.no_grad():
             dataloader = create_dataloader(
@@ -354,24 +407,36 @@ class PVAEBaseModel(TorchModel, IModelForObjective):
                 processed_obs_mask_batch = processed_obs_mask_batch.to(self._device)
                 processed_target_mask_batch = processed_target_mask_batch.to(self._device)
 
-                log_importance_weights = self._get_log_importance_weights(
-                    processed_data_batch,
-                    processed_obs_mask_batch,
-                    processed_target_mask_batch,
-                    evaluate_imputation=cast(bool, evaluate_imputation),
-                    num_importance_samples=num_importance_samples,
-                    **kwargs,
-                )  # Shape (num_importance_samples, batch_size)
-                average_factor = torch.log(torch.tensor(num_importance_samples, dtype=torch.float))
-                marginal_log_likelihood_batch = (
-                    torch.logsumexp(log_importance_weights, dim=0) - average_factor
-                )  # Shape (batch_size,)
+                log_mean_importance_weight = RunningLogMeanExp()
+                while log_mean_importance_weight.count < num_importance_samples:
+                    log_importance_weights = self._get_log_importance_weights(
+                        processed_data_batch,
+                        processed_obs_mask_batch,
+                        processed_target_mask_batch,
+                        evaluate_imputation=cast(bool, evaluate_imputation),
+                        num_importance_samples=min(
+                            importance_samples_chunk_size, num_importance_samples - log_mean_importance_weight.count
+                        ),
+                        **kwargs,
+                    )  # Shape (chunk_size, batch_size)
+                    log_mean_importance_weight.update(log_importance_weights)
+                    if (
+                        standard_error_tolerance is not None
+                        and log_mean_importance_weight.standard_error().max().item() < standard_error_tolerance
+                    ):
+                        break
 
                 idx_start = idx * batch_size
                 idx_end = min((idx + 1) * batch_size, num_rows)
-                marginal_log_likelihood[idx_start:idx_end] = marginal_log_likelihood_batch.cpu().numpy()
-
-        return marginal_log_likelihood.sum().item() / num_rows
+                # Shape (batch_size,)
+                marginal_log_likelihood[idx_start:idx_end] = log_mean_importance_weight.value().cpu().numpy()
+                standard_error[idx_start:idx_end] = log_mean_importance_weight.standard_error().cpu().numpy()
+
+        # The estimates for different rows are independent, so their variances add up.
+        return (
+            marginal_log_likelihood.sum().item() / num_rows,
+            np.sqrt(np.square(standard_error).sum()).item() / num_rows,
+        )
 
     @abstractmethod
     def reconstruct(
@@ -521,9 +586,8 @@ class PVAEBaseModel(TorchModel, IModelForObjective):
 
         # Calculate log latent prior log[q(z|x_o)] or log[p(z)]
         if evaluate_imputation:
-            (_, _), _, (latent_prior_mean, latent_prior_logvar) = self.reconstruct(
-                data=data, mask=observed_mask, sample=False, count=1, **kwargs
-            )
+            # The encoder output given the observed data was already computed when collecting samples above.
+            latent_prior_mean, latent_prior_logvar = enc_mean, enc_logvar
         else:
             latent_prior_mean = torch.tensor(0.0)
             latent_prior_logvar = torch.log(torch.tensor(1.0))
@@ -538,3 +602,59 @@ class PVAEBaseModel(TorchModel, IModelForObjective):
             (-1) * nll + log_latent_prior - log_latent_variational
         )  # Shape (num_importance_samples, batch_size)
         return log_importance_weights
+
+
+class RunningLogMeanExp:
+    """
+    Running estimate of log(mean(exp(w))) over samples of w, for each element of a batch, with samples arriving in
+    chunks. This is the importance sampling estimate of a log marginal likelihood, given samples of the log importance
+    weights w. Also tracks the delta-method Monte Carlo standard error of the estimate.
+    """
+
+    def __init__(self):
+        self.count = 0
+        # Sums of exp(w - max_w) and exp(2 * (w - max_w)) over samples, where max_w is the largest sample so far.
+        self._max: Optional[torch.Tensor] = None
+        self._sum: Optional[torch.Tensor] = None
+        self._sum_squares: Optional[torch.Tensor] = None
+
+    def update(self, log_weights: torch.Tensor) -> None:
+        """
+        Args:
+            log_weights: New samples of w, with shape (num_samples, batch_size).
+        """
+        new_max = log_weights.max(dim=0).values
+        if self._max is not None:
+            new_max = torch.max(self._max, new_max)
+        # Avoid nans when all samples so far are -inf.
+        new_max = torch.where(torch.isfinite(new_max), new_max, torch.zeros_like(new_max))
+
+        shifted_log_weights = log_weights - new_max
+        new_sum = torch.exp(shifted_log_weights).sum(dim=0)
+        new_sum_squares = torch.exp(2 * shifted_log_weights).sum(dim=0)
+        if self._max is not None:
+            assert self._sum is not None and self._sum_squares is not None
+            rescale = torch.exp(self._max - new_max)
+            new_sum = new_sum + self._sum * rescale
+            new_sum_squares = new_sum_squares + self._sum_squares * rescale ** 2
+
+        self._max, self._sum, self._sum_squares = new_max, new_sum, new_sum_squares
+        self.count += log_weights.shape[0]
+
+    def value(self) -> torch.Tensor:
+        """
+        Returns:
+            Estimate of log(mean(exp(w))) with shape (batch_size,).
+        """
+        assert self._max is not None and self._sum is not None
+        return torch.log(self._sum) + self._max - np.log(self.count)
+
+    def standard_error(self) -> torch.Tensor:
+        """
+        Returns:
+            Standard error of the estimate of log(mean(exp(w))) with shape (batch_size,), i.e. the standard error of
+            the mean of exp(w) relative to that mean.
+        """
+        assert self._sum is not None and self._sum_squares is not None
+        relative_variance = self.count * self._sum_squares / self._sum ** 2 - 1
+        return torch.sqrt(torch.clamp(relative_variance, min=0) / self.count)
@@ -1,13 +1,20 @@
-from typing import Optional, Dict, Any, overload
+import os
+from typing import Optional, Dict, Any, Iterator, Tuple, Union, overload
 
 import numpy as np
-from scipy.sparse import csr_matrix
+from scipy.sparse import csr_matrix, issparse
 import torch
 from tqdm import tqdm
 
 from ..models.imodel import IBatchImputer
 from ..models.torch_model import TorchModel
-from ..utils.torch_utils import create_dataloader
+from ..utils.data_mask_utils import to_tensors
+
+# Default memory budget for the imputations of the rows being processed at once. Set "max_memory_mb" in the
+# imputation config to change it.
+_DEFAULT_MAX_MEMORY_MB = 1024
+# Rough memory used by each unprocessed value, which is a Python object referenced from an object array.
+_UNPROCESSED_VALUE_BYTES = 32
 
 
 @overload
@@ -40,7 +47,7 @@ def impute(model, data, mask, impute_config_dict=None, *, average=True, **vamp_p
     """
     Fill in unobserved variables using a trained model.
 
-    Processes + minibatches data and passes to impute_processed_batch().
+    Processes + minibatches data and passes to impute_processed_batch(), using impute_batches().
 
     Data should be provided in unprocessed form, and will be processed before running, and
     will be de-processed before returning (i.e. variables will be in their normal, rather than
@@ -60,51 +67,184 @@ def impute(model, data, mask, impute_config_dict=None, *, average=True, **vamp_p
             Input data with missing values filled in, returning averaged or sampled imputations depending
             on whether average=True or average=False.
     """
+    assert impute_config_dict is not None
+    num_rows = data.shape[0]
+    num_cols = model.variables.num_unprocessed_non_aux_cols
+    shape = (num_rows, num_cols) if average else (impute_config_dict["sample_count"], num_rows, num_cols)
+    # Values are reverted to objects by the data processor, so that e.g. text variables can be returned as strings.
+    imputed = np.empty(shape, dtype=object)
+    for row_start, imputed_rows in impute_batches(
+        model, data, mask, impute_config_dict, average=average, **vamp_prior_kwargs
+    ):
+        imputed[..., row_start : row_start + imputed_rows.shape[-2], :] = imputed_rows
+    return imputed
+
+
+def impute_batches(
+    model: IBatchImputer,
+    data: Union[np.ndarray, csr_matrix],
+    mask: Union[np.ndarray, csr_matrix],
+    impute_config_dict: Dict[str, Any],
+    *,
+    average: bool = True,
+    show_progress: bool = True,
+    **vamp_prior_kwargs,
+) -> Iterator[Tuple[int, np.ndarray]]:
+    """
+    Fill in unobserved variables using a trained model, yielding the imputations of consecutive blocks of rows as they
+    are computed, so that the imputations of all rows never need to be held in memory at once.
+
+    Rows are processed, imputed and reverted in blocks of whole minibatches, as large as possible while keeping the
+    imputations of the block within the memory budget given by "max_memory_mb" in impute_config_dict. When
+    average=True, the mean over samples is accumulated one sample at a time.
+
+    Args:
+        model: Trained model, which must be a TorchModel.
+        data: Input data in unprocessed form, of shape (num_rows, feature_count).
+        mask: Corresponding mask, where observed values are 1 and unobserved values are 0.
+        impute_config_dict: Imputation config, with at least "sample_count" and "batch_size", and optionally
+            "max_memory_mb". It is also passed to impute_processed_batch.
+        average: Whether to yield averaged imputations, or all sampled imputations.
+        show_progress: Whether to show a progress bar.
+        vamp_prior_kwargs: extra inputs to impute_processed_batch used by specific models.
+
+    Returns:
+        Iterator of (row_start, imputed_rows), where imputed_rows is an array of shape (block_rows, input_dim), or
+            (sample_count, block_rows, input_dim) if average=False, holding the imputations of rows
+            row_start:row_start + block_rows.
+    """
     if not isinstance(model, TorchModel):
         # This function requires model to implement 'eval' and 'get_device'
         raise NotImplementedError
     model.eval()
     num_rows = data.shape[0]
-    assert impute_config_dict is not None
     sample_count = impute_config_dict["sample_count"]
     batch_size = impute_config_dict["batch_size"]
-
-    # Process data.
-    processed_data, processed_mask = model.data_processor.process_data_and_masks(data, mask)
-
-    # Create an empty array to store imputed values, with shape (sample_count, batch_size, input_dim)
-    # Note that even if using sparse data, we use a dense array here since this array will have all values filled.
-    imputed = np.empty((sample_count, *processed_data.shape), dtype=processed_data.dtype)
-    with torch.no_grad():
-        dataloader = create_dataloader(processed_data, processed_mask, batch_size=batch_size, sample_randomly=False,)
-
-        for idx, (processed_data_batch, processed_mask_batch) in enumerate(tqdm(dataloader)):
-            processed_data_batch = processed_data_batch.to(model.get_device())
-            processed_mask_batch = processed_mask_batch.to(model.get_device())
-            imputed_batch = model.impute_processed_batch(
-                processed_data_batch,
-                processed_mask_batch,
-                preserve_data=impute_config_dict.get("preserve_data_when_impute", True),
-                **impute_config_dict,
-                **vamp_prior_kwargs
-            )
-            idx_start = idx * batch_size
-            idx_end = min((idx + 1) * batch_size, num_rows)
-            imputed[:, idx_start:idx_end, 0 : model.variables.num_processed_non_aux_cols] = imputed_batch.cpu().numpy()
-            imputed[:, idx_start:idx_end, model.variables.num_processed_non_aux_cols :] = (
-                processed_data_batch[:, model.variables.num_processed_non_aux_cols :].cpu().numpy()
+    block_size = _get_block_size(model, impute_config_dict, average)
+    num_processed_non_aux_cols = model.variables.num_processed_non_aux_cols
+    num_unprocessed_non_aux_cols = model.variables.num_unprocessed_non_aux_cols
+    non_text_idxs = model.variables.non_text_idxs
+
+    progress_bar = tqdm(total=num_rows, disable=not show_progress)
+    for row_start in range(0, num_rows, block_size):
+        row_end = min(row_start + block_size, num_rows)
+
+        # Process data.
+        processed_data, processed_mask = model.data_processor.process_data_and_masks(
+            data[row_start:row_end], mask[row_start:row_end]
+        )
+
+        # Create an empty array to store imputed values, with shape (sample_count, block_rows, input_dim)
+        # Note that even if using sparse data, we use a dense array here since this array will have all values filled.
+        imputed = np.empty((sample_count, *processed_data.shape), dtype=processed_data.dtype)
+        with torch.no_grad():
+            for idx, (processed_data_batch, processed_mask_batch) in enumerate(
+                _iterate_batches(processed_data, processed_mask, batch_size=batch_size, device=model.get_device())
+            ):
+                imputed_batch = model.impute_processed_batch(
+                    processed_data_batch,
+                    processed_mask_batch,
+                    preserve_data=impute_config_dict.get("preserve_data_when_impute", True),
+                    **impute_config_dict,
+                    **vamp_prior_kwargs
+                )
+                idx_start = idx * batch_size
+                idx_end = idx_start + processed_data_batch.shape[0]
+                imputed[:, idx_start:idx_end, 0:num_processed_non_aux_cols] = imputed_batch.cpu().numpy()
+                imputed[:, idx_start:idx_end, num_processed_non_aux_cols:] = (
+                    processed_data_batch[:, num_processed_non_aux_cols:].cpu().numpy()
+                )
+                progress_bar.update(processed_data_batch.shape[0])
+
+        # Unprocess data
+        if average:
+            # Average non-string samples, one sample at a time.
+            # For string variables, take the 1st sample as "mean" (as we can't perform mean over string data)
+            # TODO #18668: experiment with calculating mean in text embedding space instead
+            averaged_unprocessed_imputed = model.data_processor.revert_data(imputed[0])
+            non_text_sum = averaged_unprocessed_imputed[:, non_text_idxs].astype(np.float64)
+            for i in range(1, sample_count):
+                non_text_sum += model.data_processor.revert_data(imputed[i])[:, non_text_idxs].astype(np.float64)
+            averaged_unprocessed_imputed[:, non_text_idxs] = non_text_sum / sample_count
+            yield row_start, averaged_unprocessed_imputed[:, 0:num_unprocessed_non_aux_cols]
+        else:
+            unprocessed_imputed = np.stack(
+                [model.data_processor.revert_data(imputed[i]) for i in range(sample_count)], axis=0
             )
+            yield row_start, unprocessed_imputed[:, :, 0:num_unprocessed_non_aux_cols]
+    progress_bar.close()
 
-    # Unprocess data
-    unprocessed_imputed_samples = [model.data_processor.revert_data(imputed[i]) for i in range(sample_count)]
-    unprocessed_imputed = np.stack(unprocessed_imputed_samples, axis=0)
-
-    # Average non-string samples if necessary
-    # For string variables, take the 1st sample as "mean" (as we can't perform mean over string data)
-    # TODO #18668: experiment with calculating mean in text embedding space instead
-    if average:
-        averaged_unprocessed_imputed = np.copy(unprocessed_imputed[0, :, :])
-        non_text_idxs = model.variables.non_text_idxs
-        averaged_unprocessed_imputed[:, non_text_idxs] = np.mean(unprocessed_imputed[:, :, non_text_idxs], axis=0)
-        return averaged_unprocessed_imputed[:, 0 : model.variables.num_unprocessed_non_aux_cols]
-    return unprocessed_imputed[:, :, 0 : model.variables.num_unprocessed_non_aux_cols]
+
+def impute_to_file(
+    model: IBatchImputer,
+    data: Union[np.ndarray, csr_matrix],
+    mask: Union[np.ndarray, csr_matrix],
+    path: str,
+    impute_config_dict: Dict[str, Any],
+    *,
+    average: bool = True,
+    **vamp_prior_kwargs,
+) -> np.ndarray:
+    """
+    Fill in unobserved variables using a trained model, writing the imputations to a .npy file as they are computed
+    with impute_batches, so that imputing many rows needs no more memory than the imputation config's budget.
+
+    Args:
+        model: Trained model, which must be a TorchModel. It must not have text variables, since the imputations are
+            saved as floats.
+        data: Input data in unprocessed form, of shape (num_rows, feature_count).
+        mask: Corresponding mask, where observed values are 1 and unobserved values are 0.
+        path: Path of the .npy file to save the imputations to.
+        impute_config_dict: Imputation config, as for impute_batches.
+        average: Whether to save averaged imputations, or all sampled imputations.
+        vamp_prior_kwargs: extra inputs to impute_processed_batch used by specific models.
+
+    Returns:
+        imputed: Read-only memory-mapped array of the saved imputations, of shape (num_rows, input_dim) or
+            (sample_count, num_rows, input_dim).
+    """
+    if not all(model.variables.non_text_idxs):
+        raise ValueError("Imputations of text variables cannot be saved to a file.")
+    num_rows = data.shape[0]
+    num_cols = model.variables.num_unprocessed_non_aux_cols
+    shape = (num_rows, num_cols) if average else (impute_config_dict["sample_count"], num_rows, num_cols)
+
+    # Write to a temporary file first, so that a partially written file is never left at path.
+    tmp_path = f"{path}.{os.getpid()}.tmp.npy"
+    imputed = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float64, shape=shape)
+    for row_start, imputed_rows in impute_batches(
+        model, data, mask, impute_config_dict, average=average, **vamp_prior_kwargs
+    ):
+        imputed[..., row_start : row_start + imputed_rows.shape[-2], :] = imputed_rows
+    imputed.flush()
+    del imputed
+    os.replace(tmp_path, path)
+    return np.load(path, mmap_mode="r")
+
+
+def _iterate_batches(
+    data: Union[np.ndarray, csr_matrix], mask: Union[np.ndarray, csr_matrix], batch_size: int, device: torch.device
+) -> Iterator[Tuple[torch.Tensor, torch.Tensor]]:
+    # Minibatches are sliced directly rather than drawn from a DataLoader, which would consume random numbers for each
+    # block of rows, and make the imputations depend on the memory budget.
+    for start in range(0, data.shape[0], batch_size):
+        data_batch, mask_batch = data[start : start + batch_size], mask[start : start + batch_size]
+        if issparse(data_batch):
+            data_batch, mask_batch = data_batch.toarray(), mask_batch.toarray()
+        yield to_tensors(data_batch, mask_batch, device=device)
+
+
+def _get_block_size(model: IBatchImputer, impute_config_dict: Dict[str, Any], average: bool) -> int:
+    """
+    Return the number of rows to impute at once, as a multiple of the batch size, so that the imputations of the rows
+    fit within the memory budget of the imputation config.
+    """
+    sample_count = impute_config_dict["sample_count"]
+    batch_size = impute_config_dict["batch_size"]
+    max_memory_bytes = impute_config_dict.get("max_memory_mb", _DEFAULT_MAX_MEMORY_MB) * 2 ** 20
+    # Processed imputations of all samples, and the unprocessed imputations of one (if averaging) or all samples.
+    processed_row_bytes = sample_count * model.variables.num_processed_cols * np.dtype(np.float64).itemsize
+    unprocessed_sample_count = 1 if average else sample_count
+    unprocessed_row_bytes = unprocessed_sample_count * model.variables.num_unprocessed_cols * _UNPROCESSED_VALUE_BYTES
+    rows = max_memory_bytes // (processed_row_bytes + unprocessed_row_bytes)
+    return max(batch_size, int(rows // batch_size) * batch_size)
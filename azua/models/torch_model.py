@@ -12,6 +12,7 @@ from ..models.model import Model
 from ..datasets.variables import Variables
 from ..utils.helper_functions import maintain_random_state
 from ..utils.io_utils import read_json_as, save_json, save_txt
+from ..utils.tensor_file import is_tensor_file, load_tensor_file, save_tensor_file
 from ..utils.torch_utils import set_random_seeds, get_torch_device
 from ..models.torch_training_types import LossConfig, LossResults
 from ..utils.exceptions import ONNXNotImplemented
@@ -48,24 +49,29 @@ class TorchModel(Model, torch.nn.Module):
 
     def save(self) -> None:
         """
-        Save the torch model state_dict, as well as an ONNX representation of the model,
-        if implemented.
+        Save the torch model state_dict as a single memory-mappable tensor file. ONNX representations of the model are
+        not saved here, see export_onnx.
         """
         self.variables.save(os.path.join(self.save_dir, self._variables_path))
         model_path = os.path.join(self.save_dir, self._model_file)
-        torch.save(self.state_dict(), model_path)
+        save_tensor_file(model_path, self.state_dict(), metadata={"model_type": self.name()})
 
-        # TODO save variables? For most cases, the 'create' method will already
-        # have saved variables.
+    def export_onnx(self, save_dir: str) -> bool:
+        """
+        Save ONNX representations of all model components to save_dir, if implemented.
 
-        # Save ONNX files for all model components.
+        Returns:
+            Whether the ONNX representations were saved.
+        """
         # Generating mock ONNX input will affect random seed.
         # So store and restore.
         with maintain_random_state():
             try:
-                self.save_onnx(self.save_dir)
+                self.save_onnx(save_dir)
             except ONNXNotImplemented:
-                logger.debug("Save ONNX not implemented for this model.")
+                logger.info("Save ONNX not implemented for this model.")
+                return False
+        return True
 
     def save_onnx(self, save_dir: str) -> None:
         raise ONNXNotImplemented
@@ -108,7 +114,7 @@ class TorchModel(Model, torch.nn.Module):
 
     def reload_saved_parameters(self):
         # Used to implement 'rewind_to_best_epoch' behaviour.
-        self.load_state_dict(torch.load(os.path.join(self.save_dir, self._model_file)))
+        self.load_state_dict(load_saved_state_dict(os.path.join(self.save_dir, self._model_file)))
 
     @classmethod
     def create(
@@ -202,7 +208,7 @@ class TorchModel(Model, torch.nn.Module):
         torch_device = get_torch_device(device)
         model = cls._create(model_id, variables, save_dir, torch_device, **model_config_dict)
         model_path = os.path.join(save_dir, cls._model_file)
-        model.load_state_dict(torch.load(model_path, map_location=torch_device))
+        model.load_state_dict(load_saved_state_dict(model_path, map_location=torch_device))
         return model
 
     def get_device(self) -> torch.device:
@@ -230,6 +236,18 @@ class TorchModel(Model, torch.nn.Module):
         return train_output_dir
 
 
+def load_saved_state_dict(model_path: str, map_location: Union[str, torch.device] = "cpu") -> Dict[str, torch.Tensor]:
+    """
+    Load a state_dict saved by TorchModel.save. The tensors are memory-mapped from the file, and are only copied when
+    loaded into a model. Model files saved with torch.save by earlier versions are also supported, and are loaded to
+    map_location.
+    """
+    if is_tensor_file(model_path):
+        state_dict, _ = load_tensor_file(model_path)
+        return state_dict
+    return torch.load(model_path, map_location=map_location)
+
+
 def _set_random_seed_and_remove_from_config(model_config_dict: Dict) -> Dict:
     # Set random seed to model_config_dict.get('random_seed', 0)
     # If 'random_seed' is in model_config_dict, create a copy of model_config_dict that has random_seed removed.
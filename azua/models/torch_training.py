@@ -1,6 +1,7 @@
 from __future__ import annotations
 from ..models.imodel import IModelWithReconstruction
-from typing import Union, Optional, Callable, Dict, List
+from typing import Any, Union, Optional, Callable, Dict, List
+import copy
 import os
 import time
 import logging
@@ -14,9 +15,13 @@ from torch.utils.data import DataLoader
 from torch.optim.lr_scheduler import LambdaLR
 
 from ..experiment.azua_context import AzuaContext
+from ..experiment.background_metrics_writer import BackgroundMetricsWriter
+from ..experiment.profiler import ExperimentProfiler
 from ..utils.torch_utils import create_dataloader, set_random_seeds
+from ..utils.data_mask_utils import to_tensors
+from ..utils.fast_data_loader import FastTensorDataLoader
 from ..models.torch_training_types import LossResults, LossConfig, VAELossResults, EpochMetrics, VAEEpochMetrics
-from ..utils.helper_functions import maintain_random_state
+from ..utils.helper_functions import maintain_random_state, get_random_state, set_random_state
 from ..models.torch_model import TorchModel
 from ..datasets.dataset import Dataset, SparseDataset
 from ..utils.io_utils import save_json
@@ -47,6 +52,8 @@ def train_model(
     score_reconstruction: Optional[bool] = None,
     score_imputation: Optional[bool] = None,
     extra_eval: Optional[bool] = False,
+    checkpoint_period_epochs: Optional[int] = None,
+    resume_from_checkpoint: bool = False,
     azua_context: AzuaContext = Provide[AzuaContext],
 ) -> Dict[str, List[float]]:
     """
@@ -63,7 +70,7 @@ def train_model(
         iterations (int): Iterations to train for. -1 is all iterations per epoch.
         epochs (int): Number of epochs to train for.
         max_p_train_dropout (float): Maximum fraction of extra training features to drop for each row. 0 is none, 1 is all.
-        rewind_to_best_epoch: if True, call model.save() when lowest validation loss is reached, and reload those parameters at the end of training.
+        rewind_to_best_epoch: if True, keep a copy of the parameters when lowest validation loss is reached, and reload those parameters at the end of training.
         lr_warmup_epochs: number of epochs for learning rate warmup.
         use_lr_decay: Whether to, in addition to lr warmup, decay the lr proportionally to the inverse square root of the epoch number.
         early_stopping_patience_epochs: If validation loss does not improve for this many epochs, stop training. If None, training always continues
@@ -71,6 +78,10 @@ def train_model(
         improvement_ratio_threshold: The threshold of improvement ratio to determine early stopping. 
         save_latent_plots_period_epochs: create plots of latent space parameters at this interval.
         extra_eval: extra evaluation, creates pairwise plots
+        checkpoint_period_epochs: If not None, save a checkpoint of the full training state to the model's save_dir at
+          this interval, so that training can be resumed.
+        resume_from_checkpoint: If True and a training checkpoint exists in the model's save_dir, resume training from
+          it instead of starting from scratch.
         
         
     Returns:
@@ -96,8 +107,12 @@ def train_model(
     # Put model into train mode.
     model.train()
 
-    writer = SummaryWriter(os.path.join(train_output_dir, "summary"), flush_secs=1)
-    metrics_logger = azua_context.metrics_logger()
+    # Metrics are written from a background thread, which flushes the SummaryWriter after each batch of writes.
+    metrics_writer = BackgroundMetricsWriter(
+        SummaryWriter(os.path.join(train_output_dir, "summary")),
+        azua_context.metrics_logger(),
+        jsonl_path=os.path.join(train_output_dir, "metrics.jsonl"),
+    )
     logger = logging.getLogger()
     results_dict: Dict[str, List] = {"epoch_time": []}
 
@@ -115,19 +130,47 @@ def train_model(
     improvement_ratio = 0.5
     best_delta_val_loss = np.nan
     best_delta_epoch = 0
+    best_state_dict = None
+    start_epoch = 0
+
+    checkpoint_path = os.path.join(model.save_dir, _training_checkpoint_file)
+    if resume_from_checkpoint and os.path.exists(checkpoint_path):
+        checkpoint = load_training_checkpoint(checkpoint_path, model, optimizer, lr_scheduler)
+        start_epoch = checkpoint["epoch"] + 1
+        results_dict = checkpoint["results_dict"]
+        best_val_metrics = checkpoint["best_val_metrics"]
+        best_val_loss = checkpoint["best_val_loss"]
+        best_epoch = checkpoint["best_epoch"]
+        improvement_ratio = checkpoint["improvement_ratio"]
+        best_delta_val_loss = checkpoint["best_delta_val_loss"]
+        best_delta_epoch = checkpoint["best_delta_epoch"]
+        best_state_dict = checkpoint["best_state_dict"]
+        logger.info(f"Resuming training from {checkpoint_path} at epoch {start_epoch}.")
+
+    profiler = azua_context.profiler()
     is_quiet = logger.level > logging.INFO
-    for epoch in trange(epochs, desc="Epochs", disable=is_quiet):
+    for epoch in trange(start_epoch, epochs, desc="Epochs", disable=is_quiet):
         epoch_start_time = time.time()
-        train_metrics = _one_epoch(
-            model=model, dataloader=train_dataloader, is_quiet=is_quiet, optimizer=optimizer, loss_config=loss_config
-        )
+        with profiler.phase("train_epoch"):
+            train_metrics = _one_epoch(
+                model=model,
+                dataloader=train_dataloader,
+                is_quiet=is_quiet,
+                optimizer=optimizer,
+                loss_config=loss_config,
+                profiler=profiler,
+            )
         if has_val_data:
-            with maintain_random_state():
+            with maintain_random_state(), profiler.phase("val_epoch"):
                 # Use the same random seed to evaluate validation loss on each epoch.
                 set_random_seeds(0)
                 with torch.no_grad():
                     val_metrics = _one_epoch(
-                        model=model, dataloader=val_dataloader, is_quiet=is_quiet, loss_config=loss_config
+                        model=model,
+                        dataloader=val_dataloader,
+                        is_quiet=is_quiet,
+                        loss_config=loss_config,
+                        profiler=profiler,
                     )
             if epoch == 0 or val_metrics.loss < best_val_loss:
                 best_val_metrics = val_metrics
@@ -140,8 +183,8 @@ def train_model(
                     best_delta_val_loss = val_metrics.loss
                     best_delta_epoch = epoch
                 if rewind_to_best_epoch:
-                    # Save model.
-                    model.save()
+                    # Keep a copy of the parameters in memory, rather than saving the model.
+                    best_state_dict = copy.deepcopy(model.state_dict())
 
         lr_scheduler.step()
 
@@ -149,10 +192,9 @@ def train_model(
         epoch_time = time.time() - epoch_start_time
 
         def _log_epoch_metrics(metrics: EpochMetrics, train_or_val: str):
-            for k, value in asdict(metrics).items():
-                name = f"train/{k}-{train_or_val}"
-                writer.add_scalar(name, value, epoch)  # tensorboard
-                metrics_logger.log_dict({name: value})  # AzureML
+            named_metrics = {f"train/{k}-{train_or_val}": value for k, value in asdict(metrics).items()}
+            metrics_writer.log(named_metrics, step=epoch)  # tensorboard and AzureML
+            for name, value in named_metrics.items():
                 if name not in results_dict:
                     results_dict[name] = []
                 results_dict[name].append(value)  # for JSON file
@@ -164,11 +206,30 @@ def train_model(
         results_dict["epoch_time"].append(epoch_time)
 
         lr = optimizer.param_groups[0]["lr"]
-        metrics_logger.log_dict({"train/epoch": epoch, "train/epoch_time": epoch_time, "train/lr": lr})
+        metrics_writer.log(
+            {"train/epoch": epoch, "train/epoch_time": epoch_time, "train/lr": lr}, to_summary_writer=False
+        )
 
         if report_progress_callback:
             report_progress_callback(model.model_id, epoch + 1, epochs)
 
+        if checkpoint_period_epochs is not None and (epoch + 1) % checkpoint_period_epochs == 0:
+            save_training_checkpoint(
+                checkpoint_path,
+                model,
+                optimizer,
+                lr_scheduler,
+                epoch=epoch,
+                results_dict=results_dict,
+                best_val_metrics=best_val_metrics,
+                best_val_loss=best_val_loss,
+                best_epoch=best_epoch,
+                improvement_ratio=improvement_ratio,
+                best_delta_val_loss=best_delta_val_loss,
+                best_delta_epoch=best_delta_epoch,
+                best_state_dict=best_state_dict,
+            )
+
         if (save_latent_plots_period_epochs is not None) and not (epoch % save_latent_plots_period_epochs):
             create_latent_distribution_plots(
                 model=model, dataloader=train_dataloader, output_dir=train_output_dir, epoch=epoch, num_points_plot=1000
@@ -187,14 +248,13 @@ def train_model(
         logger.info(f"Best model found at epoch {best_epoch}, with val metrics {best_val_metrics}")
 
         # Reload best parameters
-        model_path = os.path.join(model.save_dir, model._model_file)
-        model.load_state_dict(torch.load(model_path))
+        if best_state_dict is not None:
+            model.load_state_dict(best_state_dict)
     else:
-        # TODO save full checkpoints so that training can be resumed.
         logger.info(f"Saving after {epochs} epochs.")
-        model.save()
+    model.save()
 
-    writer.close()
+    metrics_writer.close()
 
     # TODO: add support for PredictiveVAE by reconstruct() using input_tensors. Currently, it will fail instead
     if extra_eval and isinstance(model, IModelWithReconstruction):
@@ -235,20 +295,99 @@ def train_model(
     return results_dict
 
 
+_training_checkpoint_file = "training_checkpoint.pt"
+
+
+def save_training_checkpoint(
+    path: str, model: TorchModel, optimizer: torch.optim.Optimizer, lr_scheduler: LambdaLR, **training_state: Any
+) -> None:
+    """
+    Save the full training state, so that training can be resumed with load_training_checkpoint.
+
+    Args:
+        path: Path to save the checkpoint to.
+        model: Model being trained.
+        optimizer: Optimizer used for training.
+        lr_scheduler: Learning rate scheduler used for training.
+        **training_state: Any other state of the training loop, e.g. the current epoch and early stopping counters.
+    """
+    checkpoint = {
+        "model": model.state_dict(),
+        "optimizer": optimizer.state_dict(),
+        "lr_scheduler": lr_scheduler.state_dict(),
+        "random_state": get_random_state(),
+        **training_state,
+    }
+    # Write to a temporary file first, so that a preempted run never leaves a partially written checkpoint.
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    torch.save(checkpoint, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def load_training_checkpoint(
+    path: str, model: TorchModel, optimizer: torch.optim.Optimizer, lr_scheduler: LambdaLR
+) -> Dict[str, Any]:
+    """
+    Restore the model, optimizer, learning rate scheduler and random states from a checkpoint saved with
+    save_training_checkpoint.
+
+    Args:
+        path: Path to load the checkpoint from.
+        model: Model being trained.
+        optimizer: Optimizer used for training.
+        lr_scheduler: Learning rate scheduler used for training.
+
+    Returns:
+        checkpoint: The checkpoint, including the other training state it was saved with.
+    """
+    checkpoint = torch.load(path, map_location="cpu")
+    model.load_state_dict(checkpoint["model"])
+    optimizer.load_state_dict(checkpoint["optimizer"])
+    lr_scheduler.load_state_dict(checkpoint["lr_scheduler"])
+    set_random_state(checkpoint["random_state"])
+    return checkpoint
+
+
 def create_train_and_val_dataloaders(dataset: Union[Dataset, SparseDataset], *, batch_size, iterations):
-    dataloader = create_dataloader(
-        *dataset.train_data_and_mask, batch_size=batch_size, iterations=iterations, sample_randomly=True
-    )
+    if isinstance(dataset, SparseDataset):
+        # Sparse minibatches are sliced and densified on the host, so overlap this with training in a background thread.
+        dataloader = create_dataloader(
+            *dataset.train_data_and_mask,
+            batch_size=batch_size,
+            iterations=iterations,
+            sample_randomly=True,
+            prefetch_batches=2,
+        )
+    else:
+        dataloader = _create_fast_dataloader(*dataset.train_data_and_mask, batch_size=batch_size, iterations=iterations)
     val_dataloader: Optional[DataLoader]
-    if dataset.has_val_data:
+    if not dataset.has_val_data:
+        val_dataloader = None
+    elif isinstance(dataset, SparseDataset):
         val_dataloader = create_dataloader(
             *dataset.val_data_and_mask, batch_size=batch_size, iterations=iterations, sample_randomly=True
         )
     else:
-        val_dataloader = None
+        val_dataloader = _create_fast_dataloader(
+            *dataset.val_data_and_mask, batch_size=batch_size, iterations=iterations
+        )
     return dataloader, val_dataloader
 
 
+def _create_fast_dataloader(data: np.ndarray, mask: np.ndarray, *, batch_size: int, iterations: int) -> DataLoader:
+    # Dense data is held in memory, so slice whole minibatches from a per-epoch permutation of the rows, rather than
+    # indexing and collating single rows.
+    if iterations > np.ceil(data.shape[0] / batch_size):
+        iterations = -1
+    return FastTensorDataLoader(
+        *to_tensors(data, mask, device=torch.device("cpu")),
+        batch_size=batch_size,
+        shuffle=True,
+        iterations=iterations,
+        pin_memory=True,
+    )
+
+
 def create_optimizer_and_lr_scheduler(model, *, learning_rate: float, lr_warmup_epochs: int, use_lr_decay: bool):
     optimizer = torch.optim.Adam(model.parameters(), lr=learning_rate)
 
@@ -269,11 +408,15 @@ def _one_epoch(
     is_quiet: bool,
     loss_config: LossConfig,
     optimizer: Optional[torch.optim.Adam] = None,
+    profiler: Optional[ExperimentProfiler] = None,
 ) -> Union[EpochMetrics, VAEEpochMetrics]:
     # Run a single epoch of training
     train = optimizer is not None
 
-    accumulated_batch_results: Optional[EpochMetrics] = None
+    # Accumulate the loss components as tensors on the model's device, and only convert them to numbers at the end of
+    # the epoch, to avoid synchronising with the device on every batch.
+    accumulated_loss_results: Optional[Dict[str, Any]] = None
+    inner_epoch_time = 0.0
     for input_tensors in tqdm(dataloader, desc="Batches", disable=is_quiet):
         input_tensors = [x.to(model.get_device()) for x in input_tensors]
         batch_size = input_tensors[0].shape[0]
@@ -289,18 +432,29 @@ def _one_epoch(
             (loss_results.loss / batch_size).backward()
             optimizer.step()
 
-        batch_results = convert_from_tensors_and_add_time(loss_results, inner_epoch_time=time.time() - batch_start_time)
-        if accumulated_batch_results is None:
-            accumulated_batch_results = batch_results
+        batch_results = {k.name: _detach_if_tensor(getattr(loss_results, k.name)) for k in fields(loss_results)}
+        if accumulated_loss_results is None:
+            accumulated_loss_results = batch_results
         else:
-            accumulated_batch_results = accumulated_batch_results + batch_results
+            accumulated_loss_results = {k: v + batch_results[k] for k, v in accumulated_loss_results.items()}
+        inner_epoch_time += time.time() - batch_start_time
+        if profiler is not None:
+            profiler.count("rows", batch_size)
 
-    if accumulated_batch_results is None:
+    if accumulated_loss_results is None:
         raise ValueError("There were no batches of data")
     else:
+        accumulated_batch_results = convert_from_tensors_and_add_time(
+            type(loss_results)(**accumulated_loss_results), inner_epoch_time=inner_epoch_time
+        )
         return convert_accumulated_to_average(accumulated_batch_results)
 
 
+def _detach_if_tensor(value):
+    # Accumulate in double precision, as the per-batch values used to be summed as Python floats.
+    return value.detach().double() if isinstance(value, torch.Tensor) else value
+
+
 def convert_from_tensors_and_add_time(
     tensor_results: Union[LossResults, VAELossResults], inner_epoch_time: float
 ) -> Union[EpochMetrics, VAEEpochMetrics]:
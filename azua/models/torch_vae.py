@@ -81,6 +81,8 @@ class TorchVAE(TorchModel, IModelWithReconstruction):
         batch_size: int,
         iterations: int,
         epochs: int,
+        checkpoint_period_epochs: Optional[int] = None,
+        resume_from_checkpoint: bool = False,
     ) -> Dict[str, List[float]]:
         return train_model(
             model=self,
@@ -92,6 +94,8 @@ class TorchVAE(TorchModel, IModelWithReconstruction):
             iterations=iterations,
             epochs=epochs,
             rewind_to_best_epoch=False,
+            checkpoint_period_epochs=checkpoint_period_epochs,
+            resume_from_checkpoint=resume_from_checkpoint,
         )
 
     def _loss(self, *input_tensors: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
@@ -52,6 +52,7 @@ class TransformerImputer(TorchModel, IBatchImputer):
         transformer_embedding_dim: int,
         use_isab: bool,
         share_readout_weights: bool,
+        cache_feature_context: bool = True,
     ):
         super().__init__(model_id, variables, save_dir, device)
 
@@ -64,6 +65,10 @@ class TransformerImputer(TorchModel, IBatchImputer):
         feature_embedding_dim = self._feature_embedder.output_dim
 
         self._input_dimension_transform = torch.nn.Linear(feature_embedding_dim, transformer_embedding_dim)
+        # Whether to reuse the data-independent part of the transformer input between forward passes without
+        # gradients, e.g. when repeatedly imputing with a trained model. See _get_feature_context.
+        self._cache_feature_context = cache_feature_context
+        self._feature_context_cache: Optional[Tuple[Tuple, torch.Tensor]] = None
 
         if use_isab:
             assert num_inducing_points is not None
@@ -135,15 +140,14 @@ class TransformerImputer(TorchModel, IBatchImputer):
         # Drop masked data now, so we don't have to bother with masking later.
         data = data * mask
 
-        # Feature embedder is analogous to BERT position encoding.
-        data = self._feature_embedder(data)  # shape (batch_size * input_dim, feature_embedder.output_dim)
-        data = data.reshape(batch_size, input_dim, -1)  # shape (batch_size, input_dim, feature_embedder.output_dim)
-
-        # This channel held the embedding bias, which we don't need, so we can use it to hold the mask.
-        data[:, :, -1] = mask
-
-        # Change number of channels
-        data = self._input_dimension_transform(data)  # shape (batch_size, input_dim, transformer_embedding_dim)
+        # Feature embedder is analogous to BERT position encoding. Its output channels are the value, the feature
+        # embedding and the embedding bias. The embedding bias channel is not needed, so we use it to hold the mask.
+        # Rather than building the embedded data, apply the linear map that changes the number of channels to each
+        # channel separately.
+        weight = self._input_dimension_transform.weight
+        data = torch.addcmul(self._get_feature_context(), data.unsqueeze(2), weight[:, 0])
+        # shape (batch_size, input_dim, transformer_embedding_dim)
+        data = torch.addcmul(data, mask.unsqueeze(2), weight[:, -1])
 
         # Run through self-attention blocks
         for sab in self._sabs:
@@ -156,6 +160,26 @@ class TransformerImputer(TorchModel, IBatchImputer):
 
         return readout
 
+    def _get_feature_context(self) -> torch.Tensor:
+        """
+        Compute the feature embeddings after the linear map changing the number of channels, i.e. the part of the
+        transformer input which does not depend on the data. If cache_feature_context is set, this is cached between
+        forward passes without gradients, for as long as the parameters it is computed from are unchanged.
+
+        Returns:
+            torch.Tensor of shape (input_dim, transformer_embedding_dim).
+        """
+        embedding_weights = self._feature_embedder._get_embedding_weights()
+        weight, bias = self._input_dimension_transform.weight, self._input_dimension_transform.bias
+        if not self._cache_feature_context or torch.is_grad_enabled():
+            return torch.addmm(bias, embedding_weights, weight[:, 1:-1].T)
+
+        # Parameters are modified in place by optimisers and load_state_dict, which changes their version counter.
+        parameters_key = tuple((t.data_ptr(), t._version) for t in (embedding_weights, weight, bias))
+        if self._feature_context_cache is None or self._feature_context_cache[0] != parameters_key:
+            self._feature_context_cache = (parameters_key, torch.addmm(bias, embedding_weights, weight[:, 1:-1].T))
+        return self._feature_context_cache[1]
+
     def run_train(self, dataset, train_config_dict, report_progress_callback=None):
         # TODO put this in TorchModel
         train_output_dir = self._create_train_output_dir_and_save_config(train_config_dict)
@@ -266,7 +290,10 @@ class ParallelLinear(torch.nn.Module):
         )
 
     def forward(self, x: torch.Tensor) -> torch.Tensor:
-        batch_size, num_parallel, in_channels = x.shape
-        x = x.reshape(batch_size, num_parallel * in_channels, 1)
-        predictions = self._conv1d(x)  # shape (batch_size, num_parallel * out_channels, 1)
-        return predictions.reshape(batch_size, num_parallel, -1)  # Shape (batch_size, num_parallel, out_channels)
+        _, num_parallel, in_channels = x.shape
+        # The grouped convolution holds one (out_channels, in_channels) weight matrix per parallel input, so all of them
+        # can be applied with a single batched matrix multiplication on views of its parameters.
+        # Shape (num_parallel, out_channels, in_channels)
+        weight = self._conv1d.weight.view(num_parallel, -1, in_channels)
+        bias = self._conv1d.bias.view(num_parallel, -1)  # Shape (num_parallel, out_channels)
+        return torch.einsum("bpi,poi->bpo", x, weight) + bias  # Shape (batch_size, num_parallel, out_channels)
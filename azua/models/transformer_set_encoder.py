@@ -1,6 +1,7 @@
 from enum import Enum
 import math
 import torch
+import torch.nn.functional as F
 from typing import cast, Optional
 
 from ..models.set_encoder_base_model import SetEncoderBaseModel
@@ -341,32 +342,68 @@ class MAB(torch.nn.Module):
             output: Attention output tensor with shape (batch_size, query_set_size, embedding_dim).
         """
 
-        # MultiheadAttention requires inputs with shape (set_size, batch_size, embedding_dim)
-        query = query.permute(1, 0, 2)
-        key = key.permute(1, 0, 2)
-
-        # PyTorch MultiheadAttention uses opposite convention to Azua for masks: 'True' means 'hidden'.
-        if key_mask is None:
-            # Everything is observed.
-            inverted_key_mask = None
-        else:
-            inverted_key_mask = torch.logical_not(key_mask)
-
-        x = (
-            query
-            + self._multihead(query=query, key=key, value=key, key_padding_mask=inverted_key_mask, need_weights=False)[
-                0
-            ]
-        )
+        x = query + self._attention(query, key, key_mask)
 
         if self._use_layer_norm:
             x = self._layer_norm_1(x)
         x = x + self._elementwise_transform(x)
         if self._use_layer_norm:
             x = self._layer_norm_2(x)
-        output = x.permute(1, 0, 2)
 
-        return output
+        return x
+
+    def _attention(self, query: torch.Tensor, key: torch.Tensor, key_mask: Optional[torch.Tensor]) -> torch.Tensor:
+        """
+        Multihead attention with the parameters of self._multihead, computed directly on batch-first inputs. The key
+        mask is broadcast over queries and heads, rather than expanded to a dense attention mask.
+        Args:
+            query: Query tensor with shape (batch_size, query_set_size, embedding_dim)
+            key: Input tensor with shape (batch_size, key_set_size, embedding_dim) to be used as key and value.
+            key_mask: Mask tensor with shape (batch_size, key_set_size), 1 is observed, 0 is unobserved.
+                If None, everything is observed.
+        Returns:
+            output: Attention output tensor with shape (batch_size, query_set_size, embedding_dim).
+        """
+        batch_size, _, embedding_dim = query.shape
+        num_heads = self._multihead.num_heads
+        in_proj_weight, in_proj_bias = self._multihead.in_proj_weight, self._multihead.in_proj_bias
+
+        if query is key:
+            # Self attention: project to queries, keys and values at once.
+            q, k, v = F.linear(query, in_proj_weight, in_proj_bias).chunk(3, dim=-1)
+        else:
+            q = F.linear(query, in_proj_weight[:embedding_dim], in_proj_bias[:embedding_dim])
+            k, v = F.linear(key, in_proj_weight[embedding_dim:], in_proj_bias[embedding_dim:]).chunk(2, dim=-1)
+
+        # Shape (batch_size, num_heads, set_size, head_dim)
+        q, k, v = [t.reshape(batch_size, -1, num_heads, embedding_dim // num_heads).transpose(1, 2) for t in (q, k, v)]
+        attn_mask = None if key_mask is None else key_mask.bool()[:, None, None, :]
+        # Shape (batch_size, num_heads, query_set_size, head_dim)
+        output = scaled_dot_product_attention(q, k, v, attn_mask)
+        output = output.transpose(1, 2).reshape(batch_size, -1, embedding_dim)
+        return self._multihead.out_proj(output)
+
+
+def scaled_dot_product_attention(
+    query: torch.Tensor, key: torch.Tensor, value: torch.Tensor, attn_mask: Optional[torch.Tensor] = None
+) -> torch.Tensor:
+    """
+    Scaled dot product attention, using the fused PyTorch kernel when it is available (PyTorch >= 2.0).
+    Args:
+        query: Query tensor with shape (..., query_set_size, head_dim).
+        key: Key tensor with shape (..., key_set_size, head_dim).
+        value: Value tensor with shape (..., key_set_size, head_dim).
+        attn_mask: Boolean mask broadcastable to shape (..., query_set_size, key_set_size), True for the keys to
+            attend to. If None, all keys are attended to.
+    Returns:
+        output: Attention output tensor with shape (..., query_set_size, head_dim).
+    """
+    if hasattr(F, "scaled_dot_product_attention"):
+        return F.scaled_dot_product_attention(query, key, value, attn_mask=attn_mask)
+    scores = torch.matmul(query, key.transpose(-2, -1)) / math.sqrt(query.shape[-1])
+    if attn_mask is not None:
+        scores = scores.masked_fill(torch.logical_not(attn_mask), float("-inf"))
+    return torch.matmul(torch.softmax(scores, dim=-1), value)
 
 
 class SAB(torch.nn.Module):
@@ -14,6 +14,7 @@ from ..utils.torch_utils import get_torch_device
 
 from ..datasets.variables import Variables
 from ..models.torch_vae import TorchVAE
+from ..models.torch_model import load_saved_state_dict
 from typing import List, Tuple, Union, Optional, Type
 from torch.nn import ReLU, Sigmoid, Tanh, Identity
 
@@ -157,7 +158,7 @@ class VAE(TorchVAE):
             output_dim=variables.num_processed_cols,
             **kwargs,
         )
-        model.load_state_dict(torch.load(model_path))
+        model.load_state_dict(load_saved_state_dict(model_path))
 
         return model
 
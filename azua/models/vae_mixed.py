@@ -94,6 +94,8 @@ class VAEMixed(PVAEBaseModel):
         score_imputation: bool,
         rewind_to_best_epoch: bool,
         lr_warmup_epochs: int = 0,
+        checkpoint_period_epochs: Optional[int] = None,
+        resume_from_checkpoint: bool = False,
     ):
         """
         Train the model using the given data.
@@ -114,6 +116,10 @@ class VAEMixed(PVAEBaseModel):
             score_reconstruction: flag indicating whether to score reconstructed values in NLL
             score_imputation: flag indicating whether to score imputed values in NLL
             lr_warmup_epochs: number of epochs for learning rate warm-up for the dependency network
+            checkpoint_period_epochs: If not None, save a checkpoint of the training state of the marginal networks and
+                of the dependency network at this interval, each to its own save_dir.
+            resume_from_checkpoint: If True, resume training the marginal networks and the dependency network from
+                their last checkpoints, if any.
         Returns:
             results_dict (dictionary): Train loss, KL divergence, and NLL for each epoch as a dictionary.
         """
@@ -131,6 +137,8 @@ class VAEMixed(PVAEBaseModel):
             batch_size=marginal_batch_size,
             iterations=marginal_iterations,
             epochs=marginal_epochs,
+            checkpoint_period_epochs=checkpoint_period_epochs,
+            resume_from_checkpoint=resume_from_checkpoint,
         )
 
         logger.info("Training dependency network.")
@@ -189,6 +197,8 @@ class VAEMixed(PVAEBaseModel):
             rewind_to_best_epoch=rewind_to_best_epoch,
             score_reconstruction=score_reconstruction,
             score_imputation=score_imputation,
+            checkpoint_period_epochs=checkpoint_period_epochs,
+            resume_from_checkpoint=resume_from_checkpoint,
         )
         self.save()
 
@@ -99,10 +99,7 @@ class EDDIBaseObjective(Objective):
 
         # Create mask indicating with a 1 which query groups cannot be observed in each row, because all of
         # group's features do not have a value in the underlying data (i.e. its value in data_mask is 0).
-        query_group_masks = []
-        for idxs in self._model.variables.query_group_idxs:
-            query_group_masks.append((1 - data_mask[:, idxs].max(axis=1)).reshape(-1, 1))
-        group_mask = np.hstack(query_group_masks)
+        group_mask = ~self._model.variables.any_var_in_query_groups(data_mask)
 
         if self._use_vamp_prior:
             # For completely unobserved data, use precomputed info gain per variable
@@ -142,7 +139,7 @@ class EDDIBaseObjective(Objective):
                 rewards[rows.to(torch.long).cpu().numpy()] = info_gains
 
         # Remove estimates for unobservable (no values in observed data) groups of features
-        rewards[group_mask.astype(bool)] = np.nan
+        rewards[group_mask] = np.nan
 
         return rewards
 
@@ -244,9 +241,6 @@ class EDDIBaseObjective(Objective):
         # Assume group not queriable if none of features queriable. 1 indicates already observed
         # (not queriable) so take min within each group.
         feature_mask = self._model.data_processor.revert_mask(obs_mask.cpu().numpy())
-        query_group_masks = []
-        for idxs in self._model.variables.query_group_idxs:
-            query_group_masks.append(feature_mask[:, idxs].min(axis=1).reshape(-1, 1))
-        group_mask = np.hstack(query_group_masks)
-        rewards[group_mask.astype(bool)] = np.nan
+        group_mask = ~self._model.variables.any_var_in_query_groups(1 - feature_mask)
+        rewards[group_mask] = np.nan
         return rewards
@@ -21,8 +21,9 @@ class RandomObjective(Objective):
         # For each row, pick up to N random query groups that are unobserved.
         # Map them back to a query group index.
         next_question_idxs = []
-        for data_mask_row, obs_mask_row in zip(data_mask, obs_mask):
-            observable_groups = self._model.variables.get_observable_groups(data_mask_row, obs_mask_row)
+        observable_groups_mask = self._model.variables.get_observable_groups_mask(data_mask, obs_mask)
+        for observable_groups_row in observable_groups_mask:
+            observable_groups = np.flatnonzero(observable_groups_row).tolist()
             if len(observable_groups) < question_count:
                 question_idxs = observable_groups
             else:
@@ -37,14 +37,15 @@ class SINGObjective(EDDIBaseObjective):
     def get_next_questions(self, _, data_mask: np.ndarray, obs_mask: np.ndarray, question_count=1, as_array=False):  # type: ignore[override]
         # TODO: this can probably be optimised.
 
-        data_mask_row = data_mask[0, :]
-        obs_mask_row = obs_mask[0, :]
-        observable_groups = self._model.variables.get_observable_groups(np.ones_like(data_mask_row), obs_mask_row)
-        info_gain_list_copy = self._info_gain_idxs_sorted.copy()
+        obs_mask_row = obs_mask[:1, :]
+        observable_groups_mask = self._model.variables.get_observable_groups_mask(
+            np.ones_like(obs_mask_row), obs_mask_row
+        )[0]
         next_qs: List[int] = []
-        while len(next_qs) < question_count and info_gain_list_copy:
-            next_q_id = info_gain_list_copy.pop(0)
-            if next_q_id in observable_groups:
+        for next_q_id in self._info_gain_idxs_sorted:
+            if len(next_qs) >= question_count:
+                break
+            if observable_groups_mask[next_q_id]:
                 next_qs.append(next_q_id)
         next_question_idxs = [next_qs] * data_mask.shape[0]
 
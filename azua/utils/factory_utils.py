@@ -1,18 +1,22 @@
+import ast
 import logging
 import os
+from functools import lru_cache
 from importlib import import_module
-from typing import Any, List, Type, Union
+from typing import Any, Dict, List, Optional, Type, Union
 
 from ..utils.exceptions import ModelClassNotFound
 
 logger = logging.getLogger(__name__)
 
 
-def get_subclasses(directory: str, parent_class: Type[Any]):
+def _get_module_paths(directory: str) -> Dict[str, str]:
+    # Map the import path of each module in the directory to its file path.
     subclass_dir = os.path.join(
         os.path.dirname(os.path.dirname(os.path.realpath(__file__))), directory,  # Root of the repository
     )
 
+    module_paths = {}
     for root, dirs, files in os.walk(subclass_dir):
         if "__pycache__" in dirs:
             dirs.remove("__pycache__")
@@ -21,16 +25,78 @@ def get_subclasses(directory: str, parent_class: Type[Any]):
             subclass_file_name, ext = os.path.splitext(subclass_path)
             if ext == ".py" and not subclass_file.endswith("__init__"):
                 subclass_import_path = "azua.%s.%s" % (directory, subclass_file_name.replace("/", "."))
-                import_module(subclass_import_path)
+                module_paths[subclass_import_path] = os.path.join(root, subclass_file)
+    return module_paths
+
+
+def get_subclasses(directory: str, parent_class: Type[Any]):
+    for subclass_import_path in _get_module_paths(directory):
+        import_module(subclass_import_path)
     subclass_list = parent_class.__subclasses__()
     return subclass_list
 
 
+@lru_cache(maxsize=None)
+def get_subclass_index(directory: str) -> Dict[str, str]:
+    """
+    Build an index of the named classes in directory, without importing any of its modules. The modules are parsed,
+    and every class with a `name` method returning a string literal is indexed under that name.
+
+    Args:
+        directory: path to directory to index, relative to the azua package.
+    Returns:
+        index: dictionary mapping class names, as returned by their `name` method, to the import path of the module
+            defining the class.
+    """
+    index: Dict[str, str] = {}
+    for subclass_import_path, module_path in _get_module_paths(directory).items():
+        with open(module_path, encoding="utf-8") as f:
+            module_ast = ast.parse(f.read(), filename=module_path)
+        for node in module_ast.body:
+            if isinstance(node, ast.ClassDef):
+                subclass_name = _get_literal_name(node)
+                if subclass_name is not None:
+                    index.setdefault(subclass_name, subclass_import_path)
+    return index
+
+
+def _get_literal_name(class_def: ast.ClassDef) -> Optional[str]:
+    for node in class_def.body:
+        if isinstance(node, ast.FunctionDef) and node.name == "name":
+            returns = [n for n in ast.walk(node) if isinstance(n, ast.Return)]
+            if len(returns) == 1 and isinstance(returns[0].value, ast.Constant):
+                value = returns[0].value.value
+                return value if isinstance(value, str) else None
+    return None
+
+
+def _find_indexed_subclass(directory: str, parent_class: Type[Any], subclass_name: str) -> Optional[Type[Any]]:
+    # Import only the module the index points to, and look for the named subclass among the classes it defines.
+    subclass_import_path = get_subclass_index(directory).get(subclass_name)
+    if subclass_import_path is None:
+        return None
+    module = import_module(subclass_import_path)
+    for subclass in vars(module).values():
+        if (
+            isinstance(subclass, type)
+            and subclass.__module__ == subclass_import_path
+            and issubclass(subclass, parent_class)
+            and not getattr(subclass, "__abstractmethods__", None)
+            and subclass.name() == subclass_name
+        ):
+            return subclass
+    return None
+
+
 def get_named_subclass(
     directories: Union[str, List[str]], parent_class: Type[Any], subclass_name: str, max_depth: int = 10
 ) -> Type[Any]:
     """
     Get a named subclass of parent_class from directory.
+
+    Only the module defining the subclass is imported, if the subclass is found in the index built by
+    get_subclass_index. Otherwise, all modules in the directories are imported to search for it.
+
     Args:
         directories: path to directory or list of paths to directories to search for subclass. The function will iterate
             through this list first to last and return the first time a subclass of matching name is found.
@@ -43,6 +109,12 @@ def get_named_subclass(
     if isinstance(directories, str):
         directories = [directories]
 
+    for directory in directories:
+        indexed_subclass = _find_indexed_subclass(directory, parent_class, subclass_name)
+        if indexed_subclass is not None:
+            return indexed_subclass
+
+    logger.info(f"Subclass with name {subclass_name} not found in the index. Importing all modules to search for it.")
     for directory in directories:
         subclass_list = get_subclasses(directory, parent_class)
 
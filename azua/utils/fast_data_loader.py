@@ -1,3 +1,6 @@
+import queue
+import threading
+
 import torch
 from torch.utils.data import DataLoader
 
@@ -5,10 +8,11 @@ from torch.utils.data import DataLoader
 class FastTensorDataLoader(DataLoader):
     """
     Fast data loader for in-memory tensors. This loader avoids any calls to `torch.stack`
-    and is the fastest choice when datasets can be held in memory.
+    and is the fastest choice when datasets can be held in memory. The rows are permuted once per epoch, and each
+    minibatch is then a contiguous slice of the permuted tensors.
     """
 
-    def __init__(self, *tensors, batch_size, shuffle=False, drop_last=False):
+    def __init__(self, *tensors, batch_size, shuffle=False, drop_last=False, iterations=-1, pin_memory=False):
         """
         Args:
             *tensors (torch.Tensor): the tensors that form the dataset. Dimension 0 is regarded as the
@@ -16,6 +20,10 @@ class FastTensorDataLoader(DataLoader):
             batch_size (int): the batch size for this data loader.
             shuffle (bool): whether to shuffle the dataset.
             drop_last (bool): whether to neglect the final batch (ensures every batch has the same size).
+            iterations (int): number of batches per epoch. -1 is a single pass over the dataset. Otherwise, the
+                      batches are drawn from as many passes over the dataset as needed, each with its own permutation.
+            pin_memory (bool): whether to return batches in pinned memory, for faster copies to the GPU. Only used
+                      for tensors on the CPU, when CUDA is available.
         """
         self.tensors = tensors
         self.n_rows = self.tensors[0].shape[0]
@@ -24,31 +32,107 @@ class FastTensorDataLoader(DataLoader):
         assert all(a.shape[0] == self.n_rows for a in tensors)
         # Checkk all tensors on same device
         assert all(a.device == self.tensors[0].device for a in tensors)
+        assert iterations == -1 or iterations > 0
 
         self.batch_size = batch_size
         self.shuffle = shuffle
         self.drop_last = drop_last
+        self.iterations = iterations
+        self.pin_memory = pin_memory and self.tensors[0].device.type == "cpu" and torch.cuda.is_available()
 
     def __iter__(self):
+        device = self.tensors[0].device
+        epoch_rows = self.n_rows if self.iterations == -1 else self.iterations * self.batch_size
+        n_passes = -(-epoch_rows // self.n_rows)
         if self.shuffle:
-            self.idxs = torch.randperm(self.n_rows, device=self.tensors[0].device)
+            idxs = torch.cat([torch.randperm(self.n_rows, device=device) for _ in range(n_passes)])
+        else:
+            idxs = torch.arange(self.n_rows, device=device).repeat(n_passes)
+        self.idxs = idxs[:epoch_rows]
+        if self.shuffle or self.pin_memory or n_passes > 1:
+            self.epoch_tensors = tuple(self._gather(a, self.idxs) for a in self.tensors)
         else:
-            self.idxs = torch.arange(self.n_rows, device=self.tensors[0].device)
+            self.epoch_tensors = self.tensors
         self.batch_start = 0
         return self
 
+    def _gather(self, tensor, idxs):
+        if self.pin_memory:
+            out = torch.empty((len(idxs),) + tensor.shape[1:], dtype=tensor.dtype, pin_memory=True)
+            return torch.index_select(tensor, 0, idxs, out=out)
+        return tensor[idxs]
+
     def __next__(self):
-        if self.drop_last and (self.batch_start + self.batch_size > self.n_rows):
+        if self.drop_last and (self.batch_start + self.batch_size > len(self.idxs)):
             raise StopIteration
-        if self.batch_start >= self.n_rows:
+        if self.batch_start >= len(self.idxs):
             raise StopIteration
-        idxs = self.idxs[self.batch_start : self.batch_start + self.batch_size]
-        batch = tuple(a[idxs] for a in self.tensors)
+        batch = tuple(a[self.batch_start : self.batch_start + self.batch_size] for a in self.epoch_tensors)
         self.batch_start += self.batch_size
         return batch
 
     def __len__(self):
+        if self.iterations != -1:
+            return self.iterations
         if self.n_rows % self.batch_size == 0 or self.drop_last:
             return self.n_rows // self.batch_size
         else:
             return 1 + self.n_rows // self.batch_size
+
+
+class PrefetchDataLoader(DataLoader):
+    """
+    Wraps another data loader and prepares its minibatches ahead of time in a background thread, so that minibatch
+    construction (e.g. slicing and densifying sparse matrices) overlaps with model computation.
+    """
+
+    _END_OF_EPOCH = object()
+
+    def __init__(self, dataloader, prefetch_batches=2):
+        """
+        Args:
+            dataloader (iterable): the data loader whose minibatches should be prefetched.
+            prefetch_batches (int): maximum number of minibatches to hold in the prefetch queue.
+        """
+        assert prefetch_batches > 0
+        self.dataloader = dataloader
+        self.prefetch_batches = prefetch_batches
+
+    def __iter__(self):
+        batch_queue: queue.Queue = queue.Queue(maxsize=self.prefetch_batches)
+        stop_event = threading.Event()
+        # Start the epoch of the wrapped data loader on this thread, so that its sampler draws its random state here.
+        batches = iter(self.dataloader)
+
+        def _producer():
+            try:
+                for batch in batches:
+                    if stop_event.is_set():
+                        return
+                    batch_queue.put(batch)
+            except Exception as e:  # pylint: disable=broad-except
+                # Re-raised in the consuming thread.
+                batch_queue.put(e)
+            batch_queue.put(self._END_OF_EPOCH)
+
+        thread = threading.Thread(target=_producer, daemon=True)
+        thread.start()
+        try:
+            while True:
+                batch = batch_queue.get()
+                if batch is self._END_OF_EPOCH:
+                    break
+                if isinstance(batch, Exception):
+                    raise batch
+                yield batch
+        finally:
+            # If iteration stopped early, let the producer finish by draining the queue.
+            stop_event.set()
+            while thread.is_alive():
+                try:
+                    batch_queue.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+
+    def __len__(self):
+        return len(self.dataloader)
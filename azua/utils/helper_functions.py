@@ -53,6 +53,19 @@ def get_random_state():
     return states
 
 
+def set_random_state(states: dict):
+    """
+    Set random states for PyTorch, PyTorch CUDA and Numpy.
+
+    Args:
+        states: Dictionary of state type: state value, as returned by get_random_state.
+    """
+    torch.set_rng_state(states["torch_rand_state"])
+    np.random.set_state(states["np_rand_state"])
+    if "cuda_rand_state" in states and torch.cuda.is_available():
+        torch.cuda.set_rng_state(states["cuda_rand_state"])
+
+
 def write_git_info(directory: str, exist_ok: bool = False):
     """
     Write sys.argv, git hash, git diff to <directory>/git_info.txt
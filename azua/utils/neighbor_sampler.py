@@ -0,0 +1,124 @@
+import time
+from typing import Iterator, List, Optional, Tuple
+
+import torch
+from torch import Tensor
+from torch_geometric.data import NeighborSampler
+
+from .fast_data_loader import PrefetchDataLoader
+
+# (edge_index_minibatch, original_edge_index, sizes), as produced by torch_geometric's NeighborSampler.
+SampledAdj = Tuple[Tensor, Tensor, Tuple[int, int]]
+
+
+class PrefetchNeighborSampler:
+    """
+    Reusable neighbour sampler for minibatch GNN training. The CSR adjacency of the graph is built once, when the
+    sampler is created, and the seed nodes are reshuffled each time the sampler is iterated over, so a single
+    sampler can be used for every epoch. Subgraphs can be sampled ahead of time in a background thread (or in
+    DataLoader worker processes), and the time spent waiting for sampled subgraphs is recorded, so that it can be
+    reported separately from the compute time.
+
+    Minibatches are (batch_size, n_id, adjs) tuples as produced by torch_geometric's NeighborSampler, except that
+    adjs is always a list, even when sampling a single layer.
+    """
+
+    def __init__(
+        self,
+        edge_index: Tensor,
+        sizes: List[int],
+        batch_size: int,
+        num_nodes: int,
+        node_idx: Optional[Tensor] = None,
+        shuffle: bool = True,
+        num_workers: int = 0,
+        prefetch_batches: int = 0,
+    ):
+        """
+        Args:
+            edge_index: Shape (2, num_edges). Edges of the graph to sample from.
+            sizes: Number of neighbours to sample for each layer, with -1 meaning all neighbours.
+            batch_size: Number of seed nodes per minibatch.
+            num_nodes: Number of nodes in the graph.
+            node_idx: Seed nodes to sample subgraphs for. If None, all nodes are used.
+            shuffle: Whether to reshuffle the seed nodes on each iteration.
+            num_workers: Number of DataLoader worker processes used for sampling.
+            prefetch_batches: Number of sampled minibatches to prepare ahead of time in a background thread. If 0,
+                sampling runs synchronously (or in the worker processes only).
+        """
+        # Shuffle with a dedicated generator, seeded from the global one, so that sampling in a background thread does
+        # not race with the model for the global random state.
+        generator = torch.Generator()
+        generator.manual_seed(int(torch.randint(2 ** 62, ())))
+        self.sampler = NeighborSampler(
+            edge_index,
+            node_idx=node_idx,
+            sizes=sizes,
+            batch_size=batch_size,
+            shuffle=shuffle,
+            num_nodes=num_nodes,
+            num_workers=num_workers,
+            generator=generator,
+        )
+        self.loader = PrefetchDataLoader(self.sampler, prefetch_batches) if prefetch_batches > 0 else self.sampler
+        self.sample_time = 0.0
+
+    def __iter__(self) -> Iterator[Tuple[int, Tensor, List[SampledAdj]]]:
+        iterator = iter(self.loader)
+        while True:
+            start_time = time.time()
+            try:
+                bs, n_id, adjs = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self.sample_time += time.time() - start_time
+            if not isinstance(adjs, list):
+                adjs = [adjs]
+            yield bs, n_id, adjs
+
+    def __len__(self) -> int:
+        return len(self.sampler)
+
+    def pop_sample_time(self) -> float:
+        """
+        Return the time (in seconds) spent waiting for sampled minibatches since the last call, and reset it.
+        """
+        sample_time, self.sample_time = self.sample_time, 0.0
+        return sample_time
+
+
+def sample_full_neighborhood(
+    edge_index: Tensor, node_idx: Tensor, num_nodes: int
+) -> Tuple[int, Tensor, List[SampledAdj]]:
+    """
+    Sample the complete one-hop neighbourhood of the given nodes in a single minibatch. This gives the same subgraph as
+    torch_geometric's NeighborSampler with sizes=[-1] and a batch containing all of node_idx, but works directly on
+    edge_index without building a CSR adjacency, which makes it cheap for graphs that change between calls.
+
+    Args:
+        edge_index: Shape (2, num_edges). Edges of the graph, from source (row 0) to target (row 1).
+        node_idx: Target nodes whose neighbourhood to sample.
+        num_nodes: Number of nodes in the graph.
+
+    Returns:
+        Tuple (batch_size, n_id, adjs) in the format of NeighborSampler. n_id starts with node_idx, followed by
+        their neighbours. adjs contains a single (edge_index_minibatch, original_edge_index, sizes) tuple, whose
+        edges are ordered by target node.
+    """
+    is_target = torch.zeros(num_nodes, dtype=torch.bool)
+    is_target[node_idx] = True
+    target_position = torch.full((num_nodes,), -1, dtype=torch.long)
+    target_position[node_idx] = torch.arange(len(node_idx))
+
+    e_id = torch.nonzero(is_target[edge_index[1]], as_tuple=False).flatten()
+    source, target = edge_index[0, e_id], edge_index[1, e_id]
+    # Order edges by target then source, as in the CSR adjacency used by NeighborSampler.
+    order = torch.argsort(target_position[target] * num_nodes + source)
+    e_id, source, target = e_id[order], source[order], target[order]
+
+    n_id = torch.cat((node_idx, torch.unique(source[~is_target[source]])))
+    local_idx = torch.full((num_nodes,), -1, dtype=torch.long)
+    local_idx[n_id] = torch.arange(len(n_id))
+    edge_index_minibatch = torch.stack((local_idx[source], local_idx[target]))
+    return len(node_idx), n_id, [(edge_index_minibatch, e_id, (len(n_id), len(node_idx)))]
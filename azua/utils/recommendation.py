@@ -0,0 +1,163 @@
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+import torch
+from scipy.sparse import csr_matrix, spmatrix
+
+from ..models.imodel import IModelForRecommendation
+
+ScoreFunction = Callable[[torch.Tensor, torch.Tensor], torch.Tensor]
+
+
+def recommend_top_k(
+    model: IModelForRecommendation,
+    k: int,
+    user_idxs: Optional[np.ndarray] = None,
+    observed_mask: Optional[spmatrix] = None,
+    user_batch_size: int = 256,
+    item_block_size: int = 4096,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Recommend the k highest scoring items for each user, using the model's cached user and item embeddings.
+
+    Args:
+        model: Trained recommendation model.
+        k: Number of items to recommend per user.
+        user_idxs: Users to recommend items for. If None, all users are used.
+        observed_mask: Sparse matrix of shape (user_count, item_count), nonzero for already observed user-item pairs,
+            which are excluded from the recommendations.
+        user_batch_size: Number of users to score at once.
+        item_block_size: Number of items to score at once for each batch of users.
+
+    Returns:
+        Tuple (top_items, top_scores) of arrays of shape (len(user_idxs), k), sorted by decreasing score.
+    """
+    user_embeddings, item_embeddings = model.get_user_item_embeddings()
+    return top_k_items(
+        user_embeddings,
+        item_embeddings,
+        model.score_user_item_embeddings,
+        k,
+        user_idxs=user_idxs,
+        observed_mask=observed_mask,
+        user_batch_size=user_batch_size,
+        item_block_size=item_block_size,
+    )
+
+
+def top_k_items(
+    user_embeddings: torch.Tensor,
+    item_embeddings: torch.Tensor,
+    score_fn: ScoreFunction,
+    k: int,
+    user_idxs: Optional[np.ndarray] = None,
+    observed_mask: Optional[spmatrix] = None,
+    user_batch_size: int = 256,
+    item_block_size: int = 4096,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Find the k highest scoring items for each user. Users are processed in batches, and for each batch the items are
+    scored in blocks, merging each block into a running top-k, so that only (user_batch_size, item_block_size + k)
+    scores are held in memory at once.
+
+    Args:
+        user_embeddings: Shape (user_count, user_embedding_dim).
+        item_embeddings: Shape (item_count, item_embedding_dim).
+        score_fn: Function mapping user and item embeddings to scores of shape (user_count, item_count).
+        k: Number of items to return per user. Capped at item_count.
+        user_idxs: Users to find the top items for. If None, all users are used.
+        observed_mask: Sparse matrix of shape (user_count, item_count), nonzero for already observed user-item pairs,
+            which are excluded.
+        user_batch_size: Number of users to score at once.
+        item_block_size: Number of items to score at once for each batch of users.
+
+    Returns:
+        Tuple (top_items, top_scores) of arrays of shape (len(user_idxs), k), sorted by decreasing score. If a user
+        has fewer than k unobserved items, the remaining entries have score -inf.
+    """
+    num_items = item_embeddings.shape[0]
+    k = min(k, num_items)
+    if user_idxs is None:
+        user_idxs = np.arange(user_embeddings.shape[0])
+    if observed_mask is not None:
+        observed_mask = csr_matrix(observed_mask)
+    device = item_embeddings.device
+
+    top_items = np.empty((len(user_idxs), k), dtype=np.int64)
+    top_scores = np.empty((len(user_idxs), k), dtype=np.float32)
+    with torch.no_grad():
+        for start in range(0, len(user_idxs), user_batch_size):
+            batch_idxs = user_idxs[start : start + user_batch_size]
+            batch_embeddings = user_embeddings[torch.as_tensor(batch_idxs, device=user_embeddings.device)]
+            if observed_mask is not None:
+                observed = observed_mask[batch_idxs].tocoo()
+                observed_rows = torch.as_tensor(observed.row, dtype=torch.long, device=device)
+                observed_cols = torch.as_tensor(observed.col, dtype=torch.long, device=device)
+
+            best_scores = torch.empty(len(batch_idxs), 0, device=device)
+            best_items = torch.empty(len(batch_idxs), 0, dtype=torch.long, device=device)
+            for item_start in range(0, num_items, item_block_size):
+                item_end = min(item_start + item_block_size, num_items)
+                scores = score_fn(batch_embeddings, item_embeddings[item_start:item_end]).float()
+                if observed_mask is not None:
+                    in_block = (observed_cols >= item_start) & (observed_cols < item_end)
+                    scores[observed_rows[in_block], observed_cols[in_block] - item_start] = -np.inf
+
+                block_items = torch.arange(item_start, item_end, device=device).expand(len(batch_idxs), -1)
+                candidate_scores = torch.cat((best_scores, scores), dim=1)
+                candidate_items = torch.cat((best_items, block_items), dim=1)
+                best_scores, best_idxs = torch.topk(candidate_scores, min(k, candidate_scores.shape[1]), dim=1)
+                best_items = torch.gather(candidate_items, 1, best_idxs)
+
+            top_scores[start : start + len(batch_idxs)] = best_scores.cpu().numpy()
+            top_items[start : start + len(batch_idxs)] = best_items.cpu().numpy()
+    return top_items, top_scores
+
+
+def benchmark_top_k(
+    user_embeddings: torch.Tensor,
+    item_embeddings: torch.Tensor,
+    score_fn: ScoreFunction,
+    k: int,
+    observed_mask: Optional[spmatrix] = None,
+    user_batch_size: int = 256,
+    item_block_size: int = 4096,
+    num_latency_queries: int = 100,
+    seed: int = 0,
+) -> Dict[str, float]:
+    """
+    Measure the throughput of top-k recommendation for all users in batches, and the latency of single-user queries.
+
+    Args:
+        user_embeddings, item_embeddings, score_fn, k, observed_mask, user_batch_size, item_block_size: As for
+            top_k_items.
+        num_latency_queries: Number of randomly chosen users to time single-user queries for.
+        seed: Random seed for choosing the users of the latency queries.
+
+    Returns:
+        Dictionary of benchmark results: throughput in users and in scored user-item pairs per second, and the mean,
+        median, 95th and 99th percentile latency of single-user queries in milliseconds.
+    """
+    num_users, num_items = user_embeddings.shape[0], item_embeddings.shape[0]
+    topk_kwargs = {"observed_mask": observed_mask, "item_block_size": item_block_size}
+
+    start_time = time.perf_counter()
+    top_k_items(user_embeddings, item_embeddings, score_fn, k, user_batch_size=user_batch_size, **topk_kwargs)
+    total_time = time.perf_counter() - start_time
+
+    rng = np.random.default_rng(seed)
+    latencies = []
+    for user_idx in rng.integers(num_users, size=num_latency_queries):
+        start_time = time.perf_counter()
+        top_k_items(user_embeddings, item_embeddings, score_fn, k, user_idxs=np.array([user_idx]), **topk_kwargs)
+        latencies.append(1000 * (time.perf_counter() - start_time))
+
+    return {
+        "throughput_users_per_sec": num_users / total_time,
+        "throughput_pairs_per_sec": num_users * num_items / total_time,
+        "latency_ms_mean": float(np.mean(latencies)),
+        "latency_ms_p50": float(np.percentile(latencies, 50)),
+        "latency_ms_p95": float(np.percentile(latencies, 95)),
+        "latency_ms_p99": float(np.percentile(latencies, 99)),
+    }
@@ -0,0 +1,117 @@
+import json
+import os
+import struct
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import torch
+
+# Tensor files use the safetensors layout: an 8 byte little-endian header size, a JSON header describing each tensor
+# and holding string metadata under "__metadata__", and the raw tensor data, in the order given by the header offsets.
+_HEADER_SIZE_FORMAT = "<Q"
+_METADATA_KEY = "__metadata__"
+
+_DTYPES: Dict[torch.dtype, Tuple[str, type]] = {
+    torch.float64: ("F64", np.float64),
+    torch.int64: ("I64", np.int64),
+    torch.float32: ("F32", np.float32),
+    torch.int32: ("I32", np.int32),
+    torch.float16: ("F16", np.float16),
+    torch.int16: ("I16", np.int16),
+    torch.int8: ("I8", np.int8),
+    torch.uint8: ("U8", np.uint8),
+    torch.bool: ("BOOL", np.bool_),
+}
+_NUMPY_DTYPES = {name: np_dtype for name, np_dtype in _DTYPES.values()}
+
+
+def save_tensor_file(path: str, tensors: Dict[str, torch.Tensor], metadata: Optional[Dict[str, str]] = None) -> None:
+    """
+    Save a dictionary of tensors, e.g. a state_dict, and string metadata to a single file, which can be loaded without
+    copying with load_tensor_file.
+
+    Args:
+        path: Path to save the tensors to.
+        tensors: Dictionary of dense tensors to save.
+        metadata: Optional string metadata to save with the tensors.
+    """
+    # Store tensors with larger elements first, so that every tensor is aligned to its element size when loaded.
+    arrays = {}
+    for name in sorted(tensors, key=lambda name: (-tensors[name].element_size(), name)):
+        tensor = tensors[name]
+        if tensor.dtype not in _DTYPES or tensor.layout != torch.strided:
+            raise ValueError(f"Tensor {name} with dtype {tensor.dtype} and layout {tensor.layout} cannot be saved.")
+        arrays[name] = tensor.detach().cpu().contiguous().numpy()
+
+    header: Dict[str, Dict] = {}
+    if metadata is not None:
+        header[_METADATA_KEY] = metadata
+    offset = 0
+    for name, array in arrays.items():
+        dtype_name, _ = _DTYPES[tensors[name].dtype]
+        header[name] = {
+            "dtype": dtype_name,
+            "shape": list(array.shape),
+            "data_offsets": [offset, offset + array.nbytes],
+        }
+        offset += array.nbytes
+    header_bytes = json.dumps(header, separators=(",", ":")).encode()
+    # Pad the header with spaces, so that the tensor data starts at a multiple of 8 bytes.
+    header_bytes += b" " * (-len(header_bytes) % 8)
+
+    # Write to a temporary file first, so that readers never see a partially written file.
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(struct.pack(_HEADER_SIZE_FORMAT, len(header_bytes)))
+        f.write(header_bytes)
+        for array in arrays.values():
+            f.write(array.tobytes())
+    os.replace(tmp_path, path)
+
+
+def load_tensor_file(path: str) -> Tuple[Dict[str, torch.Tensor], Dict[str, str]]:
+    """
+    Load tensors and metadata saved with save_tensor_file. The file is memory-mapped rather than read, and the tensors
+    are copy-on-write CPU views of it, so only the parts of the file that are used are read from disk.
+
+    Args:
+        path: Path to load the tensors from.
+
+    Returns:
+        tensors: Dictionary of the loaded tensors.
+        metadata: String metadata saved with the tensors.
+    """
+    header_size = _read_header_size(path)
+    if header_size is None:
+        raise ValueError(f"{path} is not a tensor file.")
+    data_start = struct.calcsize(_HEADER_SIZE_FORMAT) + header_size
+    file_data = np.memmap(path, dtype=np.uint8, mode="c")
+    header = json.loads(bytes(file_data[struct.calcsize(_HEADER_SIZE_FORMAT) : data_start]))
+    metadata = header.pop(_METADATA_KEY, {})
+
+    tensors = {}
+    for name, info in header.items():
+        start, end = info["data_offsets"]
+        array = file_data[data_start + start : data_start + end].view(_NUMPY_DTYPES[info["dtype"]])
+        tensors[name] = torch.from_numpy(array.reshape(info["shape"]))
+    return tensors, metadata
+
+
+def is_tensor_file(path: str) -> bool:
+    """
+    Return whether path is a file saved with save_tensor_file (rather than e.g. with torch.save).
+    """
+    return _read_header_size(path) is not None
+
+
+def _read_header_size(path: str) -> Optional[int]:
+    size_bytes = struct.calcsize(_HEADER_SIZE_FORMAT)
+    with open(path, "rb") as f:
+        prefix = f.read(size_bytes + 1)
+    if len(prefix) < size_bytes + 1:
+        return None
+    (header_size,) = struct.unpack(_HEADER_SIZE_FORMAT, prefix[:size_bytes])
+    # Files saved by torch.save start with a zip or pickle signature, which gives an implausible header size.
+    if prefix[size_bytes:] != b"{" or size_bytes + header_size > os.path.getsize(path):
+        return None
+    return header_size
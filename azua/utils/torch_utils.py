@@ -1,5 +1,5 @@
 import random
-from typing import List, Optional, Type, Union, Tuple
+from typing import Iterator, List, Optional, Type, Union, Tuple
 
 import numpy as np
 from scipy.sparse import issparse, csr_matrix
@@ -16,6 +16,8 @@ from torch.utils.data import (
     Sampler,
 )
 from ..utils.data_mask_utils import to_tensors
+from ..utils.fast_data_loader import PrefetchDataLoader
+from ..datasets.torch_datasets import TemporalTensorDataset
 
 
 def set_random_seeds(seed):
@@ -175,61 +177,193 @@ def create_dataloader(
     sample_randomly: bool = True,
     dtype: torch.dtype = torch.float,
     device: torch.device = torch.device("cpu"),
+    sparse_output_format: str = "dense",
+    prefetch_batches: int = 0,
 ) -> DataLoader:
     """
     Device specifies the device on which the TensorDataset is created. This should be CPU in most cases, as we 
     typically do not wish to store the whole dataset on the GPU.
+
+    Sparse (CSR) arrays are sliced one whole minibatch at a time, and are returned either as dense tensors
+    (sparse_output_format="dense") or as `torch.sparse_csr` tensors (sparse_output_format="sparse_csr"). The latter
+    requires a torch version with CSR tensor support (torch.sparse_csr_tensor), which torch 1.7 does not have.
+    If prefetch_batches > 0, up to that many minibatches are prepared ahead of time in a background thread.
     """
     assert len(arrays) > 0
     dataset: Dataset
+    row_count = arrays[0].shape[0]
+    max_iterations = np.ceil(row_count / batch_size)
+    if iterations > max_iterations:
+        iterations = -1
+
+    dataloader: DataLoader
     if issparse(arrays[0]):
         assert all([issparse(arr) for arr in arrays])
         # TODO: To fix type error need to cast arrays from Tuple[Union[ndarray, csr_matrix]] to Tuple[csr_matrix],
         # but MyPy doesn't seem to detect it when I do this.
-        dataset = SparseTensorDataset(*arrays, dtype=dtype, device=device)  # type: ignore
+        dataset = SparseTensorDataset(
+            *arrays, dtype=dtype, device=device, output_format=sparse_output_format  # type: ignore
+        )
+        index_batch_sampler = IndexBatchSampler(
+            row_count, batch_size=batch_size, iterations=iterations, sample_randomly=sample_randomly
+        )
+        # Automatic batching is disabled (batch_size=None), so that each element produced by the sampler is a whole
+        # minibatch of row indices, which is extracted from the sparse matrices in a single operation.
+        dataloader = DataLoader(
+            dataset,
+            sampler=index_batch_sampler,  # type: ignore
+            batch_size=None,
+            pin_memory=sparse_output_format == "dense",
+        )
     else:
         assert all([not issparse(arr) for arr in arrays])
         dataset = TensorDataset(*to_tensors(*arrays, dtype=dtype, device=device))
 
-    row_count = arrays[0].shape[0]
-    max_iterations = np.ceil(row_count / batch_size)
-    if iterations > max_iterations:
+        if sample_randomly:
+            if iterations == -1:
+                # mypy throws an error when using a pytorch Dataset for the pytorch RandomSampler. This seems to be an issue in pytorch typing.
+                sampler: Sampler = RandomSampler(dataset)  # type: ignore
+            else:
+                sampler = RandomSampler(dataset, replacement=True, num_samples=iterations * batch_size)  # type: ignore
+        else:
+            sampler = SequentialSampler(dataset)
+
+        batch_sampler = BatchSampler(sampler, batch_size=batch_size, drop_last=False)
+        dataloader = DataLoader(dataset, batch_sampler=batch_sampler, pin_memory=True)
+
+    if prefetch_batches > 0:
+        dataloader = PrefetchDataLoader(dataloader, prefetch_batches=prefetch_batches)
+    return dataloader
+
+
+def create_temporal_dataloader(
+    *arrays: np.ndarray,
+    lag: int,
+    is_autoregressive: bool,
+    index_segmentation: List[Tuple[int, int]],
+    batch_size: int,
+    iterations: int = -1,
+    sample_randomly: bool = True,
+    dtype: torch.dtype = torch.float,
+    device: torch.device = torch.device("cpu"),
+) -> DataLoader:
+    """
+    Create a data loader serving fixed-lag windows of temporal data (see TemporalTensorDataset), where arrays contain
+    all time series concatenated along the first axis and index_segmentation gives the (start, end) rows of each
+    series. Each minibatch of windows is gathered in a single operation from strided views of the data.
+    """
+    dataset = TemporalTensorDataset(
+        *to_tensors(*arrays, dtype=dtype, device=device),
+        lag=lag,
+        is_autoregressive=is_autoregressive,
+        index_segmentation=index_segmentation,
+    )
+    num_windows = len(dataset)
+    if iterations > np.ceil(num_windows / batch_size):
         iterations = -1
+    index_batch_sampler = IndexBatchSampler(
+        num_windows, batch_size=batch_size, iterations=iterations, sample_randomly=sample_randomly
+    )
+    # Automatic batching is disabled, so each element produced by the sampler indexes a whole minibatch of windows.
+    return DataLoader(dataset, sampler=index_batch_sampler, batch_size=None)  # type: ignore
+
 
-    if sample_randomly:
-        if iterations == -1:
-            # mypy throws an error when using a pytorch Dataset for the pytorch RandomSampler. This seems to be an issue in pytorch typing.
-            sampler: Sampler = RandomSampler(dataset)  # type: ignore
+class IndexBatchSampler(Sampler):
+    """
+    Sampler over the rows of a dataset which yields whole minibatches of row indices at a time, so that each
+    minibatch can be extracted (e.g. from a CSR matrix) with a single slicing operation rather than row by row.
+    Sequential minibatches are yielded as contiguous slices. Random minibatches are yielded as sorted arrays of row
+    indices, drawn from a single permutation per epoch or, if `iterations` is set, with replacement.
+    """
+
+    def __init__(self, num_rows: int, batch_size: int, iterations: int = -1, sample_randomly: bool = True):
+        """
+        Args:
+            num_rows: Number of rows in the dataset to sample from.
+            batch_size: Number of rows in each minibatch.
+            iterations: Number of minibatches per epoch when sampling randomly with replacement. -1 means a single
+                pass over a random permutation of all rows.
+            sample_randomly: Whether to shuffle rows. If False, rows are returned in order in contiguous slices.
+        """
+        self._num_rows = num_rows
+        self._batch_size = batch_size
+        self._iterations = iterations
+        self._sample_randomly = sample_randomly
+
+    def __iter__(self) -> Iterator[Union[slice, np.ndarray]]:
+        # The random state of the epoch is drawn here, on the calling thread, rather than lazily by the generator, which
+        # may be consumed in a background thread (see PrefetchDataLoader) concurrently with other uses of np.random.
+        rng = np.random.default_rng(np.random.randint(np.iinfo(np.int32).max)) if self._sample_randomly else None
+        return self._iter_batches(rng)
+
+    def _iter_batches(self, rng: Optional[np.random.Generator]) -> Iterator[Union[slice, np.ndarray]]:
+        if rng is None:
+            for start in range(0, self._num_rows, self._batch_size):
+                yield slice(start, min(start + self._batch_size, self._num_rows))
+        elif self._iterations == -1:
+            permutation = rng.permutation(self._num_rows)
+            for start in range(0, self._num_rows, self._batch_size):
+                # Sorting row indices makes the CSR row gather access memory in order.
+                yield np.sort(permutation[start : start + self._batch_size])
         else:
-            sampler = RandomSampler(dataset, replacement=True, num_samples=iterations * batch_size)  # type: ignore
-    else:
-        sampler = SequentialSampler(dataset)
+            for _ in range(self._iterations):
+                yield np.sort(rng.integers(0, self._num_rows, size=self._batch_size))
 
-    batch_sampler = BatchSampler(sampler, batch_size=batch_size, drop_last=False)
-    dataloader = DataLoader(dataset, batch_sampler=batch_sampler, pin_memory=True)
-    return dataloader
+    def __len__(self) -> int:
+        if self._sample_randomly and self._iterations != -1:
+            return self._iterations
+        return int(np.ceil(self._num_rows / self._batch_size))
 
 
 class SparseTensorDataset(Dataset):
     """
     Custom dataset class which takes in a sparse matrix (assumed to be efficiently indexable row-wise, ie csr) and
-    returns dense tensors containing requested rows. Ensures that the large matrices are kept sparse at all times,
+    returns tensors containing requested rows. Ensures that the large matrices are kept sparse at all times,
     and only converted to dense matrices one minibatch at a time.
+
+    Indexing with an int returns single rows, as for a standard map-style dataset. Indexing with a slice or an array
+    of row indices (as produced by IndexBatchSampler) returns a whole minibatch, either as dense tensors or as
+    `torch.sparse_csr` tensors depending on `output_format`.
     """
 
     def __init__(
-        self, *matrices: Tuple[csr_matrix, ...], dtype: torch.dtype = torch.float, device: torch.device,
+        self,
+        *matrices: Tuple[csr_matrix, ...],
+        dtype: torch.dtype = torch.float,
+        device: torch.device,
+        output_format: str = "dense",
     ):
+        if output_format not in ["dense", "sparse_csr"]:
+            raise ValueError(f"Unsupported output format {output_format}, must be one of 'dense' or 'sparse_csr'")
+        if output_format == "sparse_csr" and not hasattr(torch, "sparse_csr_tensor"):
+            raise ValueError(
+                "Output format 'sparse_csr' requires torch.sparse_csr_tensor, which is not available in torch "
+                f"{torch.__version__}. Use output format 'dense' instead."
+            )
         self._matrices = matrices
         self._dtype = dtype
         self._device = device
+        self._output_format = output_format
 
     def __getitem__(self, idx):
-        data_rows = tuple(
-            torch.as_tensor(matrix[idx, :].toarray().squeeze(axis=0), dtype=self._dtype, device=self._device,)
-            for matrix in self._matrices
+        if isinstance(idx, (int, np.integer)):
+            return tuple(
+                torch.as_tensor(matrix[idx, :].toarray().squeeze(axis=0), dtype=self._dtype, device=self._device,)
+                for matrix in self._matrices
+            )
+        return tuple(self._to_tensor(matrix[idx]) for matrix in self._matrices)
+
+    def _to_tensor(self, batch: csr_matrix) -> torch.Tensor:
+        if self._output_format == "dense":
+            return torch.as_tensor(batch.toarray(), dtype=self._dtype, device=self._device)
+        batch = csr_matrix(batch)
+        return torch.sparse_csr_tensor(
+            torch.as_tensor(batch.indptr, dtype=torch.long),
+            torch.as_tensor(batch.indices, dtype=torch.long),
+            torch.as_tensor(batch.data, dtype=self._dtype),
+            size=batch.shape,
+            device=self._device,
         )
-        return data_rows
 
     def __len__(self):
         return self._matrices[0].shape[0]
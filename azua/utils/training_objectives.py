@@ -275,8 +275,9 @@ def get_input_and_scoring_masks(
              scoring_mask (also, unprocessed mask) indicates which entries in the output should be included when calculating negative log-likelihood loss.
     """
 
-    p_missing = torch.rand(mask.shape[0], 1) * max_p_train_dropout
-    input_mask = mask * torch.bernoulli(1.0 - p_missing.expand_as(mask)).to(mask.dtype).to(mask.device)
+    # Draw the dropout mask for the whole batch on the device of the mask, to avoid a host to device copy per batch.
+    p_missing = torch.rand(mask.shape[0], 1, device=mask.device) * max_p_train_dropout
+    input_mask = mask * torch.bernoulli(1.0 - p_missing.expand_as(mask)).to(mask.dtype)
     if score_reconstruction:
         if score_imputation:
             # Score both reconstruction and imputation
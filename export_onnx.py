@@ -0,0 +1,44 @@
+"""
+Export ONNX representations of the components of a trained model.
+
+Models no longer save ONNX files every time they are saved, so run this script on a trained model to produce them, e.g.
+
+    python export_onnx.py runs/<experiment>/models/<model_id>
+
+The ONNX files are saved to the model directory, unless --output_dir is given.
+"""
+
+import argparse
+import logging
+import os
+import sys
+
+from azua.models.models_factory import load_model
+from azua.models.torch_model import TorchModel
+from azua.utils.run_utils import find_local_model_dir
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description="Export ONNX representations of a trained model.")
+    parser.add_argument("model_dir", type=str, help="Directory of the trained model, or a directory containing it.")
+    parser.add_argument("--output_dir", "-o", type=str, default=None, help="Directory to save the ONNX files to.")
+    parser.add_argument("--device", "-dv", type=str, default="cpu", help="Device to load the model on.")
+    return parser.parse_args()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    args = get_args()
+    model_dir, model_id = find_local_model_dir(args.model_dir)
+    model = load_model(model_id, model_dir, args.device)
+    if not isinstance(model, TorchModel):
+        raise TypeError(f"ONNX export is only supported for torch models, not {type(model).__name__}.")
+
+    output_dir = model_dir if args.output_dir is None else args.output_dir
+    os.makedirs(output_dir, exist_ok=True)
+    if not model.export_onnx(output_dir):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Benchmarks top-K recommendation with a trained recommendation model (GRAPE, CoRGi, GCMC and the other graph neural
+networks, or deep matrix factorization), using the user and item embeddings cached during training.
+
+Run from the repository root, e.g.
+
+    python research_experiments/GNN/benchmark_recommendation.py -m runs/<experiment>/models/<model_id> -k 10
+
+Already observed user-item pairs can be excluded from the recommendations by passing a scipy sparse matrix of shape
+(user_count, item_count), saved with scipy.sparse.save_npz, as --observed_mask_path.
+"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+import scipy.sparse
+import torch
+
+from azua.models.imodel import IModelForRecommendation
+from azua.models.models_factory import load_model
+from azua.utils.recommendation import benchmark_top_k, top_k_items
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description="Benchmarks top-K recommendation with a trained model.")
+    parser.add_argument("--model_dir", "-m", type=str, required=True, help="Directory of the trained model.")
+    parser.add_argument("--device", "-d", type=str, default="cpu", help="Device to run the model on.")
+    parser.add_argument("-k", type=int, default=10, help="Number of items to recommend per user.")
+    parser.add_argument("--observed_mask_path", type=str, default=None, help="Observed user-item pairs to exclude.")
+    parser.add_argument("--user_batch_size", type=int, default=256, help="Number of users to score at once.")
+    parser.add_argument("--item_block_size", type=int, default=4096, help="Number of items to score at once.")
+    parser.add_argument(
+        "--num_latency_queries", type=int, default=100, help="Number of single-user queries to time the latency of."
+    )
+    parser.add_argument("--output_path", "-o", type=str, default=None, help="Path to save the results json to.")
+    return parser.parse_args()
+
+
+def main():
+    args = get_args()
+    model_id = os.path.basename(os.path.normpath(args.model_dir))
+    model = load_model(model_id, args.model_dir, args.device)
+    assert isinstance(model, IModelForRecommendation), "Model does not support recommendation."
+
+    user_embeddings, item_embeddings = model.get_user_item_embeddings()
+    observed_mask = None if args.observed_mask_path is None else scipy.sparse.load_npz(args.observed_mask_path)
+
+    results = benchmark_top_k(
+        user_embeddings,
+        item_embeddings,
+        model.score_user_item_embeddings,
+        args.k,
+        observed_mask=observed_mask,
+        user_batch_size=args.user_batch_size,
+        item_block_size=args.item_block_size,
+        num_latency_queries=args.num_latency_queries,
+    )
+    results.update(
+        {"num_users": user_embeddings.shape[0], "num_items": item_embeddings.shape[0], "k": args.k},
+    )
+
+    # Sanity check: blocked top-K agrees with scoring all items at once.
+    user_idxs = np.arange(min(8, user_embeddings.shape[0]))
+    top_items, _ = top_k_items(
+        user_embeddings, item_embeddings, model.score_user_item_embeddings, args.k, user_idxs=user_idxs
+    )
+    with torch.no_grad():
+        all_scores = model.score_user_item_embeddings(user_embeddings[user_idxs], item_embeddings)
+    expected_scores = torch.topk(all_scores, top_items.shape[1], dim=1)[0].cpu().numpy()
+    found_scores = np.take_along_axis(all_scores.cpu().numpy(), top_items, axis=1)
+    assert np.allclose(found_scores, expected_scores, atol=1e-5)
+
+    print(json.dumps(results, indent=4))
+    if args.output_path is not None:
+        with open(args.output_path, "w") as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
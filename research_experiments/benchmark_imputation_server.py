@@ -0,0 +1,83 @@
+"""
+Load-generator benchmark for ImputationServer. A number of client threads each send imputation requests of a few rows,
+one after another, to a server which coalesces them into batches, and to a server which imputes every request on its
+own (no coalescing), as happens when each request calls model.impute(). Throughput and the latency histograms of both
+are reported.
+
+Run from the repository root, e.g.
+
+    python research_experiments/benchmark_imputation_server.py runs/<experiment>/models/<model_id> data/<dataset>/all.csv \
+        --clients 16 --rows_per_request 4 --requests_per_client 50
+"""
+
+import argparse
+import json
+import threading
+import time
+
+import numpy as np
+
+from azua.datasets.csv_dataset_loader import CSVDatasetLoader
+from azua.models.imputation_server import ImputationServer
+from azua.models.models_factory import load_model
+from azua.utils.run_utils import find_local_model_dir
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description="Benchmarks coalescing of imputation requests.")
+    parser.add_argument("model_dir", type=str, help="Directory of the trained model.")
+    parser.add_argument("data_path", type=str, help="CSV file of data to draw request rows from.")
+    parser.add_argument("--clients", type=int, default=16, help="Number of concurrent client threads.")
+    parser.add_argument("--rows_per_request", type=int, default=4, help="Number of rows in each request.")
+    parser.add_argument("--requests_per_client", type=int, default=50, help="Number of requests sent by each client.")
+    parser.add_argument("--sample_count", type=int, default=10, help="Number of imputation samples.")
+    parser.add_argument("--max_batch_rows", type=int, default=256, help="Maximum rows coalesced into one batch.")
+    parser.add_argument("--max_delay_ms", type=float, default=5.0, help="Maximum coalescing delay.")
+    parser.add_argument("--missing_fraction", type=float, default=0.3, help="Fraction of values to hide.")
+    parser.add_argument("--device", "-d", type=str, default="cpu", help="Device to load the model on.")
+    return parser.parse_args()
+
+
+def run_clients(server: ImputationServer, data: np.ndarray, mask: np.ndarray, args) -> float:
+    """
+    Send requests from args.clients threads to the server, and return the total time taken in seconds.
+    """
+
+    def client(client_index: int):
+        rng = np.random.default_rng(client_index)
+        for _ in range(args.requests_per_client):
+            rows = rng.integers(0, data.shape[0], size=args.rows_per_request)
+            server.impute(data[rows], mask[rows])
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(args.clients)]
+    start_time = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.time() - start_time
+
+
+def main():
+    args = get_args()
+    model_dir, model_id = find_local_model_dir(args.model_dir)
+    model = load_model(model_id, model_dir, args.device)
+    data, mask = CSVDatasetLoader.read_csv_from_file(args.data_path)
+    mask = mask * (np.random.default_rng(0).random(mask.shape) >= args.missing_fraction)
+    impute_config = {"sample_count": args.sample_count, "batch_size": args.max_batch_rows}
+
+    results = {}
+    for name, max_batch_rows, max_delay_ms in [
+        ("no_coalescing", 1, 0.0),
+        ("coalescing", args.max_batch_rows, args.max_delay_ms),
+    ]:
+        server = ImputationServer(model, impute_config, max_batch_rows=max_batch_rows, max_delay_ms=max_delay_ms)
+        total_time = run_clients(server, data, mask, args)
+        server.close()
+        num_rows = args.clients * args.requests_per_client * args.rows_per_request
+        results[name] = {"rows_per_second": num_rows / total_time, **server.stats()}
+    print(json.dumps(results, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmarks the data loaders used to train models on dense data: the per-row DataLoader built by create_dataloader, and
+the pre-batched FastTensorDataLoader now used by train_model. Each loader is timed on its own and together with a
+training step of a small MLP, as is typical for tabular models, whose compute per minibatch is often smaller than the
+data loading overhead.
+
+Run from the repository root, e.g.
+
+    python research_experiments/benchmark_train_dataloader.py --rows 100000 --features 50 --batch_size 100
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+import torch
+
+from azua.models.torch_training import create_train_and_val_dataloaders
+from azua.utils.torch_utils import create_dataloader
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description="Benchmarks training data loaders for dense data.")
+    parser.add_argument("--rows", type=int, default=100000, help="Number of rows in the dataset.")
+    parser.add_argument("--features", type=int, default=50, help="Number of features in the dataset.")
+    parser.add_argument("--batch_size", type=int, default=100, help="Minibatch size.")
+    parser.add_argument("--iterations", type=int, default=-1, help="Iterations per epoch. -1 is all iterations.")
+    parser.add_argument("--epochs", type=int, default=3, help="Number of epochs to time each loader over.")
+    parser.add_argument("--device", "-d", type=str, default="cpu", help="Device to run the training step on.")
+    return parser.parse_args()
+
+
+class _DenseData:
+    # Minimal stand-in for a dense Dataset, with only the attributes used by create_train_and_val_dataloaders.
+    def __init__(self, data: np.ndarray, mask: np.ndarray):
+        self.train_data_and_mask = (data, mask)
+        self.has_val_data = False
+
+
+def time_epochs(dataloader, epochs: int, step=None) -> float:
+    """
+    Return the mean time (in seconds) to iterate over the data loader for one epoch, running step on each minibatch.
+    """
+    start_time = time.time()
+    for _ in range(epochs):
+        for batch in dataloader:
+            if step is not None:
+                step(batch)
+    return (time.time() - start_time) / epochs
+
+
+def main():
+    args = get_args()
+    device = torch.device(args.device)
+    rng = np.random.default_rng(0)
+    data = rng.standard_normal((args.rows, args.features)).astype(np.float32)
+    mask = (rng.random((args.rows, args.features)) > 0.3).astype(np.float32)
+
+    model = torch.nn.Sequential(
+        torch.nn.Linear(2 * args.features, 50), torch.nn.ReLU(), torch.nn.Linear(50, args.features)
+    ).to(device)
+    optimizer = torch.optim.Adam(model.parameters())
+
+    def step(batch):
+        x, m = [t.to(device) for t in batch]
+        optimizer.zero_grad()
+        loss = (((model(torch.cat((x * m, m), dim=1)) - x) ** 2) * m).sum()
+        loss.backward()
+        optimizer.step()
+
+    dataloaders = {
+        "create_dataloader": create_dataloader(
+            data, mask, batch_size=args.batch_size, iterations=args.iterations, sample_randomly=True
+        ),
+        "fast_tensor_dataloader": create_train_and_val_dataloaders(
+            _DenseData(data, mask), batch_size=args.batch_size, iterations=args.iterations
+        )[0],
+    }
+    results = {}
+    for name, dataloader in dataloaders.items():
+        load_time = time_epochs(dataloader, args.epochs)
+        train_time = time_epochs(dataloader, args.epochs, step)
+        results[name] = {
+            "batches_per_epoch": len(dataloader),
+            "load_epoch_time": load_time,
+            "train_epoch_time": train_time,
+            "load_rows_per_second": len(dataloader) * args.batch_size / load_time,
+        }
+    print(json.dumps(results, indent=4))
+
+
+if __name__ == "__main__":
+    main()
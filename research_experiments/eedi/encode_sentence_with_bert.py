@@ -1,27 +1,23 @@
-from transformers import BertModel
-from transformers import BertTokenizer
-import torch
-from tqdm import tqdm
+"""
+Populates the text embedding store with the BERT token embeddings of the item sentences, so that CoRGi
+(use_transformer=True) and the bert_cls/bert_average node initializations do not need to run BERT at training time.
+
+Run from the repository root, with the same arguments as sentence_to_embedding.py, e.g.
+
+    python research_experiments/eedi/encode_sentence_with_bert.py -d data/goodreads --text_embedding_store_dir data/text_embedding_store
+
+The store is only used by CoRGi if text_embedding_store_dir is set in the model config (it is null by default). The store
+directory and max length need to match the text_embedding_store_dir and max_transformer_length of the model config.
+"""
 
 import sys
 
 sys.path.insert(0, "research_experiments/eedi/")
-from sentence_to_embedding import transform_sentence_csv_to_list
+from sentence_to_embedding import get_args, transform_sentence_csv_to_list, encode_sentences_with_bert_store
 
+args = get_args()
 sentences = transform_sentence_csv_to_list()
+# Empty sentences are not encoded by the model.
+sentences = [sentence for sentence in sentences if sentence != ""]
 
-model_id = "bert-base-cased"
-tokenizer = BertTokenizer.from_pretrained(model_id)
-model = BertModel.from_pretrained(model_id)
-
-encoded = tokenizer(sentences, return_tensors="pt", truncation=True, padding=True)
-outputs = model(**encoded)
-bert_output = outputs[0]
-
-bert_output = list()
-for sentence in tqdm(sentences):
-    input_ids = torch.tensor(tokenizer.encode(sentence)).unsqueeze(0)
-    outputs = model(input_ids)
-    last_hidden_states = outputs[0]  # The last hidden-state is the first element of the output tuple
-    print(last_hidden_states.shape)
-    bert_output.append(last_hidden_states)
+encode_sentences_with_bert_store(sentences, "bert-base-cased", args.max_length, args.text_embedding_store_dir)
@@ -31,6 +31,7 @@ from process_raw_OCR_to_sentence import get_sentences
 from transformers import BertModel
 from transformers import BertTokenizer
 import gensim.downloader as api
+from azua.datasets.text_embedding_store import TextEmbeddingStore
 
 
 def get_args():
@@ -62,6 +63,17 @@ def get_args():
         help="Choose which method to use to transform the text into a fixed sized vector.",
     )
 
+    parser.add_argument(
+        "--text_embedding_store_dir",
+        type=str,
+        default="data/text_embedding_store",
+        help="Directory of the store of BERT token embeddings, shared with CoRGi. Sentences missing from the store are encoded and added to it.",
+    )
+
+    parser.add_argument(
+        "--max_length", type=int, default=64, help="Maximum number of BERT tokens per sentence.",
+    )
+
     args = parser.parse_args()
 
     # Create required directories
@@ -93,6 +105,41 @@ def transform_sentence_csv_to_list():
     return sentences
 
 
+def encode_sentences_with_bert_store(sentences, transformer_model_id, max_length, store_dir, batch_size=64):
+    """
+    Get the BERT token embeddings of the sentences from the text embedding store, encoding (in batches) and storing
+    only the sentences missing from the store.
+
+    Returns:
+        List of float16 arrays of shape (num_tokens, 768), one for each sentence, without padding tokens.
+    """
+    store = TextEmbeddingStore(store_dir, transformer_model_id, max_length)
+    tokenizer = model = None
+
+    def encode_fn(missing_sentences):
+        nonlocal tokenizer, model
+        if model is None:
+            tokenizer = BertTokenizer.from_pretrained(transformer_model_id)
+            model = BertModel.from_pretrained(transformer_model_id)
+            model.eval()
+        token_embeddings = []
+        for start in tqdm(range(0, len(missing_sentences), batch_size)):
+            transformer_tokenized = tokenizer(
+                missing_sentences[start : start + batch_size],
+                return_tensors="pt",
+                truncation=True,
+                padding=True,
+                max_length=max_length,
+            )
+            with torch.no_grad():
+                transformer_output = model(**transformer_tokenized)[0]
+            num_tokens = transformer_tokenized["attention_mask"].sum(dim=1).tolist()
+            token_embeddings.extend(output[:n].numpy() for output, n in zip(transformer_output, num_tokens))
+        return token_embeddings
+
+    return store.get_or_encode(sentences, encode_fn)
+
+
 def get_embeddings():
     args = get_args()
     sentences = transform_sentence_csv_to_list()
@@ -110,26 +157,16 @@ def get_embeddings():
         np.save(save_path, embeddings)
     elif args.transform_using in ("bert_cls", "bert_average"):
         transformer_model_id = "bert-base-cased"
-        max_length = 64
-        tokenizer = BertTokenizer.from_pretrained(transformer_model_id)
-        model = BertModel.from_pretrained(transformer_model_id)
-
-        transformer_tokenized = tokenizer(
-            sentences, return_tensors="pt", truncation=True, padding=True, max_length=max_length,
+        token_embeddings = encode_sentences_with_bert_store(
+            sentences, transformer_model_id, args.max_length, args.text_embedding_store_dir
         )
-        with torch.no_grad():
-            transformer_output = model(**transformer_tokenized)[0]
-
-        attention_mask = transformer_tokenized["attention_mask"]
 
         if args.transform_using == "bert_cls":
-            embeddings = np.array(transformer_output[:, 0])
+            embeddings = np.array([np.array(x[0], dtype=np.float32) for x in token_embeddings])
             save_path = os.path.join(args.output_dir, "item_metadata_bert_cls.npy")
             np.save(save_path, embeddings)
         else:
-            embeddings = np.array(
-                [np.array(torch.mean(x[: sum(y).item()], axis=0)) for (x, y) in zip(transformer_output, attention_mask)]
-            )
+            embeddings = np.array([np.mean(np.array(x, dtype=np.float32), axis=0) for x in token_embeddings])
             save_path = os.path.join(args.output_dir, "item_metadata_bert_average.npy")
             np.save(save_path, embeddings)
     elif args.transform_using == "neural_bow":
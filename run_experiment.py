@@ -28,7 +28,8 @@ from dependency_injector.wiring import Provide, inject
 
 
 if __name__ == "__main__":
-    from azua.experiment.azua_context import AzuaContext
+    from azua.experiment.azua_context import AzuaContext, wire_package
+    from azua.experiment.local_scheduler import get_job_dir, run_experiment_jobs
     from azua.experiment.run_aggregation import run_aggregation
     from azua.experiment.run_single_seed_experiment import run_single_seed_experiment, ExperimentArguments
     from azua.utils.configs import get_configs
@@ -36,7 +37,8 @@ if __name__ == "__main__":
     from azua import models  # type: ignore
     from argument_parser import get_parser, validate_args
 else:
-    from .azua.experiment.azua_context import AzuaContext
+    from .azua.experiment.azua_context import AzuaContext, wire_package
+    from .azua.experiment.local_scheduler import get_job_dir, run_experiment_jobs
     from .azua.experiment.run_aggregation import run_aggregation
     from .azua.experiment.run_single_seed_experiment import run_single_seed_experiment, ExperimentArguments
     from .azua.utils.configs import get_configs
@@ -99,6 +101,9 @@ def run_experiment(
     azua_context: AzuaContext = Provide[AzuaContext],
     logger_level: str = "INFO",
     eval_likelihood: bool = True,
+    num_workers: int = 1,
+    resume_dir: Optional[str] = None,
+    profile: bool = False,
 ):
     if active_learning_users_to_plot is None:
         active_learning_users_to_plot = []
@@ -120,12 +125,15 @@ def run_experiment(
             active_learning = ["rand_im", "ei", "k_ei", "b_ei", "bin", "gls"]
 
     # Create directories, record arguments and configs
-    try:
-        models_dir = create_models_dir(output_dir=output_dir, name=name)
-    except FileExistsError:
-        # Timestamp has 1-second resolution, causing trouble if we try to run several times in quick succession
-        time.sleep(1)
-        models_dir = create_models_dir(output_dir=output_dir, name=name)
+    if resume_dir is not None:
+        models_dir = resume_dir
+    else:
+        try:
+            models_dir = create_models_dir(output_dir=output_dir, name=name)
+        except FileExistsError:
+            # Timestamp has 1-second resolution, causing trouble if we try to run several times in quick succession
+            time.sleep(1)
+            models_dir = create_models_dir(output_dir=output_dir, name=name)
     experiment_name = f"{dataset_name}.{model_type}" if name is None else name
     metrics_logger = azua_context.metrics_logger()
     aml_tags = {
@@ -158,7 +166,14 @@ def run_experiment(
     if pipeline_creation_mode:
         train_step_outputs: List[Any] = []
 
-    for model_seed, model_config, dataset_seed, dataset_config in configs:
+    # Run the experiments for each seed with the local scheduler, which runs them in parallel and can resume them,
+    # rather than one after another.
+    use_local_scheduler = num_workers > 1 or resume_dir is not None
+    if use_local_scheduler and pipeline_creation_mode:
+        raise ValueError("Parallel and resumed runs are only supported locally.")
+    scheduled_kwargs_dicts: List[Dict[str, Any]] = []
+
+    for job_index, (model_seed, model_config, dataset_seed, dataset_config) in enumerate(configs):
         kwargs_dict = dict(
             dataset_name=dataset_name,
             data_dir=data_dir,
@@ -188,8 +203,14 @@ def run_experiment(
             aml_tags=aml_tags,
             logger_level=logger_level,
             eval_likelihood=eval_likelihood,
+            profile=profile,
         )
 
+        if use_local_scheduler:
+            kwargs_dict["output_dir"] = get_job_dir(models_dir, job_index, model_seed, dataset_seed)
+            scheduled_kwargs_dicts.append(kwargs_dict)
+            continue
+
         kwargs_file = azua_context.aml_step(
             (lambda **kwargs: run_single_seed_experiment(ExperimentArguments(**kwargs))), pipeline_creation_mode
         )(**kwargs_dict)
@@ -203,6 +224,9 @@ def run_experiment(
             )
             train_step_outputs.append(step_ouput)
 
+    if use_local_scheduler:
+        run_experiment_jobs(scheduled_kwargs_dicts, num_workers=num_workers)
+
     # For local runs, temporary logic to extract input dirs given models_dir
     # Going forward (i.e. once we use AML pipeline for local runs),
     # inputs dirs will be explicitly specified (as they are in remote runs)
@@ -263,6 +287,9 @@ def run_experiment_on_parsed_args(args: argparse.Namespace):
         default_configs_dir=args.default_configs_dir,
         logger_level=args.logger_level,
         eval_likelihood=args.eval_likelihood,
+        num_workers=args.num_workers,
+        resume_dir=args.resume_dir,
+        profile=args.profile,
     )
 
 
@@ -272,7 +299,8 @@ def main(user_args):
     validate_args(args)
 
     azua_context = AzuaContext()
-    azua_context.wire(modules=[sys.modules[__name__]], packages=[models])
+    azua_context.wire(modules=[sys.modules[__name__]])
+    wire_package(azua_context, models)
     run_experiment_on_parsed_args(args)
 
 
@@ -0,0 +1,152 @@
+"""
+Serve imputations from trained models over HTTP.
+
+The models are loaded once, and concurrent requests to each model are coalesced into larger batches by an
+ImputationServer, e.g.
+
+    python serve_imputation.py runs/<experiment>/models/<model_id> --port 8000 --max_delay_ms 5
+
+Endpoints:
+    POST /models/<model_id>/impute with a JSON body {"data": [[...], ...], "mask": [[...], ...], "average": true}
+        returns {"imputed": [[...], ...]}. The mask is optional, and defaults to all values being observed.
+    GET /models returns the ids of the served models.
+    GET /stats returns the queueing and imputation latency histograms of each model.
+"""
+
+import argparse
+import json
+import logging
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict
+
+import numpy as np
+
+from azua.datasets.csv_dataset_loader import CSVDatasetLoader
+from azua.models.imputation_server import ImputationServer
+from azua.models.models_factory import load_model
+from azua.models.torch_model import TorchModel
+from azua.utils.io_utils import read_json_as
+from azua.utils.run_utils import find_local_model_dir
+
+logger = logging.getLogger(__name__)
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description="Serve imputations from trained models over HTTP.")
+    parser.add_argument("model_dirs", type=str, nargs="+", help="Directories of the trained models to serve.")
+    parser.add_argument(
+        "--impute_config",
+        "-ic",
+        type=str,
+        default="configs/defaults/impute_config.json",
+        help="Imputation config file. Default: %(default)s .",
+    )
+    parser.add_argument(
+        "--vamp_prior_data",
+        type=str,
+        default=None,
+        help="CSV file of (training) data for the VampPrior of PVAE models, with missing values left empty.",
+    )
+    parser.add_argument("--host", type=str, default="localhost", help="Host to listen on. Default: %(default)s .")
+    parser.add_argument("--port", "-p", type=int, default=8000, help="Port to listen on. Default: %(default)s .")
+    parser.add_argument(
+        "--max_batch_rows",
+        type=int,
+        default=None,
+        help="Maximum number of rows to coalesce into one batch. Defaults to the imputation config's batch size.",
+    )
+    parser.add_argument(
+        "--max_delay_ms",
+        type=float,
+        default=5.0,
+        help="Maximum time a request waits to be coalesced with others. Default: %(default)s .",
+    )
+    parser.add_argument("--device", "-dv", type=str, default="cpu", help="Device to load the models on.")
+    return parser.parse_args()
+
+
+def create_handler(servers: Dict[str, ImputationServer]):
+    class ImputationRequestHandler(BaseHTTPRequestHandler):
+        def do_GET(self):  # pylint: disable=invalid-name
+            if self.path == "/models":
+                self._send_json(200, {"models": list(servers)})
+            elif self.path == "/stats":
+                self._send_json(200, {model_id: server.stats() for model_id, server in servers.items()})
+            else:
+                self._send_json(404, {"error": f"Unknown path {self.path}."})
+
+        def do_POST(self):  # pylint: disable=invalid-name
+            parts = self.path.strip("/").split("/")
+            if len(parts) != 3 or parts[0] != "models" or parts[2] != "impute" or parts[1] not in servers:
+                self._send_json(404, {"error": f"Unknown path {self.path}."})
+                return
+            try:
+                request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                data = np.array(request["data"], dtype=float)
+                mask = np.array(request["mask"], dtype=float) if "mask" in request else np.ones_like(data)
+                future = servers[parts[1]].submit(data, mask, average=request.get("average", True))
+            except KeyError as e:
+                self._send_json(400, {"error": f"Missing field {e}."})
+                return
+            except (TypeError, ValueError) as e:
+                self._send_json(400, {"error": str(e)})
+                return
+            try:
+                imputed = future.result()
+            except Exception as e:  # pylint: disable=broad-except
+                self._send_json(500, {"error": str(e)})
+                return
+            self._send_json(200, {"imputed": imputed.tolist()})
+
+        def _send_json(self, status: int, body: Dict[str, Any]):
+            # Imputed values may be numpy scalars, which json cannot serialise directly.
+            encoded = json.dumps(body, default=lambda value: value.item()).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(encoded)))
+            self.end_headers()
+            self.wfile.write(encoded)
+
+        def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+            logger.debug(format, *args)
+
+    return ImputationRequestHandler
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    args = get_args()
+    impute_config = read_json_as(args.impute_config, dict)
+    vamp_prior_data = None
+    if args.vamp_prior_data is not None:
+        vamp_prior_data = CSVDatasetLoader.read_csv_from_file(args.vamp_prior_data)
+
+    servers: Dict[str, ImputationServer] = {}
+    for model_dir in args.model_dirs:
+        model_dir, model_id = find_local_model_dir(model_dir)
+        model = load_model(model_id, model_dir, args.device)
+        if not isinstance(model, TorchModel):
+            raise TypeError(f"Only torch models can be served, not {type(model).__name__}.")
+        servers[model_id] = ImputationServer(
+            model,
+            impute_config,
+            vamp_prior_data=vamp_prior_data,
+            max_batch_rows=args.max_batch_rows,
+            max_delay_ms=args.max_delay_ms,
+        )
+        logger.info(f"Loaded model {model_id} from {model_dir}.")
+
+    http_server = ThreadingHTTPServer((args.host, args.port), create_handler(servers))
+    logger.info(f"Serving imputations on http://{args.host}:{args.port}")
+    try:
+        http_server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        http_server.server_close()
+        for server in servers.values():
+            server.close()
+
+
+if __name__ == "__main__":
+    main()
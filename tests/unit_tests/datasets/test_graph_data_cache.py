@@ -0,0 +1,62 @@
+import os
+
+import pandas as pd
+import pytest
+import torch
+
+from azua.datasets.gnn_csv_dataset_loader import GNNCSVDatasetLoader
+from azua.datasets.graph_data_cache import append_edges_to_graph_data, load_cached_graph_data, save_cached_graph_data
+
+SPLITS = ("train", "test", "val")
+
+
+def _create_dfs():
+    train_df = pd.DataFrame(
+        {"row": [0, 0, 1, 1, 2, 3], "col": [0, 1, 1, 2, 3, 0], "val": [1.0, 0.0, 1.0, 0.0, 1.0, 1.0]}
+    )
+    test_df = pd.DataFrame({"row": [4, 4], "col": [0, 2], "val": [0.0, 1.0]})
+    val_df = pd.DataFrame({"row": [5, 5], "col": [1, 3], "val": [1.0, 0.0]})
+    return {"train": train_df, "test": test_df, "val": val_df}
+
+
+def _create_graph_data(dataset_dir, dfs, model_config):
+    loader = GNNCSVDatasetLoader(dataset_dir)
+    all_df = pd.concat([dfs[split] for split in SPLITS], ignore_index=True)
+    return loader._create_graph_data(all_df, dfs["train"], dfs["test"], dfs["val"], [0, 1, 2, 3], model_config)
+
+
+@pytest.mark.parametrize("split", SPLITS)
+@pytest.mark.parametrize(
+    "node_init, use_discrete_edge_value", [("random", False), ("random", True), ("topic_sep_tree", True)]
+)
+def test_append_edges_to_cached_graph_data_matches_rebuild(tmpdir, split, node_init, use_discrete_edge_value):
+    dataset_dir = str(tmpdir)
+    os.makedirs(os.path.join(dataset_dir, "metadata"))
+    pd.DataFrame({"QuestionId": [0, 1, 2, 3], "SubjectId": ["[10, 11]", "[10, 12]", "[10]", "[10, 11]"]}).to_csv(
+        os.path.join(dataset_dir, "metadata", "item_metadata_topic.csv"), index=False
+    )
+    model_config = {
+        "random_seed": 0,
+        "node_init": node_init,
+        "node_input_dim": 3,
+        "use_transformer": False,
+        "use_edge_metadata": False,
+        "use_discrete_edge_value": use_discrete_edge_value,
+        "use_edge_metadata_for_prediction": False,
+        "prediction_metadata_dim": 0,
+    }
+    dfs = _create_dfs()
+    save_cached_graph_data(dataset_dir, "key", _create_graph_data(dataset_dir, dfs, model_config))
+
+    new_df = pd.DataFrame({"row": [2, 3], "col": [1, 2], "val": [0.0, 1.0]})
+    appended = append_edges_to_graph_data(
+        load_cached_graph_data(dataset_dir, "key"), new_df, split, use_discrete_edge_value
+    )
+    dfs[split] = pd.concat([dfs[split], new_df], ignore_index=True)
+    rebuilt = _create_graph_data(dataset_dir, dfs, model_config)
+
+    assert appended.num_metas == rebuilt.num_metas
+    keys = ["x", "edge_index", "edge_attr"]
+    keys += [f"{s}_{name}" for s in SPLITS for name in ("edge_index", "edge_attr", "labels")]
+    for key in keys:
+        assert torch.equal(appended[key], rebuilt[key]), key
@@ -0,0 +1,41 @@
+import os
+
+import numpy as np
+
+from azua.datasets.text_embedding_store import TextEmbeddingStore
+
+
+def _encode(sentences):
+    return [np.full((len(sentence), 3), len(sentence), dtype=np.float32) for sentence in sentences]
+
+
+def test_get_or_encode_only_encodes_missing_sentences(tmpdir):
+    encoded = []
+
+    def encode_fn(sentences):
+        encoded.append(sentences)
+        return _encode(sentences)
+
+    store = TextEmbeddingStore(str(tmpdir), "model", 8)
+    token_embeddings = store.get_or_encode(["ab", "c", "ab"], encode_fn)
+    assert encoded == [["ab", "c"]]
+    assert [emb.shape for emb in token_embeddings] == [(2, 3), (1, 3), (2, 3)]
+
+    # A new store over the same directory, e.g. in another run, reads the existing shard.
+    store = TextEmbeddingStore(str(tmpdir), "model", 8)
+    token_embeddings = store.get_or_encode(["c", "dddd"], encode_fn)
+    assert encoded == [["ab", "c"], ["dddd"]]
+    assert token_embeddings[0].dtype == np.float16
+    np.testing.assert_array_equal(token_embeddings[0], np.ones((1, 3)))
+    np.testing.assert_array_equal(token_embeddings[1], np.full((4, 3), 4))
+
+    # Each batch of encoded sentences is written as one shard and its index.
+    assert len(os.listdir(str(tmpdir))) == 4
+
+
+def test_get_separates_models_and_max_lengths(tmpdir):
+    store = TextEmbeddingStore(str(tmpdir), "model", 8)
+    store.put(["ab"], _encode(["ab"]))
+    assert store.get("ab") is not None
+    assert TextEmbeddingStore(str(tmpdir), "model", 9).get("ab") is None
+    assert TextEmbeddingStore(str(tmpdir), "other_model", 8).get("ab") is None
@@ -0,0 +1,68 @@
+import bisect
+
+import numpy as np
+import pytest
+import torch
+
+from azua.datasets.torch_datasets import TemporalTensorDataset
+from azua.utils.torch_utils import create_temporal_dataloader
+
+# Three series of lengths 4, 3 and 6, concatenated along the first axis.
+_INDEX_SEGMENTATION = [(0, 3), (4, 6), (7, 12)]
+_LAG = 2
+
+
+def _bisect_window(data, index, is_autoregressive):
+    """
+    Reference window lookup, mapping the fold-time/AR index back to the original index by searching for the number of
+    series it has moved across.
+    """
+    segmentation_end = [seg[1] - (series_idx + 1) * _LAG for series_idx, seg in enumerate(_INDEX_SEGMENTATION)]
+    index_orig = index + bisect.bisect_left(segmentation_end, index) * _LAG
+    window = data[index_orig : index_orig + _LAG + 1, :]
+    return window if is_autoregressive else window.flatten()
+
+
+@pytest.fixture
+def data():
+    return torch.arange(13 * 2, dtype=torch.float).reshape(13, 2)
+
+
+@pytest.mark.parametrize("is_autoregressive", [True, False])
+def test_temporal_tensor_dataset_matches_bisect_indexing(data, is_autoregressive):
+    dataset = TemporalTensorDataset(
+        data, lag=_LAG, is_autoregressive=is_autoregressive, index_segmentation=_INDEX_SEGMENTATION
+    )
+    num_windows = data.shape[0] - len(_INDEX_SEGMENTATION) * _LAG
+    assert len(dataset) == num_windows
+    expected = torch.stack([_bisect_window(data, i, is_autoregressive) for i in range(num_windows)])
+
+    for i in range(num_windows):
+        (window,) = dataset[i]
+        assert torch.equal(window, expected[i])
+
+    # Batches of indices are gathered from the strided views in one go.
+    batch_idxs = np.array([6, 0, 2, 3, 1])
+    for index in [batch_idxs, torch.as_tensor(batch_idxs), list(batch_idxs), slice(1, 5)]:
+        (windows,) = dataset[index]
+        expected_idxs = index if isinstance(index, slice) else batch_idxs
+        assert torch.equal(windows, expected[expected_idxs])
+
+
+@pytest.mark.parametrize("sample_randomly", [True, False])
+def test_create_temporal_dataloader_serves_all_windows(data, sample_randomly):
+    dataloader = create_temporal_dataloader(
+        data.numpy(),
+        lag=_LAG,
+        is_autoregressive=True,
+        index_segmentation=_INDEX_SEGMENTATION,
+        batch_size=3,
+        sample_randomly=sample_randomly,
+    )
+    expected = torch.stack([_bisect_window(data, i, True) for i in range(len(dataloader.dataset))])
+    windows = torch.cat([windows for (windows,) in dataloader])
+    assert windows.shape == expected.shape
+    if sample_randomly:
+        # Each epoch is a permutation of all windows, so compare them in order of their first element.
+        windows = windows[torch.argsort(windows[:, 0, 0])]
+    assert torch.equal(windows, expected)
@@ -0,0 +1,127 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+import torch
+from torch.nn import Linear, Parameter
+
+from azua.datasets.text_embedding_store import TextEmbeddingStore
+from azua.models import graph_neural_network
+from azua.models.graph_neural_network import GraphNeuralNetwork
+
+MESSAGE_DIM = 4
+MAX_LENGTH = 5
+NUM_NODES = 6
+
+
+def _create_attention_model(corgi_attention_method: str, attention_memory_budget_mb: float):
+    # Stand-in for a GraphNeuralNetwork, with only the attributes used by _message_update_using_transformer.
+    torch.manual_seed(0)
+    return SimpleNamespace(
+        message_dim=MESSAGE_DIM,
+        _device=torch.device("cpu"),
+        corgi_attention_method=corgi_attention_method,
+        attention_memory_budget_mb=attention_memory_budget_mb,
+        W_source=Linear(3, MESSAGE_DIM),
+        W_attention=Parameter(torch.randn(1, 1, 2 * MESSAGE_DIM)),
+    )
+
+
+def _message_update_and_gradients(model):
+    torch.manual_seed(1)
+    x = torch.randn(NUM_NODES, 3)
+    sentences_encoded = torch.randn(NUM_NODES, MAX_LENGTH, MESSAGE_DIM, requires_grad=True)
+    padding_mask = torch.ones(NUM_NODES, MAX_LENGTH)
+    padding_mask[:, 3:] = 0
+    padding_mask[2] = 0  # Node with an empty sentence.
+    edge_index = torch.randint(0, NUM_NODES, (2, 20))
+    messages, _ = GraphNeuralNetwork._message_update_using_transformer(
+        model, torch.zeros(20, MESSAGE_DIM), edge_index, x, sentences_encoded, padding_mask
+    )
+    (messages * torch.randn(messages.shape)).sum().backward()
+    gradients = [model.W_source.weight.grad, model.W_attention.grad, sentences_encoded.grad]
+    return messages.detach(), gradients
+
+
+@pytest.mark.parametrize("corgi_attention_method", ["dot-product", "concat"])
+def test_message_update_chunked_with_checkpoint_matches_unchunked(monkeypatch, corgi_attention_method):
+    checkpoint_calls = []
+
+    def tensor_only_checkpoint(function, *args):
+        # torch 1.7 saves every checkpoint input with save_for_backward, which only accepts tensors.
+        assert all(isinstance(arg, torch.Tensor) for arg in args)
+        checkpoint_calls.append(len(args))
+        return torch.utils.checkpoint.checkpoint(function, *args)
+
+    monkeypatch.setattr(graph_neural_network, "checkpoint", tensor_only_checkpoint)
+
+    expected_messages, expected_gradients = _message_update_and_gradients(
+        _create_attention_model(corgi_attention_method, attention_memory_budget_mb=1.0)
+    )
+    assert not checkpoint_calls
+
+    # Budget for 2 edges per chunk.
+    bytes_per_edge = 4 * MAX_LENGTH * (MESSAGE_DIM + 2)
+    messages, gradients = _message_update_and_gradients(
+        _create_attention_model(corgi_attention_method, attention_memory_budget_mb=2 * bytes_per_edge / 2 ** 20)
+    )
+    assert len(checkpoint_calls) > 1
+
+    assert torch.allclose(messages, expected_messages, atol=1e-6)
+    for gradient, expected_gradient in zip(gradients, expected_gradients):
+        if expected_gradient is None:
+            assert gradient is None
+        else:
+            assert torch.allclose(gradient, expected_gradient, atol=1e-6)
+
+
+class _FakeTokenized(dict):
+    def to(self, device):
+        return _FakeTokenized({key: value.to(device) for key, value in self.items()})
+
+
+def _fake_tokenizer(sentences, return_tensors, truncation, padding, max_length):
+    # One token per word, padded to the longest sentence.
+    num_tokens = [min(len(sentence.split()), max_length) for sentence in sentences]
+    attention_mask = torch.zeros(len(sentences), max(num_tokens), dtype=torch.long)
+    for i, n in enumerate(num_tokens):
+        attention_mask[i, :n] = 1
+    return _FakeTokenized(input_ids=attention_mask.cumsum(dim=1) * attention_mask, attention_mask=attention_mask)
+
+
+class _FakeTransformer(torch.nn.Module):
+    def __init__(self):
+        super().__init__()
+        self.embedding = torch.nn.Embedding(MAX_LENGTH + 1, MESSAGE_DIM)
+
+    def forward(self, input_ids, attention_mask):
+        return (self.embedding(input_ids),)
+
+
+@pytest.mark.parametrize("use_text_embedding_store", [False, True])
+def test_encode_sentence_using_transformer(tmpdir, use_text_embedding_store):
+    torch.manual_seed(0)
+    model = SimpleNamespace(
+        _device=torch.device("cpu"),
+        max_transformer_length=MAX_LENGTH,
+        item_meta_dim=MESSAGE_DIM,
+        tokenizer=_fake_tokenizer,
+        transformer_model=_FakeTransformer(),
+        text_embedding_store=TextEmbeddingStore(str(tmpdir), "fake", MAX_LENGTH) if use_text_embedding_store else None,
+    )
+    model._run_transformer = lambda sentences: GraphNeuralNetwork._run_transformer(model, sentences)
+    model._run_transformer_without_padding = lambda sentences: GraphNeuralNetwork._run_transformer_without_padding(
+        model, sentences
+    )
+    sentences = np.array(["", "a b", "a b c d e f g", "", "a"])
+
+    sentences_encoded, padding_mask = GraphNeuralNetwork._encode_sentence_using_transformer(model, sentences)
+
+    expected_num_tokens = [0, 2, MAX_LENGTH, 0, 1]
+    assert padding_mask.sum(dim=1).tolist() == expected_num_tokens
+    embeddings = model.transformer_model.embedding.weight.detach()
+    for i, num_tokens in enumerate(expected_num_tokens):
+        expected = torch.zeros(MAX_LENGTH, MESSAGE_DIM)
+        expected[:num_tokens] = embeddings[1 : num_tokens + 1]
+        # The text embedding store keeps embeddings in float16.
+        assert torch.allclose(sentences_encoded[i], expected, atol=1e-2 if use_text_embedding_store else 0)
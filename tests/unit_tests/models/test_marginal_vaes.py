@@ -0,0 +1,114 @@
+from typing import Tuple
+
+import pytest
+import torch
+
+from azua.datasets.variables import Variable, Variables
+from azua.models.marginal_vaes import MarginalVAEs
+
+BATCH_SIZE = 7
+
+
+class _LoopedMarginalVAEs(MarginalVAEs):
+    """
+    MarginalVAEs running the VAE of each variable in turn, as before the VAEs of variables were grouped.
+    """
+
+    def encode(self, *input_tensors: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+        data = input_tensors[0]
+        encoder_means, encoder_logvars = zip(
+            *[
+                vae.encode(self.variables.get_var_cols_from_data(idx, data))
+                for idx, vae in enumerate(self._marginal_vaes)
+            ]
+        )
+        all_encoder_mean = torch.cat(encoder_means, dim=1)
+        all_encoder_logvar = torch.cat(encoder_logvars, dim=1)
+        if len(input_tensors) > 1:
+            mask = input_tensors[1]
+            for idx in range(len(self.variables)):
+                rows_not_to_keep = torch.where(self.variables.get_var_cols_from_data(idx, mask)[:, 0] == 0)[0]
+                var_cols = slice(self.vae_latent_dim * idx, self.vae_latent_dim * (idx + 1))
+                all_encoder_mean[rows_not_to_keep, var_cols] = 0
+                all_encoder_logvar[rows_not_to_keep, var_cols] = 0
+        return all_encoder_mean, all_encoder_logvar
+
+    def decode(self, data: torch.Tensor, *input_tensors: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+        data = data.reshape(data.shape[0], len(self.variables), -1)
+        recon_x_means, recon_x_logvars = zip(*[vae.decode(data[:, idx]) for idx, vae in enumerate(self._marginal_vaes)])
+        return torch.cat(recon_x_means, dim=1), torch.cat(recon_x_logvars, dim=1)
+
+
+def _create_variables() -> Variables:
+    return Variables(
+        [
+            Variable("continuous_1", True, "continuous", 0.0, 1.0),
+            Variable("binary", True, "binary", 0, 1),
+            Variable("categorical_1", True, "categorical", 0, 2),
+            Variable("continuous_2", True, "continuous", 0.0, 1.0),
+            Variable("categorical_2", True, "categorical", 0, 2),
+            Variable("categorical_3", True, "categorical", 0, 3),
+        ]
+    )
+
+
+def _create_processed_data(variables: Variables) -> Tuple[torch.Tensor, torch.Tensor]:
+    columns = []
+    for variable in variables:
+        if variable.type == "categorical":
+            categories = torch.randint(variable.processed_dim, (BATCH_SIZE,))
+            columns.append(torch.nn.functional.one_hot(categories, variable.processed_dim).float())
+        elif variable.type == "binary":
+            columns.append(torch.randint(2, (BATCH_SIZE, 1)).float())
+        else:
+            columns.append(torch.rand(BATCH_SIZE, 1))
+    data = torch.cat(columns, dim=1)
+    var_mask = torch.randint(2, (BATCH_SIZE, len(variables))).float()
+    mask = torch.cat(
+        [var_mask[:, [idx]].expand(-1, variable.processed_dim) for idx, variable in enumerate(variables)], dim=1
+    )
+    return data, mask
+
+
+@pytest.mark.parametrize("variance_autotune", [False, True])
+def test_grouped_marginal_vaes_match_looped(tmpdir, variance_autotune):
+    torch.manual_seed(0)
+    variables = _create_variables()
+    model_config = {
+        "latent_dim": 3,
+        "encoder_layers": [8, 4],
+        "decoder_layers": [4, 8],
+        "decoder_variances": 0.02,
+        "categorical_likelihood_coefficient": 1.0,
+        "kl_coefficient": 1.0,
+        "variance_autotune": variance_autotune,
+    }
+    device = torch.device("cpu")
+    grouped = MarginalVAEs("grouped", variables, str(tmpdir.mkdir("grouped")), device, **model_config)
+    looped = _LoopedMarginalVAEs("looped", variables, str(tmpdir.mkdir("looped")), device, **model_config)
+    looped.load_state_dict(grouped.state_dict())
+    # Variables of the same type and processed dim share a group.
+    assert sorted(var_idxs for var_idxs, _ in grouped._variable_groups) == [[0, 3], [1], [2, 4], [5]]
+
+    data, mask = _create_processed_data(variables)
+    for actual, expected in zip(grouped.encode(data, mask), looped.encode(data, mask)):
+        torch.testing.assert_allclose(actual, expected)
+    z = torch.randn(BATCH_SIZE, len(variables) * model_config["latent_dim"])
+    for actual, expected in zip(grouped.decode(z), looped.decode(z)):
+        torch.testing.assert_allclose(actual, expected)
+
+    losses = []
+    for model in (grouped, looped):
+        torch.manual_seed(1)
+        loss, kl, nll = model._loss(data, mask)
+        loss.backward()
+        losses.append((loss, kl, nll))
+    for actual, expected in zip(*losses):
+        torch.testing.assert_allclose(actual, expected)
+    looped_parameters = dict(looped.named_parameters())
+    for name, parameter in grouped.named_parameters():
+        # The decoder log-variances are only trained, and so only have gradients, with variance autotuning.
+        if parameter.grad is None:
+            assert looped_parameters[name].grad is None
+        else:
+            torch.testing.assert_allclose(parameter.grad, looped_parameters[name].grad)
@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+import torch
+
+from azua.models.pvae_base_model import RunningLogMeanExp
+
+
+@pytest.mark.parametrize("chunk_sizes", [[50], [1, 49], [7, 13, 30], [25, 25]])
+def test_running_log_mean_exp_matches_logsumexp(chunk_sizes):
+    torch.manual_seed(0)
+    # Large log weights, which would overflow without the running maximum, with the largest in a later chunk.
+    log_weights = 100 * torch.randn(sum(chunk_sizes), 3, dtype=torch.float64) - 1000
+    log_weights[-1, 0] = 0
+    running = RunningLogMeanExp()
+    for chunk in torch.split(log_weights, chunk_sizes):
+        running.update(chunk)
+
+    num_samples = log_weights.shape[0]
+    expected = torch.logsumexp(log_weights, dim=0) - np.log(num_samples)
+    torch.testing.assert_allclose(running.value(), expected)
+
+    # Standard error of the mean of exp(w), relative to that mean.
+    weights = torch.exp(log_weights - log_weights.max(dim=0).values)
+    expected_standard_error = weights.std(dim=0, unbiased=False) / weights.mean(dim=0) / np.sqrt(num_samples)
+    torch.testing.assert_allclose(running.standard_error(), expected_standard_error)
+    assert running.count == num_samples
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+import torch
+
+from azua.models.torch_model import load_saved_state_dict
+from azua.utils.tensor_file import _DTYPES, is_tensor_file, load_tensor_file, save_tensor_file
+
+
+def _make_tensor(dtype, shape):
+    if dtype == torch.bool:
+        return torch.arange(int(np.prod(shape))).reshape(shape) % 3 == 0
+    return (torch.arange(int(np.prod(shape))) - 3).reshape(shape).to(dtype)
+
+
+@pytest.mark.parametrize("shape", [(2, 3), (), (0,), (4, 0)])
+def test_tensor_file_round_trip(tmpdir, shape):
+    path = str(tmpdir.join("tensors"))
+    tensors = {str(dtype): _make_tensor(dtype, shape) for dtype in _DTYPES}
+    # Non-contiguous tensors are saved as their contiguous copy.
+    tensors["transposed"] = torch.rand(3, 2).t()
+    metadata = {"model_type": "test"}
+    save_tensor_file(path, tensors, metadata=metadata)
+
+    assert is_tensor_file(path)
+    loaded_tensors, loaded_metadata = load_tensor_file(path)
+    assert loaded_metadata == metadata
+    assert loaded_tensors.keys() == tensors.keys()
+    for name, tensor in tensors.items():
+        assert loaded_tensors[name].dtype == tensor.dtype
+        assert torch.equal(loaded_tensors[name], tensor)
+
+
+def test_save_tensor_file_rejects_unsupported_tensors(tmpdir):
+    with pytest.raises(ValueError):
+        save_tensor_file(str(tmpdir.join("tensors")), {"complex": torch.zeros(2, dtype=torch.complex64)})
+
+
+def test_load_saved_state_dict_falls_back_to_torch_load(tmpdir):
+    state_dict = {"weight": torch.rand(3, 2), "num_batches_tracked": torch.tensor(4)}
+    torch_path = str(tmpdir.join("model.pt"))
+    torch.save(state_dict, torch_path)
+    tensor_file_path = str(tmpdir.join("model.tensors"))
+    save_tensor_file(tensor_file_path, state_dict)
+
+    assert not is_tensor_file(torch_path)
+    for path in [torch_path, tensor_file_path]:
+        loaded_state_dict = load_saved_state_dict(path)
+        assert loaded_state_dict.keys() == state_dict.keys()
+        for name, tensor in state_dict.items():
+            assert torch.equal(loaded_state_dict[name], tensor)
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+import torch
+from scipy.sparse import csr_matrix
+
+from azua.utils.torch_utils import IndexBatchSampler, create_dataloader
+
+
+@pytest.mark.parametrize("iterations", [-1, 8])
+def test_index_batch_sampler_draws_random_state_when_epoch_starts(iterations):
+    sampler = IndexBatchSampler(60, batch_size=6, iterations=iterations)
+    np.random.seed(0)
+    batches = list(sampler)
+
+    np.random.seed(0)
+    batch_iter = iter(sampler)
+    # Other uses of the global random state, e.g. while batches are prefetched in another thread, don't affect them.
+    np.random.seed(1)
+    assert len(batches) == len(sampler)
+    for batch, other_batch in zip(batches, batch_iter):
+        np.testing.assert_array_equal(batch, other_batch)
+
+
+@pytest.mark.parametrize("iterations", [-1, 8])
+def test_prefetching_sparse_dataloader_draws_same_batches(iterations):
+    data = csr_matrix(np.arange(60 * 3, dtype=np.float32).reshape(60, 3))
+
+    def _epoch(prefetch_batches):
+        np.random.seed(0)
+        dataloader = create_dataloader(data, batch_size=6, iterations=iterations, prefetch_batches=prefetch_batches)
+        batches = []
+        for (batch,) in dataloader:
+            np.random.seed(len(batches) + 1)
+            batches.append(batch)
+        return batches
+
+    batches, prefetched_batches = _epoch(0), _epoch(1)
+    assert len(batches) == len(prefetched_batches) == (10 if iterations == -1 else iterations)
+    for batch, prefetched_batch in zip(batches, prefetched_batches):
+        assert torch.equal(batch, prefetched_batch)